@@ -0,0 +1,49 @@
+"""
+    Times majority vote and Dawid-Skene aggregation on simulated
+    annotations, and reports how often each recovers the true label.
+
+    Usage: python bench_aggregation.py [items] [annotators per item]
+"""
+import datetime
+import random
+import sys
+import time
+
+from pyannotatron.aggregation import ChoiceMatrix
+from pyannotatron.models import MultipleChoiceAnnotation, AnnotationSource
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    per_item = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rng = random.Random(0)
+    labels = ["positive", "negative", "neutral"]
+    created = datetime.datetime(2018, 4, 24)
+    annotations = [MultipleChoiceAnnotation(created, AnnotationSource.HUMAN, "SENTIMENT", [label])
+                   for label in labels]
+    accuracy = [rng.uniform(0.4, 0.95) for _ in range(50)]
+    truth = [rng.randrange(len(labels)) for _ in range(items)]
+
+    start = time.perf_counter()
+    matrix = ChoiceMatrix("SENTIMENT", labels)
+    for item, label in enumerate(truth):
+        for annotator in rng.sample(range(len(accuracy)), per_item):
+            answer = label if rng.random() < accuracy[annotator] else rng.randrange(len(labels))
+            matrix.add(item, annotator, annotations[answer])
+    print("%d items, %d observations, encoded in %.2f s" % (items, len(matrix), time.perf_counter() - start))
+
+    for name, run in [("majority", matrix.majority_vote), ("dawid-skene", matrix.dawid_skene)]:
+        start = time.perf_counter()
+        result = run()
+        best = result.best()
+        elapsed = time.perf_counter() - start
+        correct = sum(l == t for l, t in zip(best, truth))
+        print("%-12s %6.2f s  %.2f%% correct" % (name, elapsed, 100.0 * correct / items))
+
+    start = time.perf_counter()
+    result.to_annotations(created)
+    print("to_annotations %.2f s" % (time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+    Measures per-request latency against the stand-in server, with a pooled
+    keep-alive session and with a fresh connection for every request.
+
+    Usage: python bench_client.py [requests]
+"""
+import sys
+import time
+
+from pyannotatron.client import AnnotatronClient
+from pyannotatron.server import StandInServer
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def report(name, latencies):
+    print("%-24s mean %7.3f ms  p50 %7.3f ms  p99 %7.3f ms" % (
+        name, 1000 * sum(latencies) / len(latencies), 1000 * percentile(latencies, 0.5),
+        1000 * percentile(latencies, 0.99)))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with StandInServer() as server:
+        token = AnnotatronClient(server.url).login("admin", "admin").token
+
+        latencies = []
+        with AnnotatronClient(server.url, token=token) as client:
+            for _ in range(count):
+                start = time.perf_counter()
+                client.current_user()
+                latencies.append(time.perf_counter() - start)
+        report("keep-alive pool", latencies)
+
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            with AnnotatronClient(server.url, token=token) as client:
+                client.current_user()
+            latencies.append(time.perf_counter() - start)
+        report("connection per request", latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+    Compares the compiled MAP codecs against the original interpreted
+    generic_from_json / generic_to_json implementation.
+
+    Usage: python bench_codec.py [iterations]
+"""
+import sys
+import timeit
+
+from pyannotatron.models import Assignment, BinaryAsset, Annotation
+from pyannotatron import utils
+
+
+def interpreted_from_json(json_dict, mapping_dict):
+    response_dict = {}
+    for key in json_dict:
+        old_value = json_dict[key]
+        if key not in mapping_dict:
+            response_dict[key] = json_dict[key]
+            continue
+
+        def conversion_func(x):
+            return x
+
+        try:
+            new_key, conversion_func, _ = mapping_dict[key]
+        except ValueError:
+            new_key = mapping_dict[key]
+            assert type(new_key) != type([])
+
+        response_dict[new_key] = conversion_func(old_value)
+
+    return response_dict
+
+
+def interpreted_to_json(python_dict, mapping_dict):
+    response_dict = {}
+    converted_keys = set([])
+    for key in mapping_dict:
+
+        def conversion_func_raw(x):
+            return x
+
+        try:
+            python_name, _, conversion_func = mapping_dict[key]
+        except ValueError:
+            conversion_func = conversion_func_raw
+            python_name = mapping_dict[key]
+
+        if python_name in python_dict:
+            value = python_dict[python_name]
+            response_dict[key] = conversion_func(value)
+            converted_keys.add(python_name)
+
+    for key in python_dict:
+        if key in converted_keys:
+            continue
+        matched = False
+        for potential_key in mapping_dict:
+            try:
+                python_name, _, _ = mapping_dict[potential_key]
+            except ValueError:
+                python_name = mapping_dict[potential_key]
+            matched |= python_name == key
+        if not matched:
+            response_dict[key] = python_dict[key]
+
+    return response_dict
+
+
+CREATED = "2018-04-23T18:25:43.511000Z"
+
+ANNOTATIONS = {
+    "TimeSeriesSegmentationAnnotation": {
+        "created": CREATED, "kind": "TimeSeriesSegmentationAnnotation", "source": "Human",
+        "summaryCode": "WORDS", "segments": [0.1, 2.0], "annotations": ["hello", "world"]
+    },
+    "TimeSeriesRangeAnnotation": {
+        "created": CREATED, "kind": "TimeSeriesRangeAnnotation", "source": "SystemGenerated",
+        "summaryCode": "AMBIENT",
+        "ranges": [{"label": "noisy", "start": 0.0, "end": 0.1},
+                   {"label": "talking", "start": 0.1, "end": 0.25}]
+    },
+    "GenericJSONAnnotation": {
+        "created": CREATED, "kind": "GenericJSONAnnotation", "source": "Reference",
+        "summaryCode": "TRANSCRIPT", "content": {"arbitraryKey": {"values": [1, 2, 3]}}
+    },
+    "MultipleChoiceAnnotation": {
+        "created": CREATED, "kind": "MultipleChoiceAnnotation", "source": "Aggregated",
+        "summaryCode": "SENTIMENT", "choices": ["positive"]
+    },
+    "TextAnnotation": {
+        "created": CREATED, "kind": "TextAnnotation", "source": "Human",
+        "summaryCode": "EVALUATION", "content": "?"
+    },
+}
+
+ASSIGNMENT = {
+    "assets": [1, 22], "assignedUserId": 47, "assignedAnnotatorId": 12,
+    "question": {
+        "created": CREATED, "summaryCode": "SENTIMENT", "humanPrompt": "Judge whether this text is positive",
+        "kind": "MultipleChoiceQuestion", "annotationInstructions": "Select the best match.",
+        "detailedAnnotationInstructions": "If unsure, write a note explaining why",
+        "choices": ["positive", "negative"], "assets": [99199291, 1132231]
+    },
+    "response": ANNOTATIONS["TimeSeriesSegmentationAnnotation"],
+    "assignedReviewerId": 47, "created": CREATED,
+}
+
+BINARY_ASSET = {
+    "id": 7, "userIdWhoUploaded": 5, "content": "aGVsbG8gd29ybGQ=",
+    "metadata": {"arbitraryKey": "arbitraryValue"}, "dateUploaded": CREATED,
+    "copyrightAndUsageRestrictions": "No redistribution", "checksum": "0" * 128,
+    "mimeType": "text/plain", "typeDescription": "UTF8Text"
+}
+
+
+def round_trip(decode, json_dict):
+    return lambda: decode(json_dict).to_json()
+
+
+def run_case(name, decode, json_dict, iterations):
+    compiled = timeit.timeit(round_trip(decode, json_dict), number=iterations)
+    compiled_out = decode(json_dict).to_json()
+
+    _patch_models(interpreted_from_json, interpreted_to_json)
+    try:
+        interpreted = timeit.timeit(round_trip(decode, json_dict), number=iterations)
+        interpreted_out = decode(json_dict).to_json()
+    finally:
+        _patch_models(utils.generic_from_json, utils.generic_to_json)
+
+    assert compiled_out == interpreted_out, name
+    print("%-36s interpreted %8.2f us  compiled %8.2f us  speedup %.2fx" % (
+        name, 1e6 * interpreted / iterations, 1e6 * compiled / iterations, interpreted / compiled))
+
+
+def _patch_models(from_json, to_json):
+    from pyannotatron import models
+    models.generic_from_json = from_json
+    models.generic_to_json = to_json
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    run_case("Assignment", Assignment.from_json, ASSIGNMENT, iterations)
+    run_case("BinaryAsset", BinaryAsset.from_json, BINARY_ASSET, iterations)
+    for name, json_dict in ANNOTATIONS.items():
+        run_case(name, Annotation.from_json, json_dict, iterations)
+
+
+if __name__ == "__main__":
+    main()
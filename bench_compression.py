@@ -0,0 +1,59 @@
+"""
+    Compares bytes on the wire and end-to-end latency for uploading and
+    fetching Assignments with large range annotations, with and without
+    compression, against the stand-in server.
+
+    Usage: python bench_compression.py [ranges] [repeats]
+"""
+import datetime
+import json
+import sys
+import time
+
+from pyannotatron.client import AnnotatronClient
+from pyannotatron.compression import PREFERENCE
+from pyannotatron.models import Assignment, MultipleChoiceQuestion, QuestionKind, TimeSeriesRangeAnnotation
+from pyannotatron.models import TimeSeriesRangeTuple, AnnotationSource
+from pyannotatron.server import StandInServer
+
+
+def make_assignment(ranges: int) -> Assignment:
+    labels = ["alice", "bob", "carol", "silence"]
+    question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SPEAKERS", "Who is speaking?",
+                                      QuestionKind.MULTIPLE_CHOICE, labels)
+    response = TimeSeriesRangeAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.HUMAN, "SPEAKERS",
+                                         [TimeSeriesRangeTuple(labels[(i * 7) % 4], i * 1.25, i * 1.25 + 1.1)
+                                          for i in range(ranges)])
+    return Assignment([1], 12, question, response=response)
+
+
+def run(name, assignment, repeats, compression):
+    with StandInServer() as server, AnnotatronClient(server.url, compression=compression) as client:
+        client.login("admin", "admin")
+        received, sent = server.bytes_received, server.bytes_sent
+        uploads, downloads = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            id = client.create_assignment(assignment).id
+            uploads.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            client.get_assignment(id)
+            downloads.append(time.perf_counter() - start)
+        received = (server.bytes_received - received) / repeats
+        sent = (server.bytes_sent - sent) / repeats
+    print("%-10s upload %9d B %8.2f ms   download %9d B %8.2f ms" % (
+        name, received, 1000 * min(uploads), sent, 1000 * min(downloads)))
+
+
+def main():
+    ranges = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    assignment = make_assignment(ranges)
+    print("%d ranges, %d bytes of JSON, codings available: %s" % (
+        ranges, len(json.dumps(assignment.to_json())), ", ".join(PREFERENCE)))
+    run("identity", assignment, repeats, False)
+    run("compressed", assignment, repeats, True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+    Load-tests the client against the stand-in server and reports throughput
+    and latency percentiles for each client path.
+
+    Usage: python bench_load.py [--concurrency N] [--requests N] [--latency S]
+                                [--jitter S] [--error-rate F] [--max-inflight N]
+                                [--adaptive] [--json]
+"""
+import argparse
+import datetime
+import hashlib
+import json
+
+from pyannotatron.client import AnnotatronClient
+from pyannotatron.limiter import AdaptiveLimiter
+from pyannotatron.loadgen import run_load
+from pyannotatron.models import Corpus, BinaryAsset, BinaryAssetKind, AssetCorpusLink, Assignment
+from pyannotatron.models import MultipleChoiceQuestion, QuestionKind, MultipleChoiceAnnotation, AnnotationSource
+from pyannotatron.models import AssignmentResponse
+from pyannotatron.server import StandInServer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-inflight", type=int, default=None)
+    parser.add_argument("--adaptive", action="store_true", help="use an AdaptiveLimiter")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    with StandInServer() as server:
+        limiter = AdaptiveLimiter(max_limit=args.concurrency) if args.adaptive else None
+        client = AnnotatronClient(server.url, pool_size=args.concurrency, limiter=limiter)
+        client.login("admin", "admin")
+
+        corpus_id = client.create_corpus(Corpus("load")).id
+        question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SENTIMENT", "Is this positive?",
+                                          QuestionKind.MULTIPLE_CHOICE, ["positive", "negative"])
+        question_id = client.create_question(question).id
+        annotation = MultipleChoiceAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.HUMAN, "SENTIMENT",
+                                              ["positive"])
+        assignment_id = client.create_assignment(Assignment([1], 12, question, response=annotation)).id
+        content = b"The quick brown fox jumps over the lazy dog. " * 100
+        asset = BinaryAsset(content, "text/plain", BinaryAssetKind.UTF8_TEXT, "No redistribution",
+                            hashlib.sha512(content).hexdigest())
+        asset_id = client.upload_asset(asset).id
+
+        def upload_and_link(i):
+            id = client.upload_asset(asset, raw=True).id
+            client.link_asset(AssetCorpusLink("%08d.txt" % i, id, corpus_id))
+
+        def submit_responses(i):
+            client.submit_responses([(assignment_id, AssignmentResponse(annotation))] * 10)
+
+        scenarios = [
+            ("current_user", lambda i: client.current_user()),
+            ("get_question", lambda i: client.get_question(question_id)),
+            ("get_asset", lambda i: client.get_asset(asset_id)),
+            ("get_asset_content", lambda i: client.get_asset_content(asset_id)),
+            ("create_assignment", lambda i: client.create_assignment(Assignment([asset_id], i, question,
+                                                                                response=annotation))),
+            ("get_assignment", lambda i: client.get_assignment(assignment_id)),
+            ("upload_and_link", upload_and_link),
+            ("submit_responses", submit_responses),
+        ]
+
+        server.latency, server.jitter, server.error_rate = args.latency, args.jitter, args.error_rate
+        server.max_inflight = args.max_inflight
+        results = [run_load(name, operation, args.concurrency, args.requests) for name, operation in scenarios]
+        client.close()
+
+    if args.json:
+        print(json.dumps([result.to_json() for result in results], indent=2))
+    else:
+        for result in results:
+            print(result)
+        if limiter is not None:
+            print("limiter: %s" % limiter.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+    Reports the memory cost of TimeSeriesRangeTuple with and without __slots__.
+
+    Usage: python bench_memory.py [count]
+"""
+import sys
+import tracemalloc
+
+from pyannotatron.models import TimeSeriesRangeTuple
+
+
+class DictTimeSeriesRangeTuple:
+    def __init__(self, label: str, start: float, end: float):
+        self.label = label
+        self.start = start
+        self.end = end
+
+
+def bytes_per_object(cls, count):
+    labels = ["noisy", "talking", "silence"]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [cls(labels[i % 3], i * 0.5, i * 0.5 + 0.25) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    before = bytes_per_object(DictTimeSeriesRangeTuple, count)
+    after = bytes_per_object(TimeSeriesRangeTuple, count)
+    print("%d TimeSeriesRangeTuples" % count)
+    print("__dict__:  %6.1f bytes/object" % before)
+    print("__slots__: %6.1f bytes/object (%.0f%% of __dict__)" % (after, 100 * after / before))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+    Times decoding a JSON-lines export of Assignments serially, and across
+    process pools of increasing size, from the file and from records
+    already in memory. "reduce" rows count range labels in the workers and
+    only send back the counts, so they show the scaling without the cost
+    of unpickling every object in the parent.
+
+    Usage: python bench_parallel.py [assignments] [max workers]
+"""
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from pyannotatron.models import Assignment, MultipleChoiceQuestion, QuestionKind, TimeSeriesRangeAnnotation
+from pyannotatron.models import TimeSeriesRangeTuple, AnnotationSource
+from pyannotatron.parallel import decode_jsonl, decode_records
+from pyannotatron.streaming import iter_assignments
+
+
+def make_assignment(i: int) -> Assignment:
+    labels = ["alice", "bob", "carol", "silence"]
+    question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SPEAKERS", "Who is speaking?",
+                                      QuestionKind.MULTIPLE_CHOICE, labels)
+    response = TimeSeriesRangeAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.HUMAN, "SPEAKERS",
+                                         [TimeSeriesRangeTuple(labels[(i + j) % 4], j * 1.25, j * 1.25 + 1.1)
+                                          for j in range(i % 8)])
+    return Assignment([i], i % 50, question, response=response)
+
+
+def count_labels(assignments) -> Counter:
+    ret = Counter()
+    for assignment in assignments:
+        ret["assignments"] += 1
+        ret.update(r.label for r in assignment.response.ranges)
+    return ret
+
+
+def timed(name, decode, count, baseline=None, reduced=False):
+    start = time.perf_counter()
+    if reduced:
+        n = sum(decode(), Counter())["assignments"]
+    else:
+        n = sum(1 for _ in decode())
+    elapsed = time.perf_counter() - start
+    assert n == count, (n, count)
+    speedup = "" if baseline is None else "  x%.2f" % (baseline / elapsed)
+    print("%-28s %8.2f s %10.0f rec/s%s" % (name, elapsed, count / elapsed, speedup))
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    try:
+        with os.fdopen(fd, "w") as fp:
+            for i in range(count):
+                fp.write(json.dumps(make_assignment(i).to_json()) + "\n")
+        print("%d assignments, %d bytes, %d CPUs" % (count, os.path.getsize(path), os.cpu_count() or 1))
+
+        def serial():
+            with open(path, "rb") as fp:
+                return list(iter_assignments(fp))
+        baseline = timed("serial", serial, count)
+        with open(path, "rb") as fp:
+            lines = fp.read().splitlines()
+        workers = 1
+        while workers <= max_workers:
+            for ordered in (True, False):
+                mode = "ordered" if ordered else "unordered"
+                timed("jsonl    %2d workers %s" % (workers, mode),
+                      lambda: decode_jsonl(path, "assignment", workers, ordered=ordered), count, baseline)
+            timed("records  %2d workers ordered" % workers,
+                  lambda: decode_records(lines, "assignment", workers), count, baseline)
+            timed("reduce   %2d workers" % workers,
+                  lambda: decode_jsonl(path, "assignment", workers, shard_bytes=1024 * 1024, ordered=False,
+                                       reduce=count_labels), count, baseline, True)
+            workers *= 2
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import AnnotatronClient, RAW_CHUNK_SIZE
+from .limiter import AdaptiveLimiter
+from .models import AssetCorpusLink, Assignment, BinaryAsset, BinaryAssetDescription
+from .utils import BASE64_CHUNK_SIZE
+
+
+class AsyncAnnotatronClient:
+    """
+        asyncio version of AnnotatronClient.
+
+        Each call runs the blocking client on a thread pool sized to match the
+        connection pool, and a semaphore bounds how many requests are in flight.
+        Asset uploads can stream their content from files.
+    """
+
+    def __init__(self, base_url: str, concurrency: int = 32, timeout: float = 30.0, token: str = None,
+                 limiter: AdaptiveLimiter = None):
+        """
+            :param concurrency: the most requests in flight. An AdaptiveLimiter,
+            if given, can hold this lower.
+        """
+        self.client = AnnotatronClient(base_url, pool_size=concurrency, timeout=timeout, token=token,
+                                       limiter=limiter)
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._semaphore = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def close(self):
+        # Waiting for the workers would block the event loop, so it's done on another thread.
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(self.executor.shutdown, wait=True))
+        self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _call(self, func, *args, **kwargs):
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def request(self, method: str, path: str, body=None, **kwargs):
+        return await self._call(self.client.request, method, path, body, **kwargs)
+
+    async def login(self, username: str, password: str):
+        return await self._call(self.client.login, username, password)
+
+    async def current_user(self):
+        return await self._call(self.client.current_user)
+
+    async def get_user(self, id: int):
+        return await self._call(self.client.get_user, id)
+
+    async def create_user(self, user):
+        return await self._call(self.client.create_user, user)
+
+    async def create_corpus(self, corpus):
+        return await self._call(self.client.create_corpus, corpus)
+
+    async def get_corpus(self, id: int):
+        return await self._call(self.client.get_corpus, id)
+
+    async def upload_asset(self, asset: BinaryAsset, content=None, chunk_size: int = BASE64_CHUNK_SIZE,
+                           raw: bool = False):
+        return await self._call(self.client.upload_asset, asset, content, chunk_size, raw)
+
+    async def download_asset_content(self, id: int, dst, chunk_size: int = RAW_CHUNK_SIZE, raw: bool = True):
+        return await self._call(self.client.download_asset_content, id, dst, chunk_size, raw)
+
+    async def put_asset_raw(self, id: int, content, chunk_size: int = RAW_CHUNK_SIZE):
+        return await self._call(self.client.put_asset_raw, id, content, chunk_size)
+
+    async def get_asset(self, id: int):
+        return await self._call(self.client.get_asset, id)
+
+    async def get_asset_content(self, id: int, lazy: bool = False):
+        return await self._call(self.client.get_asset_content, id, lazy)
+
+    async def link_asset(self, link: AssetCorpusLink):
+        return await self._call(self.client.link_asset, link)
+
+    async def create_question(self, question):
+        return await self._call(self.client.create_question, question)
+
+    async def get_question(self, id: int):
+        return await self._call(self.client.get_question, id)
+
+    async def create_assignment(self, assignment):
+        return await self._call(self.client.create_assignment, assignment)
+
+    async def get_assignment(self, id: int):
+        return await self._call(self.client.get_assignment, id)
+
+    async def submit_responses(self, items) -> list:
+        return await self._call(self.client.submit_responses, items)
+
+    async def iter_pages(self, path: str, from_json, page_size: int = 100, params: dict = None):
+        """
+            Async-iterates over a paginated endpoint, decoding each item with
+            from_json. The next page is fetched while the caller works through
+            the current one.
+        """
+        fetch_page = self.client._page_fetcher(path, from_json, page_size, params)
+        pending = asyncio.ensure_future(self._call(fetch_page, 0))
+        try:
+            while pending is not None:
+                items, page = await pending
+                pending = asyncio.ensure_future(self._call(fetch_page, page)) if page is not None else None
+                for item in items:
+                    yield item
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    def iter_assignments(self, corpus_id: int = None, page_size: int = 100):
+        params = {"corpus": corpus_id} if corpus_id is not None else None
+        return self.iter_pages("/v1/assignments/", Assignment.from_json, page_size, params)
+
+    def iter_corpus_assets(self, corpus_id: int, page_size: int = 100):
+        return self.iter_pages("/v1/corpus/%d/assets" % corpus_id, BinaryAssetDescription.from_json, page_size)
+
+    async def upload_assets(self, assets, return_exceptions: bool = False, raw: bool = False) -> list:
+        """
+            Uploads assets concurrently.
+            :return: SuccessfulInsert objects, in the same order as assets.
+        """
+        return await asyncio.gather(*[self.upload_asset(asset, raw=raw) for asset in assets],
+                                    return_exceptions=return_exceptions)
+
+    async def get_assignments(self, ids, return_exceptions: bool = False) -> list:
+        return await asyncio.gather(*[self.get_assignment(id) for id in ids], return_exceptions=return_exceptions)
+
+    async def upload_and_link(self, corpus_id: int, named_assets, return_exceptions: bool = False,
+                              raw: bool = False) -> list:
+        """
+            Uploads assets and links each one into a corpus as soon as its upload finishes.
+            :param named_assets: (unique_name, asset) or (unique_name, asset, content) tuples,
+            where content is an optional path or file object to stream from.
+            :return: The SuccessfulInsert for each link, in the same order as named_assets.
+        """
+        async def upload_and_link_one(unique_name, asset, content=None):
+            asset_id = (await self.upload_asset(asset, content, raw=raw)).id
+            return await self.link_asset(AssetCorpusLink(unique_name, asset_id, corpus_id))
+
+        return await asyncio.gather(*[upload_and_link_one(*item) for item in named_assets],
+                                    return_exceptions=return_exceptions)
@@ -0,0 +1,178 @@
+"""
+    Inter-annotator agreement for multiple choice annotations: Cohen's kappa
+    (per annotator pair), Fleiss' kappa and Krippendorff's alpha (nominal).
+
+    Statistics are computed from a ChoiceMatrix, so an annotation with several
+    choices counts as a fractional vote for each of them.
+"""
+from collections import defaultdict
+from itertools import combinations
+from operator import add, mul, sub, truediv
+
+from .aggregation import ChoiceMatrix, group_annotations
+
+
+class AgreementStatistics:
+    """
+        Agreement statistics for the annotations in one ChoiceMatrix, i.e. one
+        summary code. Items rated by fewer than two annotators are ignored.
+    """
+
+    def __init__(self, matrix: ChoiceMatrix):
+        self.matrix = matrix
+        self.summary_code = matrix.summary_code
+        # counts[c][u]: the votes for label c on item u.
+        self.counts = matrix.counts()
+        self.raters = list(map(sum, zip(*self.counts))) if self.counts else []
+        self._pairs = None
+
+    def _pairable(self):
+        """
+            :return: the per-label counts and rater totals of items with at least two raters.
+        """
+        keep = [m >= 2 for m in self.raters]
+        return ([[n for n, k in zip(column, keep) if k] for column in self.counts],
+                [m for m, k in zip(self.raters, keep) if k])
+
+    def fleiss_kappa(self) -> float:
+        """
+            Fleiss' kappa, allowing the number of raters to vary between items.
+        """
+        counts, raters = self._pairable()
+        if not raters:
+            return float("nan")
+        # P_u = (sum_c n_uc^2 - m_u) / (m_u (m_u - 1))
+        squares = [0.0] * len(raters)
+        for column in counts:
+            squares = list(map(add, squares, map(mul, column, column)))
+        p_o = sum(map(truediv, map(sub, squares, raters), map(mul, raters, map(sub, raters, [1] * len(raters)))))
+        p_o /= len(raters)
+        total = sum(raters)
+        p_e = sum((sum(column) / total) ** 2 for column in counts)
+        return (p_o - p_e) / (1 - p_e) if p_e != 1 else float("nan")
+
+    def krippendorff_alpha(self) -> float:
+        """
+            Krippendorff's alpha for nominal data.
+        """
+        counts, raters = self._pairable()
+        n = sum(raters)
+        if n <= 1:
+            return float("nan")
+        # The coincidence matrix diagonal: o_cc = sum_u n_uc (n_uc - 1) / (m_u - 1)
+        denominators = [m - 1 for m in raters]
+        agreeing = sum(sum(map(truediv, map(mul, column, [x - 1 for x in column]), denominators))
+                       for column in counts)
+        totals = [sum(column) for column in counts]
+        d_o = 1 - agreeing / n
+        d_e = 1 - sum(t * (t - 1) for t in totals) / (n * (n - 1))
+        return 1 - d_o / d_e if d_e != 0 else float("nan")
+
+    def pair_tables(self) -> dict:
+        """
+            :return: (annotator, annotator) -> a labels x labels table of the
+            votes they gave on items they both rated.
+        """
+        if self._pairs is None:
+            n_labels = len(self.matrix.labels)
+            codes, weights, ptr = self.matrix.by_item()
+            tables = defaultdict(lambda: [0.0] * (n_labels * n_labels))
+            for u in range(len(ptr) - 1):
+                lo, hi = ptr[u], ptr[u + 1]
+                if hi - lo < 2:
+                    continue
+                observations = sorted(zip(codes[lo:hi], weights[lo:hi] if weights is not None else [1.0] * (hi - lo)))
+                for (x, wx), (y, wy) in combinations(observations, 2):
+                    a, b = divmod(x, n_labels), divmod(y, n_labels)
+                    if a[0] != b[0]:
+                        tables[a[0], b[0]][a[1] * n_labels + b[1]] += wx * wy
+            annotators = self.matrix.annotators
+            self._pairs = {(annotators[a], annotators[b]): table for (a, b), table in tables.items()}
+        return self._pairs
+
+    def _table(self, a, b):
+        n_labels = len(self.matrix.labels)
+        table = self.pair_tables().get((a, b))
+        if table is not None:
+            return table
+        table = self.pair_tables().get((b, a))
+        if table is None:
+            return None
+        return [table[j * n_labels + i] for i in range(n_labels) for j in range(n_labels)]
+
+    def _kappa(self, table) -> float:
+        n_labels = len(self.matrix.labels)
+        total = sum(table)
+        if not total:
+            return float("nan")
+        rows = [sum(table[i * n_labels:(i + 1) * n_labels]) for i in range(n_labels)]
+        columns = [sum(table[i::n_labels]) for i in range(n_labels)]
+        p_o = sum(table[i * n_labels + i] for i in range(n_labels)) / total
+        p_e = sum(map(mul, rows, columns)) / (total * total)
+        return (p_o - p_e) / (1 - p_e) if p_e != 1 else float("nan")
+
+    def cohens_kappa(self, a, b) -> float:
+        """
+            Cohen's kappa between annotators a and b, over the items they both rated.
+        """
+        table = self._table(a, b)
+        return self._kappa(table) if table is not None else float("nan")
+
+    def pairwise_cohens_kappa(self) -> dict:
+        return {pair: self._kappa(table) for pair, table in self.pair_tables().items()}
+
+    def annotator_breakdown(self) -> dict:
+        """
+            :return: annotator -> {"items", "comparisons", "observedAgreement",
+            "meanCohensKappa"}, where comparisons counts the (weighted) votes
+            compared with other annotators' on the same items, and the mean
+            kappa is weighted by those comparisons.
+        """
+        n_labels = len(self.matrix.labels)
+        items = defaultdict(set)
+        for item, annotator in zip(self.matrix.obs_item, self.matrix.obs_annotator):
+            items[annotator].add(item)
+        ret = {annotator: {"items": len(items[i]), "comparisons": 0.0, "observedAgreement": float("nan"),
+                           "meanCohensKappa": float("nan")}
+               for i, annotator in enumerate(self.matrix.annotators)}
+        agreeing = defaultdict(float)
+        kappa = defaultdict(float)
+        kappa_weight = defaultdict(float)
+        for pair, table in self.pair_tables().items():
+            total = sum(table)
+            same = sum(table[i * n_labels + i] for i in range(n_labels))
+            pair_kappa = self._kappa(table)
+            for annotator in pair:
+                ret[annotator]["comparisons"] += total
+                agreeing[annotator] += same
+                if pair_kappa == pair_kappa:
+                    kappa[annotator] += total * pair_kappa
+                    kappa_weight[annotator] += total
+        for annotator, stats in ret.items():
+            if stats["comparisons"]:
+                stats["observedAgreement"] = agreeing[annotator] / stats["comparisons"]
+            if kappa_weight[annotator]:
+                stats["meanCohensKappa"] = kappa[annotator] / kappa_weight[annotator]
+        return ret
+
+    def to_json(self) -> dict:
+        return {
+            "summaryCode": self.summary_code,
+            "items": len(self.matrix.items),
+            "annotators": len(self.matrix.annotators),
+            "fleissKappa": self.fleiss_kappa(),
+            "krippendorffAlpha": self.krippendorff_alpha(),
+            "annotatorBreakdown": {str(k): v for k, v in self.annotator_breakdown().items()},
+        }
+
+
+def agreement(observations, labels: dict = None) -> dict:
+    """
+        Computes agreement statistics per summary code.
+        :param observations: (item, annotator, annotation) triples; see
+        aggregation.assignment_observations to get them from Assignments, keyed
+        by assigned_annotator_id.
+        :return: summary_code -> AgreementStatistics
+    """
+    return {summary_code: AgreementStatistics(matrix)
+            for summary_code, matrix in group_annotations(observations, labels).items()}
@@ -0,0 +1,206 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from .models import Question, Corpus, BinaryAssetDescription
+
+
+class CacheEntry:
+    __slots__ = ('value', 'json', 'etag', 'last_modified', 'expires', 'size')
+
+    def __init__(self, value, json_dict, etag, last_modified, expires: float):
+        self.value = value
+        self.json = json_dict
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+        self.size = len(json.dumps(json_dict))
+
+    def to_record(self) -> dict:
+        return {"json": self.json, "etag": self.etag, "lastModified": self.last_modified, "expires": self.expires}
+
+
+class LRUCache:
+    """
+        Thread-safe in-memory LRU, evicting by the encoded size of its entries.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.evictions = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: CacheEntry):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self.entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_size and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted.size
+                self.evictions += 1
+
+    def remove(self, key):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+
+
+class DiskCache:
+    """
+        Stores cache records as JSON files, one per object, in directory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key) -> str:
+        kind, id = key
+        return os.path.join(self.directory, "%s-%d.json" % (kind, id))
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf8") as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, record: dict):
+        # Write to a temporary file and rename it, so readers never see a partial record.
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf8") as fp:
+            json.dump(record, fp)
+        os.replace(tmp, self._path(key))
+
+    def remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class CachingClient:
+    """
+        Caches Questions, Corpora and BinaryAssetDescriptions fetched through an
+        AnnotatronClient.
+
+        Objects live in an in-memory LRU and, optionally, on disk in their
+        to_json form. Once an entry's TTL runs out it is revalidated with a
+        conditional request, so unchanged objects aren't downloaded again.
+        Cached objects are shared between callers and shouldn't be modified.
+    """
+
+    KINDS = {
+        "question": ("/v1/questions/%d", Question.from_json),
+        "corpus": ("/v1/corpus/%d", Corpus.from_json),
+        "asset": ("/v1/assets/%d", BinaryAssetDescription.from_json),
+    }
+
+    # Seconds before an entry is revalidated, per kind.
+    DEFAULT_TTLS = {
+        "question": 600.0,
+        "corpus": 600.0,
+        "asset": 300.0,
+    }
+
+    def __init__(self, client, max_size: int = 64 * 1024 * 1024, directory: str = None, ttls: dict = None):
+        self.client = client
+        self.memory = LRUCache(max_size)
+        self.disk = DiskCache(directory) if directory is not None else None
+        self.ttls = dict(self.DEFAULT_TTLS, **(ttls or {}))
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.refreshed = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "diskHits": self.disk_hits,
+            "misses": self.misses,
+            "notModified": self.not_modified,
+            "refreshed": self.refreshed,
+            "evictions": self.memory.evictions,
+            "entries": len(self.memory),
+            "size": self.memory.size,
+        }
+
+    def _count(self, name: str):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _store(self, key, entry: CacheEntry):
+        self.memory.put(key, entry)
+        if self.disk is not None:
+            self.disk.put(key, entry.to_record())
+
+    def get(self, kind: str, id: int):
+        key = (kind, id)
+        path, from_json = self.KINDS[kind]
+        now = time.time()
+
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            record = self.disk.get(key)
+            if record is not None:
+                entry = CacheEntry(from_json(record["json"]), record["json"], record["etag"],
+                                   record["lastModified"], record["expires"])
+                self.memory.put(key, entry)
+                if entry.expires > now:
+                    self._count("disk_hits")
+        if entry is not None and entry.expires > now:
+            self._count("hits")
+            return entry.value
+
+        if entry is None:
+            self._count("misses")
+            json_dict, etag, last_modified = self.client.get_conditional(path % id)
+        else:
+            json_dict, etag, last_modified = self.client.get_conditional(path % id, entry.etag,
+                                                                         entry.last_modified)
+        expires = time.time() + self.ttls[kind]
+        if json_dict is None:
+            self._count("not_modified")
+            entry = CacheEntry(entry.value, entry.json, etag, last_modified, expires)
+        else:
+            if entry is not None:
+                self._count("refreshed")
+            entry = CacheEntry(from_json(json_dict), json_dict, etag, last_modified, expires)
+        self._store(key, entry)
+        return entry.value
+
+    def invalidate(self, kind: str, id: int):
+        key = (kind, id)
+        self.memory.remove(key)
+        if self.disk is not None:
+            self.disk.remove(key)
+
+    def get_question(self, id: int):
+        return self.get("question", id)
+
+    def get_corpus(self, id: int) -> Corpus:
+        return self.get("corpus", id)
+
+    def get_asset(self, id: int) -> BinaryAssetDescription:
+        return self.get("asset", id)
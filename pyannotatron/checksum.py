@@ -0,0 +1,82 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .models import FieldError, ValidationError
+
+# Annotatron stores asset checksums as sha512 hex digests.
+DEFAULT_ALGORITHM = "sha512"
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class HashingWriter:
+    """
+        Wraps a binary file object, hashing everything written through it.
+
+        Pass one to BinaryAsset.read_json to checksum content as it's decoded.
+    """
+
+    def __init__(self, dst=None, algorithm: str = DEFAULT_ALGORITHM):
+        self.dst = dst
+        self.hash = hashlib.new(algorithm)
+
+    def write(self, data):
+        self.hash.update(data)
+        if self.dst is not None:
+            self.dst.write(data)
+        return len(data)
+
+    def hexdigest(self) -> str:
+        return self.hash.hexdigest()
+
+
+def checksum_content(content, algorithm: str = DEFAULT_ALGORITHM, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+        Returns the hex digest of content, which can be bytes, a path or a binary file object.
+    """
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        return hashlib.new(algorithm, content).hexdigest()
+    if isinstance(content, (str, os.PathLike)):
+        with open(content, "rb") as src:
+            return checksum_content(src, algorithm, chunk_size)
+    writer = HashingWriter(algorithm=algorithm)
+    while True:
+        data = content.read(chunk_size)
+        if not data:
+            return writer.hexdigest()
+        writer.write(data)
+
+
+def checksum_error(expected: str, actual: str):
+    """
+        Returns a ValidationError if the checksums differ, otherwise None.
+    """
+    if expected is not None and expected.lower() == actual.lower():
+        return None
+    return ValidationError([FieldError("checksum", "expected %s, computed %s" % (expected, actual), False)])
+
+
+def verify_asset(asset, content=None, algorithm: str = DEFAULT_ALGORITHM):
+    """
+        Checks asset.checksum against its content, or against content if given
+        (bytes, a path or a binary file object).
+        :return: None if the checksum matches, otherwise a ValidationError.
+    """
+    if content is None:
+        content = asset.content
+    return checksum_error(asset.checksum, checksum_content(content, algorithm))
+
+
+def verify_assets(assets, contents=None, algorithm: str = DEFAULT_ALGORITHM, max_workers: int = None) -> list:
+    """
+        Verifies a batch of assets on a thread pool (hashlib releases the GIL
+        while hashing).
+        :param contents: optional list of content sources, parallel to assets.
+        :return: A list parallel to assets, holding None or a ValidationError.
+    """
+    assets = list(assets)
+    if contents is None:
+        contents = [None] * len(assets)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(lambda pair: verify_asset(pair[0], pair[1], algorithm), zip(assets, contents)))
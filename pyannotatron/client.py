@@ -0,0 +1,482 @@
+import io
+import json
+import os
+import queue
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING as URLLIB3_ENCODINGS
+
+from .models import LoginRequest, LoginResponse, Corpus, BinaryAsset, BinaryAssetDescription, AssetCorpusLink
+from .models import Question, Assignment, AnnotatronUser, NewUserRequest, SuccessfulInsert, ValidationError
+from .compression import COMPRESSION_THRESHOLD, accept_encoding, choose_encoding, compress, decompress
+from .compression import decompressing_reader
+from .limiter import AdaptiveLimiter
+from .utils import BASE64_CHUNK_SIZE
+
+RAW_CHUNK_SIZE = 1024 * 1024
+
+
+class AnnotatronAPIError(Exception):
+    """
+        Raised when the server rejects a request. validation holds the
+        server's ValidationError, if it sent one.
+    """
+
+    def __init__(self, status: int, message: str, validation: ValidationError = None):
+        super().__init__("HTTP %d: %s" % (status, message))
+        self.status = status
+        self.validation = validation
+
+    @classmethod
+    def from_response(cls, status: int, body):
+        if isinstance(body, list):
+            try:
+                validation = ValidationError.from_json(body)
+            except (TypeError, KeyError):
+                validation = None
+            else:
+                return cls(status, "; ".join("%s: %s" % (e.name, e.error) for e in validation), validation)
+        if isinstance(body, dict) and "error" in body:
+            return cls(status, body["error"])
+        return cls(status, str(body))
+
+
+class _PageFetcher:
+    """
+        The state shared between a PrefetchingPageIterator and its background
+        thread. The thread only references this, never the iterator, so an
+        abandoned iterator can still be garbage-collected, which stops the thread.
+    """
+
+    def __init__(self, fetch_page, prefetch: int):
+        self.fetch_page = fetch_page
+        self.queue = queue.Queue(maxsize=prefetch)
+        self.stopped = threading.Event()
+
+    def _put(self, item) -> bool:
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(self):
+        page = 0
+        try:
+            while page is not None and not self.stopped.is_set():
+                items, page = self.fetch_page(page)
+                if not self._put(("items", items)):
+                    return
+            self._put(("done", None))
+        except Exception as e:
+            self._put(("error", e))
+
+    def stop(self):
+        self.stopped.set()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+class IncompleteUploadError(Exception):
+    """
+        Raised when an asset was created but uploading its raw content then
+        failed. asset_id is the asset left without content, so the upload can
+        be retried with put_asset_raw; cause is the original error.
+    """
+
+    def __init__(self, asset_id: int, cause: Exception):
+        super().__init__("asset %d was created, but uploading its content failed: %s" % (asset_id, cause))
+        self.asset_id = asset_id
+        self.cause = cause
+
+
+class PrefetchingPageIterator:
+    """
+        Iterates over the items of a paginated endpoint, fetching and decoding
+        upcoming pages on a background thread while the caller works through
+        the current one.
+
+        At most prefetch decoded pages wait in the queue; once it's full the
+        background thread blocks, so a slow consumer can't cause unbounded
+        buffering. The thread stops when the iterator is exhausted, fails,
+        is closed, or is garbage-collected after being abandoned.
+    """
+
+    def __init__(self, fetch_page, prefetch: int = 2):
+        """
+            :param fetch_page: called with a page number, returns (items, next_page),
+            where next_page is None after the last page.
+        """
+        assert prefetch >= 1
+        self.fetcher = _PageFetcher(fetch_page, prefetch)
+        self.current = iter(())
+        self.finished = False
+        self.thread = threading.Thread(target=self.fetcher.run, daemon=True)
+        self.thread.start()
+        self._finalizer = weakref.finalize(self, self.fetcher.stop)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            for item in self.current:
+                return item
+            if self.finished:
+                raise StopIteration
+            kind, value = self.fetcher.queue.get()
+            if kind == "items":
+                self.current = iter(value)
+            elif kind == "done":
+                self.close()
+            else:
+                self.close()
+                raise value
+
+    def close(self):
+        """
+            Stops prefetching and discards anything buffered.
+        """
+        self.finished = True
+        self.current = iter(())
+        self._finalizer()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _CountingWriter:
+
+    def __init__(self, dst):
+        self.dst = dst
+        self.total = 0
+
+    def write(self, data):
+        self.total += len(data)
+        return self.dst.write(data)
+
+
+class AnnotatronClient:
+    """
+        Blocking client for the Annotatron API.
+
+        All requests go through one requests.Session, whose connection pool
+        keeps connections to the server alive between calls.
+    """
+
+    # Statuses meaning the server doesn't offer raw content transfer.
+    RAW_UNSUPPORTED = (404, 405, 415)
+
+    def __init__(self, base_url: str, pool_size: int = 10, timeout: float = 30.0, token: str = None,
+                 limiter: AdaptiveLimiter = None, compression: bool = True,
+                 compression_threshold: int = COMPRESSION_THRESHOLD):
+        """
+            :param limiter: an AdaptiveLimiter bounding requests in flight. It can be
+            shared between clients and threads to limit a whole process.
+            :param compression: compress JSON request bodies of at least
+            compression_threshold bytes, and accept compressed responses.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.limiter = limiter
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        # Coding the server accepts for request bodies: None until it says,
+        # False if it accepts none.
+        self.request_encoding = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = accept_encoding() if compression else "identity"
+        self.token = None
+        # Whether the server supports raw content transfer, None until we find out.
+        self.raw_transfer = None
+        if token is not None:
+            self.set_token(token)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def set_token(self, token: str):
+        self.token = token
+        self.session.headers["Authorization"] = "Token %s" % token
+
+    def _send(self, method: str, path: str, **kwargs) -> requests.Response:
+        start = self.limiter.acquire() if self.limiter is not None else None
+        status = retry_after = None
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            status = response.status_code
+            try:
+                retry_after = float(response.headers.get("Retry-After"))
+            except (TypeError, ValueError):
+                pass
+        finally:
+            if self.limiter is not None:
+                # With stream=True the slot is freed once the headers arrive.
+                self.limiter.release(start, status, retry_after)
+        accepted = response.headers.get("Accept-Encoding")
+        if self.compression and accepted is not None:
+            self.request_encoding = choose_encoding(accepted) or False
+        return response
+
+    def request(self, method: str, path: str, body=None, **kwargs):
+        """
+            Sends a request and returns the decoded JSON response.
+            :raises AnnotatronAPIError: if the server returns an error status.
+        """
+        if body is None:
+            response = self._send(method, path, **kwargs)
+            return self._decode(response.status_code, self._content(response))
+        data = json.dumps(body).encode("utf8")
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["Content-Type"] = "application/json"
+        encoding = None
+        if self.compression and len(data) >= self.compression_threshold and self.request_encoding is not False:
+            encoding = self.request_encoding or "gzip"
+        if encoding is not None:
+            response = self._send(method, path, data=compress(data, encoding),
+                                  headers=dict(headers, **{"Content-Encoding": encoding}), **kwargs)
+            if response.status_code != 415:
+                return self._decode(response.status_code, self._content(response))
+            self.request_encoding = False
+        response = self._send(method, path, data=data, headers=headers, **kwargs)
+        return self._decode(response.status_code, self._content(response))
+
+    def get_conditional(self, path: str, etag: str = None, last_modified: str = None):
+        """
+            Sends a conditional GET using the validators from an earlier response.
+            :return: (json, etag, last_modified), where json is None if the server
+            replied 304 Not Modified.
+        """
+        headers = {}
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+        response = self._send("GET", path, headers=headers)
+        etag = response.headers.get("ETag", etag)
+        last_modified = response.headers.get("Last-Modified", last_modified)
+        if response.status_code == 304:
+            return None, etag, last_modified
+        return self._decode(response.status_code, self._content(response)), etag, last_modified
+
+    @staticmethod
+    def _undecoded_encoding(response: requests.Response):
+        """
+            urllib3 decodes the response codings it supports itself; returns
+            the response's coding if it isn't one of them (zstd, unless urllib3
+            has its own zstd support), so that it has to be decoded here.
+        """
+        encoding = (response.headers.get("Content-Encoding") or "").strip().lower()
+        if encoding in ("", "identity") or encoding in URLLIB3_ENCODINGS.split(","):
+            return None
+        return encoding
+
+    def _content(self, response: requests.Response) -> bytes:
+        encoding = self._undecoded_encoding(response)
+        return response.content if encoding is None else decompress(response.content, encoding)
+
+    @staticmethod
+    def _decode(status: int, content: bytes):
+        try:
+            ret = json.loads(content.decode("utf8")) if content else None
+        except ValueError:
+            ret = content.decode("utf8", "replace")
+        if status >= 400:
+            raise AnnotatronAPIError.from_response(status, ret)
+        return ret
+
+    def login(self, username: str, password: str) -> LoginResponse:
+        ret = LoginResponse.from_json(self.request("POST", "/v1/auth/token", LoginRequest(username, password).to_json()))
+        self.set_token(ret.token)
+        return ret
+
+    def current_user(self) -> AnnotatronUser:
+        return AnnotatronUser.from_json(self.request("GET", "/v1/users/me"))
+
+    def get_user(self, id: int) -> AnnotatronUser:
+        return AnnotatronUser.from_json(self.request("GET", "/v1/users/%d" % id))
+
+    def create_user(self, user: NewUserRequest) -> SuccessfulInsert:
+        return SuccessfulInsert.from_json(self.request("POST", "/v1/users/", user.to_json()))
+
+    def create_corpus(self, corpus: Corpus) -> SuccessfulInsert:
+        return SuccessfulInsert.from_json(self.request("POST", "/v1/corpus/", corpus.to_json()))
+
+    def get_corpus(self, id: int) -> Corpus:
+        return Corpus.from_json(self.request("GET", "/v1/corpus/%d" % id))
+
+    def upload_asset(self, asset: BinaryAsset, content=None, chunk_size: int = BASE64_CHUNK_SIZE,
+                     raw: bool = False) -> SuccessfulInsert:
+        """
+            :param content: a path or binary file object to stream the asset's
+            content from, instead of building the whole JSON body in memory.
+            In raw mode this can also be bytes or a memoryview.
+            :param raw: send the metadata as JSON and the content as a separate
+            octet-stream body, avoiding base64. Falls back to JSON if the server
+            doesn't support it.
+            :raises IncompleteUploadError: if the raw content upload fails after
+            the asset was created.
+        """
+        if raw and self.raw_transfer is not False:
+            description = asset.describe() if isinstance(asset, BinaryAsset) else asset
+            if content is None:
+                content = asset.content
+            try:
+                ret = SuccessfulInsert.from_json(self.request("POST", "/v1/assets/", description.to_json(),
+                                                              params={"contentTransfer": "raw"}))
+            except AnnotatronAPIError as e:
+                if e.status not in self.RAW_UNSUPPORTED:
+                    raise
+                self.raw_transfer = False
+            else:
+                self.raw_transfer = True
+                try:
+                    self.put_asset_raw(ret.id, content, chunk_size)
+                except Exception as e:
+                    raise IncompleteUploadError(ret.id, e) from e
+                return ret
+        if not isinstance(asset, BinaryAsset):
+            asset = BinaryAsset(None, asset.mime_type, asset.type_description, asset.copyright, asset.checksum,
+                                asset.uploader_id, asset.date_uploaded, asset.id, asset.metadata)
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            content = io.BytesIO(content)
+        if content is None:
+            return SuccessfulInsert.from_json(self.request("POST", "/v1/assets/", asset.to_json()))
+        body = (text.encode("utf8") for text in asset.iter_json(content, chunk_size))
+        return SuccessfulInsert.from_json(self.request("POST", "/v1/assets/", data=body,
+                                                       headers={"Content-Type": "application/json"}))
+
+    def put_asset_raw(self, id: int, content, chunk_size: int = RAW_CHUNK_SIZE):
+        """
+            Uploads an asset's content as a raw octet-stream body. content can be a
+            path, a binary file object, bytes or a memoryview; nothing is copied
+            into an intermediate buffer.
+        """
+        headers = {"Content-Type": "application/octet-stream"}
+        if isinstance(content, (str, os.PathLike)):
+            with open(content, "rb") as src:
+                return self.request("PUT", "/v1/assets/%d/raw" % id, data=src, headers=headers)
+        if isinstance(content, (bytearray, memoryview)):
+            view = memoryview(content).cast("B")
+            content = (view[i:i + chunk_size] for i in range(0, len(view), chunk_size))
+        return self.request("PUT", "/v1/assets/%d/raw" % id, data=content, headers=headers)
+
+    def download_asset_content(self, id: int, dst, chunk_size: int = RAW_CHUNK_SIZE, raw: bool = True) -> int:
+        """
+            Streams an asset's content into dst (a path or binary file object),
+            as a raw octet-stream if the server supports it, otherwise by decoding
+            the JSON form incrementally.
+            :return: The number of bytes written.
+        """
+        if isinstance(dst, (str, os.PathLike)):
+            with open(dst, "wb") as fp:
+                return self.download_asset_content(id, fp, chunk_size, raw)
+        raw_failed = False
+        if raw and self.raw_transfer is not False:
+            with self._send("GET", "/v1/assets/%d/raw" % id, stream=True) as response:
+                if response.status_code < 400:
+                    total = 0
+                    for data in response.iter_content(chunk_size):
+                        dst.write(data)
+                        total += len(data)
+                    return total
+                if response.status_code not in self.RAW_UNSUPPORTED:
+                    self._decode(response.status_code, self._content(response))
+                raw_failed = True
+        with self._send("GET", "/v1/assets/%d/content" % id, stream=True) as response:
+            if response.status_code >= 400:
+                self._decode(response.status_code, self._content(response))
+            if raw_failed:
+                # The asset exists, so it was the raw endpoint that's missing.
+                self.raw_transfer = False
+            encoding = self._undecoded_encoding(response)
+            src = response.raw
+            if encoding is None:
+                src.decode_content = True
+            else:
+                src = decompressing_reader(src, encoding)
+            decoder = _CountingWriter(dst)
+            BinaryAsset.read_json(src, decoder, chunk_size)
+            return decoder.total
+
+    def get_asset(self, id: int) -> BinaryAssetDescription:
+        return BinaryAssetDescription.from_json(self.request("GET", "/v1/assets/%d" % id))
+
+    def get_asset_content(self, id: int, lazy: bool = False) -> BinaryAsset:
+        return BinaryAsset.from_json(self.request("GET", "/v1/assets/%d/content" % id), lazy=lazy)
+
+    def link_asset(self, link: AssetCorpusLink) -> SuccessfulInsert:
+        return SuccessfulInsert.from_json(self.request("POST", "/v1/corpus/%d/assets" % link.corpus_id,
+                                                       link.to_json()))
+
+    def create_question(self, question) -> SuccessfulInsert:
+        return SuccessfulInsert.from_json(self.request("POST", "/v1/questions/", question.to_json()))
+
+    def get_question(self, id: int):
+        return Question.from_json(self.request("GET", "/v1/questions/%d" % id))
+
+    def create_assignment(self, assignment: Assignment) -> SuccessfulInsert:
+        return SuccessfulInsert.from_json(self.request("POST", "/v1/assignments/", assignment.to_json()))
+
+    def get_assignment(self, id: int) -> Assignment:
+        return Assignment.from_json(self.request("GET", "/v1/assignments/%d" % id))
+
+    def iter_pages(self, path: str, from_json, page_size: int = 100, prefetch: int = 2,
+                   params: dict = None) -> PrefetchingPageIterator:
+        """
+            Iterates over a paginated endpoint, decoding each item with from_json.
+            :param prefetch: the number of decoded pages to buffer ahead of the caller.
+        """
+        return PrefetchingPageIterator(self._page_fetcher(path, from_json, page_size, params), prefetch)
+
+    def _page_fetcher(self, path: str, from_json, page_size: int, params: dict = None):
+        """
+            :return: A function taking a page number and returning (items, next_page).
+        """
+        def fetch_page(page):
+            query = dict(params or {}, page=page, pageSize=page_size)
+            ret = self.request("GET", path, params=query)
+            return [from_json(item) for item in ret["items"]], ret["nextPage"]
+
+        return fetch_page
+
+    def iter_assignments(self, corpus_id: int = None, page_size: int = 100,
+                         prefetch: int = 2) -> PrefetchingPageIterator:
+        params = {"corpus": corpus_id} if corpus_id is not None else None
+        return self.iter_pages("/v1/assignments/", Assignment.from_json, page_size, prefetch, params)
+
+    def iter_corpus_assets(self, corpus_id: int, page_size: int = 100,
+                           prefetch: int = 2) -> PrefetchingPageIterator:
+        return self.iter_pages("/v1/corpus/%d/assets" % corpus_id, BinaryAssetDescription.from_json,
+                               page_size, prefetch)
+
+    def submit_responses(self, items) -> list:
+        """
+            Submits a batch of AssignmentResponses in one request.
+            :param items: (assignment_id, AssignmentResponse) pairs.
+            :return: A SuccessfulInsert or ValidationError for each item, in order.
+        """
+        body = [{"assignmentId": assignment_id, "response": response.to_json()} for assignment_id, response in items]
+        return [ValidationError.from_json(result) if isinstance(result, list) else SuccessfulInsert.from_json(result)
+                for result in self.request("POST", "/v1/assignments/responses", body)]
@@ -0,0 +1,93 @@
+"""
+    Content codings for request and response bodies.
+
+    gzip is always available; zstd is offered when the zstandard package is
+    installed.
+"""
+import gzip
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies smaller than this are sent uncompressed.
+COMPRESSION_THRESHOLD = 1024
+
+
+def _gzip_compress(data: bytes, level: int = None) -> bytes:
+    # mtime=0 keeps the output deterministic.
+    return gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+
+
+CODECS = {
+    "gzip": (_gzip_compress, gzip.decompress),
+}
+
+if zstandard is not None:
+    def _zstd_compress(data: bytes, level: int = None) -> bytes:
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+    def _zstd_decompress(data: bytes) -> bytes:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+    CODECS["zstd"] = (_zstd_compress, _zstd_decompress)
+
+# Most preferred first.
+PREFERENCE = [name for name in ("zstd", "gzip") if name in CODECS]
+
+
+def compress(data: bytes, encoding: str, level: int = None) -> bytes:
+    return CODECS[encoding][0](data, level)
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    """
+        :raises KeyError: if encoding isn't supported.
+    """
+    if encoding in (None, "", "identity"):
+        return data
+    return CODECS[encoding.strip().lower()][1](data)
+
+
+def decompressing_reader(fp, encoding: str):
+    """
+        Wraps a binary file object so that reading it returns decompressed data.
+        :raises KeyError: if encoding isn't supported.
+    """
+    encoding = encoding.strip().lower()
+    if encoding not in CODECS:
+        raise KeyError(encoding)
+    if encoding == "gzip":
+        return gzip.GzipFile(fileobj=fp, mode="rb")
+    return zstandard.ZstdDecompressor().stream_reader(fp)
+
+
+def accept_encoding() -> str:
+    """
+        Returns an Accept-Encoding header value listing the supported codings.
+    """
+    return ", ".join(PREFERENCE)
+
+
+def choose_encoding(header: str):
+    """
+        Picks the most preferred supported coding from an Accept-Encoding
+        header, or returns None if there isn't one.
+    """
+    if not header:
+        return None
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().lower().partition(";")
+        params = params.replace(" ", "")
+        try:
+            if params.startswith("q=") and float(params[2:]) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.strip())
+    for name in PREFERENCE:
+        if name in accepted or "*" in accepted:
+            return name
+    return None
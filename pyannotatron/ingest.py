@@ -0,0 +1,236 @@
+import contextlib
+import datetime
+import mimetypes
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .checksum import checksum_content
+from .client import AnnotatronAPIError
+from .models import AssetCorpusLink, BinaryAsset, BinaryAssetKind
+
+
+class ChecksumIndex:
+    """
+        Persistent checksum -> asset id index, stored in SQLite.
+
+        The database runs in WAL mode with a busy timeout, so several ingest
+        processes can share one index file. Use one index per server. To keep
+        processes from uploading the same content twice, an upload is claimed
+        first (see claim), and other processes wait for its asset id. The
+        claim has to be kept alive while the upload runs (see holding).
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0, poll_interval: float = 0.05, stale_after: float = 600.0):
+        """
+            :param poll_interval: how often to check on another process's claim.
+            :param stale_after: how old a claim has to be before it's assumed
+            its process died and it's taken over.
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS assets "
+                                "(checksum TEXT PRIMARY KEY, asset_id INTEGER NOT NULL)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS claims (checksum TEXT PRIMARY KEY, claimed REAL NOT NULL)")
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM assets").fetchone()[0]
+
+    def get(self, checksum: str):
+        """
+            Returns the asset id for checksum, or None if it hasn't been uploaded.
+        """
+        row = self.connection.execute("SELECT asset_id FROM assets WHERE checksum = ?",
+                                      (checksum.lower(),)).fetchone()
+        return row[0] if row is not None else None
+
+    def claim(self, checksum: str):
+        """
+            Returns the asset id for checksum if it's been uploaded. Otherwise
+            claims the upload and returns None; the caller must then upload it
+            and put() its asset id, or release() the claim if that fails.
+            While another process holds the claim, this waits for its result.
+        """
+        checksum = checksum.lower()
+        while True:
+            with self._transaction() as connection:
+                row = connection.execute("SELECT asset_id FROM assets WHERE checksum = ?", (checksum,)).fetchone()
+                if row is not None:
+                    return row[0]
+                claim = connection.execute("SELECT claimed FROM claims WHERE checksum = ?", (checksum,)).fetchone()
+                now = time.time()
+                if claim is None or now - claim[0] > self.stale_after:
+                    connection.execute("INSERT OR REPLACE INTO claims (checksum, claimed) VALUES (?, ?)",
+                                       (checksum, now))
+                    return None
+            time.sleep(self.poll_interval)
+
+    def refresh(self, checksum: str) -> bool:
+        """
+            Renews a claim so that it isn't taken over as stale.
+            :return: False if there's no longer a claim on checksum.
+        """
+        with self._transaction() as connection:
+            return connection.execute("UPDATE claims SET claimed = ? WHERE checksum = ?",
+                                      (time.time(), checksum.lower())).rowcount > 0
+
+    @contextlib.contextmanager
+    def holding(self, checksum: str):
+        """
+            Keeps a claim alive, refreshing it from a background thread
+            several times every stale_after, until the block exits.
+        """
+        stopped = threading.Event()
+
+        def run():
+            while not stopped.wait(self.stale_after / 4) and self.refresh(checksum):
+                pass
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def put(self, checksum: str, asset_id: int) -> int:
+        """
+            Records asset_id for checksum, and releases any claim on it. If
+            another process got there first, its asset id is kept and returned.
+        """
+        checksum = checksum.lower()
+        with self._transaction() as connection:
+            connection.execute("INSERT OR IGNORE INTO assets (checksum, asset_id) VALUES (?, ?)", (checksum, asset_id))
+            connection.execute("DELETE FROM claims WHERE checksum = ?", (checksum,))
+            return connection.execute("SELECT asset_id FROM assets WHERE checksum = ?", (checksum,)).fetchone()[0]
+
+    def release(self, checksum: str):
+        """
+            Gives up a claim without recording an asset, so another process can take it.
+        """
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM claims WHERE checksum = ?", (checksum.lower(),))
+
+    def forget(self, checksum: str, asset_id: int):
+        """
+            Drops checksum's entry if it still points at asset_id, e.g. because
+            that asset was deleted from the server.
+        """
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM assets WHERE checksum = ? AND asset_id = ?", (checksum.lower(), asset_id))
+
+
+class IngestResult:
+
+    def __init__(self, unique_name: str, path: str, checksum: str, asset_id: int, uploaded: bool, link_id: int,
+                 orphaned_asset_id: int = None):
+        self.unique_name = unique_name
+        self.path = path
+        self.checksum = checksum
+        self.asset_id = asset_id
+        self.uploaded = uploaded
+        self.link_id = link_id
+        self.orphaned_asset_id = orphaned_asset_id
+
+
+def guess_asset_kind(mime_type: str) -> BinaryAssetKind:
+    if mime_type is None:
+        return BinaryAssetKind.OTHER
+    major = mime_type.split("/")[0]
+    return {
+        "text": BinaryAssetKind.UTF8_TEXT,
+        "audio": BinaryAssetKind.AUDIO,
+        "image": BinaryAssetKind.IMAGE,
+        "video": BinaryAssetKind.VIDEO,
+    }.get(major, BinaryAssetKind.OTHER)
+
+
+def ingest_files(client, index: ChecksumIndex, corpus_id: int, paths, copyright=None, root: str = None,
+                 mime_type: str = None, type_description: BinaryAssetKind = None, max_workers: int = None,
+                 raw: bool = False) -> list:
+    """
+        Adds files to a corpus, uploading only content that isn't in the index.
+
+        Checksums are computed locally on a thread pool first. Files whose
+        checksum is already indexed only get a new AssetCorpusLink; the rest are
+        streamed to the server and recorded in the index. Index entries for
+        assets that have since been deleted from the server are replaced.
+        If another process recorded the same content while this one was
+        uploading it, that process's asset is used, and the asset uploaded
+        here, which nothing refers to, is reported as orphaned_asset_id.
+        :param paths: file paths. Each unique name is the path relative to root,
+        or the file's base name if root isn't given.
+        :param raw: upload content as raw octet-streams, see AnnotatronClient.upload_asset.
+        :return: An IngestResult for each path, in order.
+    """
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        checksums = list(pool.map(checksum_content, paths))
+
+    ret = []
+    for path, checksum in zip(paths, checksums):
+        unique_name = os.path.relpath(path, root) if root is not None else os.path.basename(path)
+        orphaned_asset_id = None
+        while True:
+            asset_id = index.claim(checksum)
+            uploaded = asset_id is None
+            if uploaded:
+                file_mime_type = mime_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+                asset = BinaryAsset(None, file_mime_type, type_description or guess_asset_kind(file_mime_type),
+                                    copyright, checksum, date_uploaded=datetime.datetime.utcnow())
+                try:
+                    with index.holding(checksum):
+                        uploaded_id = client.upload_asset(asset, content=path, raw=raw).id
+                except BaseException:
+                    index.release(checksum)
+                    raise
+                asset_id = index.put(checksum, uploaded_id)
+                if asset_id != uploaded_id:
+                    orphaned_asset_id = uploaded_id
+            try:
+                link = client.link_asset(AssetCorpusLink(unique_name, asset_id, corpus_id))
+                break
+            except AnnotatronAPIError as e:
+                if uploaded or e.status != 404 or not _asset_missing(client, asset_id):
+                    raise
+                # The indexed asset was deleted from the server: a cache miss.
+                index.forget(checksum, asset_id)
+        ret.append(IngestResult(unique_name, path, checksum, asset_id, uploaded, link.id, orphaned_asset_id))
+    return ret
+
+
+def _asset_missing(client, asset_id: int) -> bool:
+    try:
+        client.get_asset(asset_id)
+    except AnnotatronAPIError as e:
+        if e.status == 404:
+            return True
+        raise
+    return False
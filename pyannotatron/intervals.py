@@ -0,0 +1,114 @@
+import heapq
+from array import array
+
+from .models import TimeSeriesRangeColumns, FieldError
+
+
+class RangeIntervalIndex:
+    """
+        Static interval index over a TimeSeriesRangeAnnotation's ranges.
+
+        Ranges are treated as half-open [start, end). They're sorted by start
+        into arrays, and each array position also records the largest end in
+        the implicit balanced subtree rooted there, so stabbing and window
+        queries run in O(log n + k). Queries return indices into the original
+        ranges.
+    """
+
+    def __init__(self, start, end):
+        assert len(start) == len(end)
+        order = sorted(range(len(start)), key=start.__getitem__)
+        self.order = array('i', order)
+        self.start = array('d', [start[i] for i in order])
+        self.end = array('d', [end[i] for i in order])
+        self.max_end = array('d', self.end)
+        self._build(0, len(order))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return float('-inf')
+        mid = (lo + hi) // 2
+        ret = max(self.end[mid], self._build(lo, mid), self._build(mid + 1, hi))
+        self.max_end[mid] = ret
+        return ret
+
+    def __len__(self):
+        return len(self.order)
+
+    @classmethod
+    def from_annotation(cls, annotation):
+        ranges = annotation.ranges
+        if isinstance(ranges, TimeSeriesRangeColumns):
+            return cls(ranges.start, ranges.end)
+        return cls([r.start for r in ranges], [r.end for r in ranges])
+
+    @classmethod
+    def from_json_list(cls, x):
+        """
+            Builds the index straight from a decoded "ranges" JSON list.
+        """
+        return cls([i["start"] for i in x], [i["end"] for i in x])
+
+    def _query(self, lo_bound, hi_bound, hi_inclusive):
+        start, end, max_end, order = self.start, self.end, self.max_end, self.order
+        ret = []
+        stack = [(0, len(order))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if max_end[mid] <= lo_bound:
+                continue
+            stack.append((lo, mid))
+            if start[mid] < hi_bound or (hi_inclusive and start[mid] == hi_bound):
+                if end[mid] > lo_bound:
+                    ret.append(order[mid])
+                stack.append((mid + 1, hi))
+        ret.sort()
+        return ret
+
+    def stab(self, t: float) -> list:
+        """
+            Returns the indices of the ranges covering time t.
+        """
+        return self._query(t, t, True)
+
+    def window(self, a: float, b: float) -> list:
+        """
+            Returns the indices of the ranges intersecting [a, b).
+        """
+        return self._query(a, b, False)
+
+    def has_overlaps(self) -> bool:
+        running_end = float('-inf')
+        for start, end in zip(self.start, self.end):
+            if start < running_end:
+                return True
+            running_end = max(running_end, end)
+        return False
+
+    def overlapping_pairs(self) -> list:
+        """
+            Returns (i, j) index pairs, i < j, for every pair of overlapping ranges.
+        """
+        ret = []
+        active = []
+        for start, end, i in zip(self.start, self.end, self.order):
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            for _, j in active:
+                ret.append((min(i, j), max(i, j)))
+            heapq.heappush(active, (end, i))
+        ret.sort()
+        return ret
+
+    def validate(self, question) -> list:
+        """
+            Checks these ranges against a TimeSeriesRangeQuestion.
+            :return: A list of FieldError objects, empty if the ranges are acceptable.
+        """
+        if question.can_overlap:
+            return []
+        return [FieldError("ranges", "ranges %d and %d overlap" % pair, False)
+                for pair in self.overlapping_pairs()]
@@ -0,0 +1,130 @@
+import threading
+import time
+
+
+class AdaptiveLimiter:
+    """
+        Adaptive limit on the number of requests in flight, shared by every
+        client (and thread) it's given to.
+
+        The limit follows AIMD: it grows by one for each limit's worth of
+        requests that complete with at least half the limit in use and latency
+        near the no-load latency. It is multiplied by backoff when a request
+        fails, the server answers with one of OVERLOAD_STATUSES, or the smoothed
+        latency exceeds latency_tolerance times the no-load latency. At most one
+        decrease happens per round trip, so a burst of failures from one window
+        doesn't collapse the limit. A 429's Retry-After pauses new requests for
+        that long.
+    """
+
+    # Statuses meaning the server is overloaded.
+    OVERLOAD_STATUSES = (429, 502, 503, 504)
+
+    def __init__(self, initial_limit: int = 8, min_limit: int = 1, max_limit: int = 256, backoff: float = 0.7,
+                 latency_tolerance: float = 2.0, smoothing: float = 0.2, clock=time.monotonic):
+        assert 1 <= min_limit <= initial_limit <= max_limit
+        assert 0 < backoff < 1
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.inflight = 0
+        self.queued = 0
+        # Smoothed latency, and the lowest latency seen (drifting slowly upwards).
+        self.latency = None
+        self.no_load_latency = None
+        self.last_decrease = float("-inf")
+        self.resume_at = float("-inf")
+        self.requests = 0
+        self.drops = 0
+        self.decreases = 0
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                "limit": int(self.limit),
+                "inflight": self.inflight,
+                "queued": self.queued,
+                "requests": self.requests,
+                "drops": self.drops,
+                "decreases": self.decreases,
+                "latency": self.latency,
+                "noLoadLatency": self.no_load_latency,
+            }
+
+    def acquire(self, timeout: float = None) -> float:
+        """
+            Waits until a request may be sent.
+            :return: The start time to pass to release().
+            :raises TimeoutError: if no slot came free within timeout.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            self.queued += 1
+            try:
+                while True:
+                    now = self.clock()
+                    if now >= self.resume_at and self.inflight < int(self.limit):
+                        break
+                    wait = None
+                    if now < self.resume_at:
+                        wait = self.resume_at - now
+                    if deadline is not None:
+                        if now >= deadline:
+                            raise TimeoutError("no request slot became available")
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self.condition.wait(wait)
+            finally:
+                self.queued -= 1
+            self.inflight += 1
+            return self.clock()
+
+    def release(self, start: float, status: int = None, retry_after: float = None):
+        """
+            Records a request's outcome and frees its slot.
+            :param status: the HTTP status, or None if the request failed without one.
+            :param retry_after: seconds to pause for, from a Retry-After header.
+        """
+        now = self.clock()
+        with self.condition:
+            self.inflight -= 1
+            self.requests += 1
+            if status is None or status in self.OVERLOAD_STATUSES:
+                self.drops += 1
+                self._decrease(now)
+                if retry_after is not None:
+                    self.resume_at = max(self.resume_at, now + retry_after)
+            else:
+                self._sample(now, now - start)
+            self.condition.notify_all()
+
+    def _sample(self, now: float, latency: float):
+        if self.latency is None:
+            self.latency = self.no_load_latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+            if latency < self.no_load_latency:
+                self.no_load_latency = latency
+            else:
+                # Drift upwards, so a permanent change in the server's speed is eventually accepted.
+                self.no_load_latency += 0.01 * self.smoothing * (latency - self.no_load_latency)
+        if self.latency > self.latency_tolerance * self.no_load_latency:
+            self._decrease(now)
+        elif 2 * (self.inflight + 1) >= self.limit:
+            # Only grow when at least half the limit is being used.
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def _decrease(self, now: float):
+        if now - self.last_decrease < (self.latency or 0.0):
+            return
+        self.last_decrease = now
+        self.decreases += 1
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
@@ -0,0 +1,99 @@
+"""
+    Load generation against an Annotatron server (real or stand-in).
+"""
+import itertools
+import threading
+import time
+from collections import Counter
+
+
+def percentile(sorted_values, p: float) -> float:
+    """
+        Nearest-rank percentile of already sorted values, p in [0, 100].
+    """
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, int(-(-p * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadResult:
+    """
+        Latencies and errors recorded by run_load.
+    """
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self, name: str, elapsed: float, latencies: list, errors: Counter):
+        self.name = name
+        self.elapsed = elapsed
+        self.latencies = sorted(latencies)
+        self.errors = errors
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + sum(self.errors.values())
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed > 0 else float("nan")
+
+    def percentile(self, p: float) -> float:
+        return percentile(self.latencies, p)
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name,
+            "requests": self.requests,
+            "errors": dict(self.errors),
+            "elapsed": self.elapsed,
+            "throughput": self.throughput,
+            "latency": {"p%g" % p: self.percentile(p) for p in self.PERCENTILES},
+        }
+
+    def __str__(self):
+        return "%-20s %7d ok %5d err %9.1f req/s  %s" % (
+            self.name, len(self.latencies), sum(self.errors.values()), self.throughput,
+            "  ".join("p%g %7.2f ms" % (p, 1000 * self.percentile(p)) for p in self.PERCENTILES))
+
+
+def run_load(name: str, operation, concurrency: int = 8, requests: int = None, duration: float = None) -> LoadResult:
+    """
+        Calls operation(i) from concurrency threads, closed-loop, until
+        requests calls have been made or duration seconds have passed.
+        Exceptions are counted, by HTTP status or type, rather than raised.
+    """
+    assert requests is not None or duration is not None
+    lock = threading.Lock()
+    counter = iter(range(requests)) if requests is not None else itertools.count()
+    latencies = []
+    errors = Counter()
+    deadline = None if duration is None else time.perf_counter() + duration
+
+    def worker():
+        local_latencies = []
+        local_errors = Counter()
+        while deadline is None or time.perf_counter() < deadline:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            try:
+                operation(i)
+            except Exception as e:
+                status = getattr(e, "status", None)
+                local_errors["HTTP %d" % status if status is not None else type(e).__name__] += 1
+            else:
+                local_latencies.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local_latencies)
+            errors.update(local_errors)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return LoadResult(name, time.perf_counter() - start, latencies, errors)
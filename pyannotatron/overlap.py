@@ -0,0 +1,303 @@
+"""
+    Agreement between several annotators' TimeSeriesRangeAnnotations of the
+    same asset, and aggregation of them into one AGGREGATED annotation.
+
+    Each label is handled with one sweep over the sorted start/end events of
+    every annotator's ranges, so N annotators are compared at once in
+    O(n log n + k), where k is the number of overlapping range pairs, rather
+    than pairwise over the lists. Ranges are half-open, [start, end).
+"""
+import datetime
+import heapq
+import math
+from collections import defaultdict
+from itertools import combinations
+
+from .models import AnnotationSource, TimeSeriesRangeAnnotation, TimeSeriesRangeColumns, TimeSeriesRangeTuple
+
+# The IoU two ranges need to count as a match.
+MATCH_THRESHOLD = 0.5
+
+
+def _label_ranges(annotation: TimeSeriesRangeAnnotation) -> dict:
+    """
+        :return: label -> [(start, end)]
+    """
+    ret = defaultdict(list)
+    ranges = annotation.ranges
+    if isinstance(ranges, TimeSeriesRangeColumns):
+        labels = ranges.labels
+        for label_id, start, end in zip(ranges.label_ids, ranges.start, ranges.end):
+            ret[labels[label_id]].append((start, end))
+    else:
+        for r in ranges:
+            ret[r.label].append((r.start, r.end))
+    return ret
+
+
+def sweep(ranges_by_annotator: list):
+    """
+        Sweeps over N annotators' ranges for one label.
+        :param ranges_by_annotator: for each annotator, a list of (start, end).
+        :return: (length, intersection, coverage): the length each annotator
+        covers, (a, b) -> the length both cover for a < b, and the
+        (start, end, count) segments where count > 0 annotators cover.
+    """
+    events = []
+    for a, ranges in enumerate(ranges_by_annotator):
+        for start, end in ranges:
+            if end > start:
+                events.append((start, 1, a))
+                events.append((end, -1, a))
+    events.sort()
+    depth = [0] * len(ranges_by_annotator)
+    active = []
+    length = [0.0] * len(ranges_by_annotator)
+    intersection = defaultdict(float)
+    coverage = []
+    previous = None
+    for t, delta, a in events:
+        if active and t > previous:
+            dt = t - previous
+            for x in active:
+                length[x] += dt
+            for pair in combinations(active, 2):
+                intersection[pair] += dt
+            coverage.append((previous, t, len(active)))
+        previous = t
+        depth[a] += delta
+        # An annotator's own overlapping ranges only count once.
+        if delta == 1 and depth[a] == 1:
+            active.append(a)
+            active.sort()
+        elif depth[a] == 0:
+            active.remove(a)
+    return length, intersection, coverage
+
+
+def match(ranges_by_annotator: list, threshold: float = MATCH_THRESHOLD) -> dict:
+    """
+        Pairs up ranges between every two annotators, greedily by descending IoU.
+        Overlapping candidates are found with one sweep.
+        :return: (a, b) -> [(i, j, iou)] for a < b, where range i of annotator a
+        matches range j of annotator b with iou >= threshold.
+    """
+    ranges = sorted((start, end, a, i) for a, annotator_ranges in enumerate(ranges_by_annotator)
+                    for i, (start, end) in enumerate(annotator_ranges) if end > start)
+    candidates = defaultdict(list)
+    active = []
+    for start, end, a, i in ranges:
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for other_end, b, j, other_start in active:
+            if b == a:
+                continue
+            overlap = min(end, other_end) - start
+            iou = overlap / ((end - start) + (other_end - other_start) - overlap)
+            if iou >= threshold:
+                if a < b:
+                    candidates[a, b].append((iou, i, j))
+                else:
+                    candidates[b, a].append((iou, j, i))
+        heapq.heappush(active, (end, a, i, start))
+    ret = {}
+    for pair, pair_candidates in candidates.items():
+        pair_candidates.sort(key=lambda c: -c[0])
+        used_a, used_b = set(), set()
+        matches = []
+        for iou, i, j in pair_candidates:
+            if i not in used_a and j not in used_b:
+                used_a.add(i)
+                used_b.add(j)
+                matches.append((i, j, iou))
+        ret[pair] = matches
+    return ret
+
+
+def _regions(coverage: list, min_annotators: int) -> list:
+    ret = []
+    for start, end, count in coverage:
+        if count < min_annotators:
+            continue
+        if ret and ret[-1][1] == start:
+            ret[-1] = (ret[-1][0], end)
+        else:
+            ret.append((start, end))
+    return ret
+
+
+class LabelOverlap:
+    """
+        How N annotators' ranges for one label on one asset overlap.
+    """
+
+    def __init__(self, label: str, annotators: list, ranges_by_annotator: list,
+                 threshold: float = MATCH_THRESHOLD):
+        self.label = label
+        self.annotators = annotators
+        self.counts = [len([r for r in ranges if r[1] > r[0]]) for ranges in ranges_by_annotator]
+        self.length, self.intersection, self.coverage = sweep(ranges_by_annotator)
+        self.matches = match(ranges_by_annotator, threshold)
+
+    def _indices(self, a, b):
+        return self.annotators.index(a), self.annotators.index(b)
+
+    def _pair_iou(self, x: int, y: int) -> float:
+        x, y = min(x, y), max(x, y)
+        common = self.intersection.get((x, y), 0.0)
+        union = self.length[x] + self.length[y] - common
+        return common / union if union else float("nan")
+
+    def _pair_f1(self, x: int, y: int) -> float:
+        x, y = min(x, y), max(x, y)
+        total = self.counts[x] + self.counts[y]
+        return 2 * len(self.matches.get((x, y), ())) / total if total else float("nan")
+
+    def iou(self, a, b) -> float:
+        """
+            Temporal IoU between annotators a and b, NaN if neither used this label.
+        """
+        return self._pair_iou(*self._indices(a, b))
+
+    def f1(self, a, b) -> float:
+        """
+            Matched-range F1 between annotators a and b.
+        """
+        return self._pair_f1(*self._indices(a, b))
+
+    def _mean(self, pair_statistic) -> float:
+        values = [pair_statistic(x, y) for x, y in combinations(range(len(self.annotators)), 2)]
+        values = [v for v in values if not math.isnan(v)]
+        return sum(values) / len(values) if values else float("nan")
+
+    def mean_iou(self) -> float:
+        return self._mean(self._pair_iou)
+
+    def mean_f1(self) -> float:
+        return self._mean(self._pair_f1)
+
+    def union_length(self) -> float:
+        """
+            The length covered by any annotator.
+        """
+        return sum(end - start for start, end, _ in self.coverage)
+
+    def common_length(self) -> float:
+        """
+            The length covered by every annotator.
+        """
+        n = len(self.annotators)
+        return sum(end - start for start, end, count in self.coverage if count == n)
+
+    def totals(self) -> dict:
+        """
+            Sums over annotator pairs, for combining across assets.
+        """
+        pairs = list(combinations(range(len(self.annotators)), 2))
+        intersection = sum(self.intersection.get(pair, 0.0) for pair in pairs)
+        return {
+            "intersection": intersection,
+            "union": sum(self.length[x] + self.length[y] for x, y in pairs) - intersection,
+            "matched": sum(len(matches) for matches in self.matches.values()),
+            "ranges": sum(self.counts[x] + self.counts[y] for x, y in pairs),
+        }
+
+    def regions(self, min_annotators: int) -> list:
+        """
+            :return: The (start, end) regions covered by at least min_annotators, merged.
+        """
+        return _regions(self.coverage, min_annotators)
+
+
+def compare_ranges(annotations: dict, threshold: float = MATCH_THRESHOLD) -> dict:
+    """
+        Compares several annotators' range annotations of one asset.
+        :param annotations: annotator -> TimeSeriesRangeAnnotation. Annotators
+        who didn't use a label count as covering none of it.
+        :return: label -> LabelOverlap
+    """
+    annotators = list(annotations)
+    by_annotator = [_label_ranges(annotations[a]) for a in annotators]
+    labels = sorted(set().union(*by_annotator)) if by_annotator else []
+    return {label: LabelOverlap(label, annotators, [ranges.get(label, []) for ranges in by_annotator], threshold)
+            for label in labels}
+
+
+def aggregate_ranges(annotations: dict, min_annotators: int = None, summary_code: str = None,
+                     created: datetime.datetime = None, overlaps: dict = None) -> TimeSeriesRangeAnnotation:
+    """
+        Combines several annotators' ranges into one AGGREGATED annotation,
+        keeping, for each label, the regions at least min_annotators agree on.
+        :param min_annotators: defaults to a strict majority of annotators.
+        :param overlaps: the result of compare_ranges, if it's already been computed.
+    """
+    if min_annotators is None:
+        min_annotators = len(annotations) // 2 + 1
+    if summary_code is None:
+        summary_code = next(iter(annotations.values())).summary_code
+    if overlaps is not None:
+        coverage = {label: overlap.coverage for label, overlap in overlaps.items()}
+    else:
+        by_annotator = [_label_ranges(a) for a in annotations.values()]
+        coverage = {label: sweep([ranges.get(label, []) for ranges in by_annotator])[2]
+                    for label in set().union(*by_annotator)}
+    ranges = [(start, end, label) for label, label_coverage in coverage.items()
+              for start, end in _regions(label_coverage, min_annotators)]
+    ranges.sort()
+    return TimeSeriesRangeAnnotation(created or datetime.datetime.utcnow(), AnnotationSource.AGGREGATED,
+                                     summary_code, [TimeSeriesRangeTuple(label, start, end)
+                                                    for start, end, label in ranges])
+
+
+def _group_by_item(observations) -> dict:
+    """
+        :return: (summary_code, item) -> {annotator: annotation}
+    """
+    ret = defaultdict(dict)
+    for item, annotator, annotation in observations:
+        if isinstance(annotation, TimeSeriesRangeAnnotation):
+            ret[annotation.summary_code, item][annotator] = annotation
+    return ret
+
+
+class CorpusRangeAgreement:
+    """
+        Range agreement for every asset of a corpus, per summary code and label.
+    """
+
+    def __init__(self, observations, threshold: float = MATCH_THRESHOLD):
+        """
+            :param observations: (item, annotator, TimeSeriesRangeAnnotation)
+            triples, e.g. from aggregation.assignment_observations.
+        """
+        # (summary_code, item) -> label -> LabelOverlap
+        self.items = {key: compare_ranges(annotations, threshold)
+                      for key, annotations in _group_by_item(observations).items()}
+
+    def totals(self) -> dict:
+        """
+            :return: summary_code -> label -> summed totals, plus the micro-averaged
+            "iou" and "f1" over every annotator pair on every asset.
+        """
+        ret = defaultdict(lambda: defaultdict(lambda: {"intersection": 0.0, "union": 0.0, "matched": 0,
+                                                       "ranges": 0}))
+        for (summary_code, _), overlaps in self.items.items():
+            for label, overlap in overlaps.items():
+                total = ret[summary_code][label]
+                for key, value in overlap.totals().items():
+                    total[key] += value
+        for labels in ret.values():
+            for total in labels.values():
+                total["iou"] = total["intersection"] / total["union"] if total["union"] else float("nan")
+                total["f1"] = 2 * total["matched"] / total["ranges"] if total["ranges"] else float("nan")
+        return {summary_code: dict(labels) for summary_code, labels in ret.items()}
+
+
+def aggregate_corpus_ranges(observations, min_annotators: int = None, created: datetime.datetime = None) -> list:
+    """
+        Aggregates the range annotations of every asset.
+        :return: (item, TimeSeriesRangeAnnotation) pairs with source AGGREGATED.
+    """
+    created = created or datetime.datetime.utcnow()
+    return [(item, aggregate_ranges(annotations, min_annotators, summary_code, created))
+            for (summary_code, item), annotations in _group_by_item(observations).items()]
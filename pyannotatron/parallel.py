@@ -0,0 +1,183 @@
+"""
+    Decodes large batches of annotations, questions or assignments across a
+    process pool.
+
+    Records are sent to workers in chunks, either as raw JSON text or as
+    already-parsed dicts, and each worker decodes its chunk with the usual
+    from_json dispatch. For JSON-lines files, only byte ranges are sent: each
+    worker reads and decodes its own range of the file, so the parent never
+    parses a record.
+
+    Decoded objects have to be pickled back to the parent, which unpickles
+    them on one thread, so that's what limits the speedup. Passing a reduce
+    function avoids it: reduce runs in the worker on each chunk's decoded
+    objects, and only its (ideally compact) result comes back.
+"""
+import json
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from .models import Annotation, Assignment, Question
+
+# Looked up by name in the worker, so only the name needs pickling.
+DECODERS = {
+    "annotation": Annotation.from_json,
+    "question": Question.from_json,
+    "assignment": Assignment.from_json,
+}
+
+CHUNK_SIZE = 2000
+
+# The size of each byte range decode_jsonl hands to a worker.
+SHARD_BYTES = 4 * 1024 * 1024
+
+# Chunks submitted per worker ahead of the ones being consumed.
+PREFETCH = 2
+
+
+def _decode(from_json, record):
+    if isinstance(record, (str, bytes, bytearray)):
+        record = json.loads(record)
+    return from_json(record)
+
+
+def _reduced(reduce, objects):
+    return list(objects) if reduce is None else reduce(objects)
+
+
+def decode_chunk(kind: str, records: list, reduce=None):
+    """
+        Decodes a list of records, each a dict or a JSON string.
+        :return: The decoded objects, or reduce(iterator over them).
+    """
+    from_json = DECODERS[kind]
+    return _reduced(reduce, (_decode(from_json, record) for record in records))
+
+
+def _iter_range(fp, start: int, end: int):
+    fp.seek(start)
+    position = start
+    while position < end:
+        line = fp.readline()
+        if not line:
+            return
+        position += len(line)
+        if line.strip():
+            yield json.loads(line)
+
+
+def decode_range(kind: str, path: str, start: int, end: int, reduce=None):
+    """
+        Decodes the lines of a JSON-lines file in bytes [start, end), which
+        must begin and end on line boundaries. Blank lines are skipped.
+        :return: The decoded objects, or reduce(iterator over them).
+    """
+    from_json = DECODERS[kind]
+    with open(path, "rb") as fp:
+        return _reduced(reduce, map(from_json, _iter_range(fp, start, end)))
+
+
+def jsonl_byte_ranges(path: str, shard_bytes: int = SHARD_BYTES) -> list:
+    """
+        Splits a JSON-lines file into (start, end) byte ranges of about
+        shard_bytes, each ending just after a newline (or at the end of the file).
+    """
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, "rb") as fp:
+        while boundaries[-1] + shard_bytes < size:
+            fp.seek(boundaries[-1] + shard_bytes - 1)
+            fp.readline()
+            boundaries.append(fp.tell())
+    if boundaries[-1] < size:
+        boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _chunks(records, chunk_size: int):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _run(executor, tasks, ordered: bool, window: int, flatten: bool):
+    """
+        Submits executor.submit(*task) for each task, keeping at most window
+        in flight, and yields each result (or each result's items, if
+        flatten) in task order, or as tasks finish.
+    """
+    tasks = iter(tasks)
+    pending = deque(executor.submit(*task) for task in islice(tasks, window))
+    while pending:
+        if ordered:
+            done = [pending.popleft()]
+        else:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            done = [f for f in pending if f in finished]
+            for f in done:
+                pending.remove(f)
+        for future in done:
+            task = next(tasks, None)
+            if task is not None:
+                pending.append(executor.submit(*task))
+            if flatten:
+                yield from future.result()
+            else:
+                yield future.result()
+
+
+def _with_executor(workers: int, executor, run):
+    workers = workers or os.cpu_count() or 1
+    if executor is not None:
+        yield from run(executor, workers)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        yield from run(pool, workers)
+
+
+def decode_records(records, kind: str, workers: int = None, chunk_size: int = CHUNK_SIZE, ordered: bool = True,
+                   executor=None, reduce=None):
+    """
+        Decodes records (dicts or JSON strings) in parallel.
+        :param kind: "annotation", "question" or "assignment".
+        :param workers: the pool size, by default the number of CPUs.
+        :param ordered: if False, each chunk's results are yielded as soon as
+        it's decoded, so records come out in no particular order.
+        :param executor: an existing ProcessPoolExecutor to use instead of
+        starting one; workers should then be its size.
+        :param reduce: a module-level function, run in the worker on an
+        iterator over each chunk's decoded objects.
+        :return: A generator of decoded objects, or of reduce's result for
+        each chunk. Only a few chunks per worker are read from records ahead
+        of what's been consumed.
+    """
+    assert kind in DECODERS, kind
+
+    def run(pool, n):
+        return _run(pool, ((decode_chunk, kind, chunk, reduce) for chunk in _chunks(records, chunk_size)),
+                    ordered, n * PREFETCH, reduce is None)
+    return _with_executor(workers, executor, run)
+
+
+def decode_jsonl(path: str, kind: str, workers: int = None, shard_bytes: int = SHARD_BYTES, ordered: bool = True,
+                 executor=None, reduce=None):
+    """
+        Decodes a JSON-lines file in parallel, with each worker reading its
+        own byte ranges of it, streaming them line by line.
+        :param shard_bytes: the size of each range. At most PREFETCH ranges
+        per worker are decoded ahead of what's been consumed.
+        :return: A generator of decoded objects, or of reduce's result for
+        each range, as for decode_records.
+    """
+    assert kind in DECODERS, kind
+
+    def run(pool, n):
+        ranges = jsonl_byte_ranges(path, shard_bytes)
+        return _run(pool, ((decode_range, kind, path, start, end, reduce) for start, end in ranges),
+                    ordered, n * PREFETCH, reduce is None)
+    return _with_executor(workers, executor, run)
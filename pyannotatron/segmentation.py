@@ -0,0 +1,319 @@
+"""
+    Segmentation annotations: SegmentationIndex, an array-backed view for
+    label lookups, and scores for a hypothesis segmentation (usually
+    SYSTEM_GENERATED) against a REFERENCE one: Pk, WindowDiff and boundary
+    precision/recall/F1 with a tolerance window.
+
+    Segmentations are read from their segments arrays: segments[0] is where
+    the first segment starts and the rest are boundaries. Pk and WindowDiff are
+    computed exactly over continuous time: whether a probe window (t, t + k]
+    is an error only changes when t or t + k crosses a boundary, so they're
+    integrated over those breakpoints instead of sampled.
+"""
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from itertools import accumulate, compress, islice, repeat
+from operator import le, ne, sub
+
+from .models import AnnotationSource, TimeSeriesSegmentationAnnotation
+
+
+class SegmentationIndex:
+    """
+        Array-backed view of a TimeSeriesSegmentationAnnotation.
+
+        Segment i covers [segments[i], segments[i + 1]); the last segment runs
+        to the end of the asset. Labels are dictionary-encoded into label_ids.
+    """
+
+    def __init__(self, segments, annotations):
+        assert len(segments) == len(annotations)
+        self.segments = array('d', segments)
+        assert all(a <= b for a, b in zip(self.segments, self.segments[1:])), "segments must be sorted"
+        self.labels = []
+        label_index = {}
+        label_ids = []
+        for label in annotations:
+            label_id = label_index.get(label)
+            if label_id is None:
+                label_id = len(self.labels)
+                self.labels.append(label)
+                label_index[label] = label_id
+            label_ids.append(label_id)
+        self.label_ids = array('i', label_ids)
+
+    def __len__(self):
+        return len(self.segments)
+
+    @classmethod
+    def from_annotation(cls, annotation: TimeSeriesSegmentationAnnotation):
+        return cls(annotation.segments, annotation.annotations)
+
+    def segment_index(self, t: float) -> int:
+        """
+            Returns the index of the segment containing t, or -1 if t is before the first one.
+        """
+        return bisect_right(self.segments, t) - 1
+
+    def segment_indices(self, times) -> array:
+        """
+            Maps each timestamp to its segment index (-1 before the first segment).
+            Sorted input is resolved with a single merge pass, anything else by bisection.
+        """
+        segments = self.segments
+        if all(a <= b for a, b in zip(times, times[1:])):
+            ret = array('i', [0]) * len(times)
+            current, n = -1, len(segments)
+            for i, t in enumerate(times):
+                while current + 1 < n and segments[current + 1] <= t:
+                    current += 1
+                ret[i] = current
+            return ret
+        return array('i', [bisect_right(segments, t) - 1 for t in times])
+
+    def label_at(self, t: float):
+        i = self.segment_index(t)
+        if i < 0:
+            return None
+        return self.labels[self.label_ids[i]]
+
+    def labels_at(self, times) -> list:
+        """
+            Returns the label of the segment containing each timestamp (None before the first).
+        """
+        labels, label_ids = self.labels, self.label_ids
+        return [labels[label_ids[i]] if i >= 0 else None for i in self.segment_indices(times)]
+
+    def durations(self, end: float = None) -> array:
+        """
+            Returns each segment's duration. The last segment's duration is
+            end - segments[-1], or nan if the asset's end isn't given.
+        """
+        segments = self.segments
+        ret = array('d', [b - a for a, b in zip(segments, segments[1:])])
+        if len(segments):
+            ret.append(end - segments[-1] if end is not None else float('nan'))
+        return ret
+
+    def merged(self):
+        """
+            Returns a new SegmentationIndex with adjacent segments that share a label merged.
+        """
+        segments, annotations = [], []
+        previous = None
+        for start, label_id in zip(self.segments, self.label_ids):
+            if label_id == previous:
+                continue
+            segments.append(start)
+            annotations.append(self.labels[label_id])
+            previous = label_id
+        return SegmentationIndex(segments, annotations)
+
+    def to_annotation(self, annotation: TimeSeriesSegmentationAnnotation) -> TimeSeriesSegmentationAnnotation:
+        """
+            Returns a copy of annotation with its segments replaced by these ones.
+        """
+        return TimeSeriesSegmentationAnnotation(annotation.created, annotation.source, annotation.summary_code,
+                                                list(self.segments),
+                                                [self.labels[i] for i in self.label_ids],
+                                                kind=annotation.kind)
+
+
+def _segments(segmentation) -> array:
+    """
+        Accepts a TimeSeriesSegmentationAnnotation, a SegmentationIndex or a
+        sequence of segment start times.
+    """
+    segments = getattr(segmentation, "segments", segmentation)
+    segments = segments if isinstance(segments, array) else array('d', segments)
+    assert all(map(le, segments, islice(segments, 1, None))), "segments must be sorted"
+    return segments
+
+
+def boundary_matches(reference, hypothesis, tolerance: float) -> int:
+    """
+        Counts the hypothesis boundaries that can be paired one-to-one with
+        reference boundaries at most tolerance away. Both must be sorted; a
+        single merge pass gives the largest possible pairing.
+    """
+    matched, j, n = 0, 0, len(hypothesis)
+    for b in reference:
+        while j < n and hypothesis[j] < b - tolerance:
+            j += 1
+        if j < n and hypothesis[j] <= b + tolerance:
+            matched += 1
+            j += 1
+    return matched
+
+
+def _window_counts(boundaries, points: list, k: float) -> list:
+    """
+        The number of boundaries in (t, t + k] for t between each pair of
+        consecutive points. Boundary b is in the window while b - k <= t < b,
+        so the count is a running sum of +1 at each b - k and -1 at each b.
+    """
+    lo = points[0]
+    initial = bisect_right(boundaries, lo + k) - bisect_right(boundaries, lo)
+    entering = Counter(map(sub, boundaries, repeat(k)))
+    leaving = Counter(boundaries)
+    inner = points[1:-1]
+    return list(accumulate(map(sub, map(entering.get, inner, repeat(0)), map(leaving.get, inner, repeat(0))),
+                           initial=initial))
+
+
+def window_errors(reference, hypothesis, k: float, start: float, end: float):
+    """
+        :return: (pk_error, window_diff_error, length): how much of the probe
+        range [start, end - k] has a Pk error and a WindowDiff error, and the
+        probe range's length.
+    """
+    lo, hi = start, end - k
+    if hi <= lo:
+        return 0.0, 0.0, 0.0
+    points = {lo, hi}
+    for boundaries in (reference, hypothesis):
+        points.update(b for b in boundaries if lo < b < hi)
+        points.update(b - k for b in boundaries if lo < b - k < hi)
+    points = sorted(points)
+    widths = list(map(sub, points[1:], points[:-1]))
+    r = _window_counts(reference, points, k)
+    h = _window_counts(hypothesis, points, k)
+    pk = sum(compress(widths, map(ne, map(bool, r), map(bool, h))))
+    window_diff = sum(compress(widths, map(ne, r, h)))
+    return pk, window_diff, hi - lo
+
+
+class SegmentationScore:
+    """
+        Scores for one hypothesis against its reference. Pk and WindowDiff are
+        fractions of the probe range in error (lower is better).
+    """
+
+    def __init__(self, item, reference_boundaries: int, hypothesis_boundaries: int, matched: int, k: float,
+                 pk_error: float, window_diff_error: float, length: float):
+        self.item = item
+        self.reference_boundaries = reference_boundaries
+        self.hypothesis_boundaries = hypothesis_boundaries
+        self.matched = matched
+        self.k = k
+        self.pk_error = pk_error
+        self.window_diff_error = window_diff_error
+        self.length = length
+
+    @property
+    def precision(self) -> float:
+        return self.matched / self.hypothesis_boundaries if self.hypothesis_boundaries else float("nan")
+
+    @property
+    def recall(self) -> float:
+        return self.matched / self.reference_boundaries if self.reference_boundaries else float("nan")
+
+    @property
+    def f1(self) -> float:
+        total = self.reference_boundaries + self.hypothesis_boundaries
+        return 2 * self.matched / total if total else float("nan")
+
+    @property
+    def pk(self) -> float:
+        return self.pk_error / self.length if self.length else float("nan")
+
+    @property
+    def window_diff(self) -> float:
+        return self.window_diff_error / self.length if self.length else float("nan")
+
+    def to_json(self) -> dict:
+        return {
+            "pk": self.pk,
+            "windowDiff": self.window_diff,
+            "precision": self.precision,
+            "recall": self.recall,
+            "f1": self.f1,
+            "k": self.k,
+        }
+
+
+def score_segmentation(reference, hypothesis, tolerance: float, k: float = None, end: float = None,
+                       item=None) -> SegmentationScore:
+    """
+        :param tolerance: how far apart two boundaries can be and still match.
+        :param k: the Pk/WindowDiff window width, by default half the mean
+        reference segment length.
+        :param end: where the asset ends. Without it, the last segment start
+        in either segmentation is taken as the end.
+    """
+    reference, hypothesis = _segments(reference), _segments(hypothesis)
+    starts = [s[0] for s in (reference, hypothesis) if len(s)]
+    start = min(starts) if starts else 0.0
+    if end is None:
+        end = max([s[-1] for s in (reference, hypothesis) if len(s)], default=start)
+    reference_boundaries, hypothesis_boundaries = reference[1:], hypothesis[1:]
+    if k is None:
+        k = (end - start) / (len(reference_boundaries) + 1) / 2
+    pk_error, window_diff_error, length = window_errors(reference_boundaries, hypothesis_boundaries, k, start, end)
+    return SegmentationScore(item, len(reference_boundaries), len(hypothesis_boundaries),
+                             boundary_matches(reference_boundaries, hypothesis_boundaries, tolerance),
+                             k, pk_error, window_diff_error, length)
+
+
+class CorpusSegmentationScores:
+    """
+        Per-asset scores, and corpus-level totals: boundary precision, recall
+        and F1 are micro-averaged over all boundaries, and Pk and WindowDiff
+        are weighted by each asset's probe range length.
+    """
+
+    def __init__(self, scores: list):
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __iter__(self):
+        return iter(self.scores)
+
+    def totals(self) -> dict:
+        matched = sum(s.matched for s in self.scores)
+        reference = sum(s.reference_boundaries for s in self.scores)
+        hypothesis = sum(s.hypothesis_boundaries for s in self.scores)
+        length = sum(s.length for s in self.scores)
+        nan = float("nan")
+        return {
+            "assets": len(self.scores),
+            "pk": sum(s.pk_error for s in self.scores) / length if length else nan,
+            "windowDiff": sum(s.window_diff_error for s in self.scores) / length if length else nan,
+            "precision": matched / hypothesis if hypothesis else nan,
+            "recall": matched / reference if reference else nan,
+            "f1": 2 * matched / (reference + hypothesis) if reference + hypothesis else nan,
+        }
+
+
+def score_corpus(pairs, tolerance: float, k: float = None, ends: dict = None) -> CorpusSegmentationScores:
+    """
+        Scores a batch of segmentations.
+        :param pairs: (item, reference, hypothesis) tuples, e.g. from reference_pairs.
+        :param ends: item -> where that asset ends.
+    """
+    ends = ends or {}
+    return CorpusSegmentationScores([score_segmentation(reference, hypothesis, tolerance, k, ends.get(item), item)
+                                     for item, reference, hypothesis in pairs])
+
+
+def reference_pairs(observations, hypothesis_source: AnnotationSource = AnnotationSource.SYSTEM_GENERATED):
+    """
+        Pairs each hypothesis_source segmentation with the REFERENCE
+        segmentation of the same item and summary code.
+        :param observations: (item, annotator, annotation) triples.
+        :return: (item, reference, hypothesis) tuples. An item with several
+        hypotheses appears once for each.
+    """
+    references, hypotheses = {}, []
+    for item, _, annotation in observations:
+        if not isinstance(annotation, TimeSeriesSegmentationAnnotation):
+            continue
+        key = (annotation.summary_code, item)
+        if annotation.source == AnnotationSource.REFERENCE:
+            references[key] = annotation
+        elif annotation.source == hypothesis_source:
+            hypotheses.append((key, annotation))
+    return [(key[1], references[key], annotation) for key, annotation in hypotheses if key in references]
@@ -0,0 +1,450 @@
+"""
+    In-memory stand-in for the Annotatron API, for tests and client benchmarks.
+
+    It implements the endpoints used by AnnotatronClient, checking request
+    bodies by decoding them with the models, and keeps everything in dicts.
+    Latency, errors and overload can be injected to see how clients behave
+    against a slow or failing server.
+"""
+import datetime
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from .models import LoginRequest, LoginResponse, Corpus, BinaryAsset, AssetCorpusLink, Question, Assignment
+from .models import AssignmentResponse
+from .models import NewUserRequest, AnnotatronUser, UserKind, FieldError, ValidationError, BinaryAssetDescription
+from .compression import CODECS, COMPRESSION_THRESHOLD, accept_encoding, choose_encoding, compress, decompress
+from .utils import bytes_to_base64
+
+
+class _NotFound(Exception):
+    pass
+
+
+class StandInServer:
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, username: str = "admin", password: str = "admin",
+                 raw_transfer: bool = True, compression: bool = True,
+                 compression_threshold: int = COMPRESSION_THRESHOLD, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, max_inflight: int = None, seed: int = None):
+        """
+            :param latency: seconds added to every request, plus up to jitter more at random.
+            :param error_rate: fraction of requests (other than logins) answered with error_status.
+            :param max_inflight: requests beyond this many at once are answered
+            503 with a Retry-After header.
+            The fault settings are plain attributes and can be changed while running.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_inflight = max_inflight
+        self.random = random.Random(seed)
+        self.inflight = 0
+        self.injected_errors = 0
+        self.rejected = 0
+        # When False, behave like a server without raw content transfer.
+        self.raw_transfer = raw_transfer
+        # When False, behave like a server without compressed request or response bodies.
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.tokens = {}
+        self.passwords = {}
+        self.users = {}
+        self.corpora = {}
+        self.assets = {}
+        self.contents = {}
+        self.links = {}
+        self.questions = {}
+        self.assignments = {}
+        self.responses = {}
+        self.connections = 0
+        self.requests = 0
+        # Body bytes as sent over the wire, so possibly compressed.
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.create_user(username, password, UserKind.ADMINISTRATOR)
+
+        server = self
+
+        class Handler(_Handler):
+            stand_in = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return "http://%s:%d" % (host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def next_id(self) -> int:
+        with self.lock:
+            return next(self.ids)
+
+    def create_user(self, username, password, role: UserKind) -> int:
+        id = self.next_id()
+        user = AnnotatronUser(username, "%s@localhost" % username, role, datetime.datetime.utcnow(), id)
+        self.users[id] = user.to_json()
+        self.passwords[username] = (password, id)
+        return id
+
+    # Routes: (method, pattern, handler method name)
+    ROUTES = [
+        ("POST", r"/v1/auth/token", "login"),
+        ("GET", r"/v1/users/me", "current_user"),
+        ("GET", r"/v1/users/(\d+)", "get_user"),
+        ("GET", r"/v1/users/", "list_users"),
+        ("POST", r"/v1/users/", "post_user"),
+        ("GET", r"/v1/corpus/", "list_corpora"),
+        ("POST", r"/v1/corpus/", "post_corpus"),
+        ("GET", r"/v1/corpus/(\d+)", "get_corpus"),
+        ("POST", r"/v1/corpus/(\d+)/assets", "post_link"),
+        ("GET", r"/v1/corpus/(\d+)/assets", "list_corpus_assets"),
+        ("POST", r"/v1/assets/", "post_asset"),
+        ("GET", r"/v1/assets/(\d+)", "get_asset"),
+        ("GET", r"/v1/assets/(\d+)/content", "get_asset_content"),
+        ("PUT", r"/v1/assets/(\d+)/raw", "put_asset_raw"),
+        ("GET", r"/v1/assets/(\d+)/raw", "get_asset_raw"),
+        ("GET", r"/v1/questions/", "list_questions"),
+        ("POST", r"/v1/questions/", "post_question"),
+        ("GET", r"/v1/questions/(\d+)", "get_question"),
+        ("POST", r"/v1/assignments/", "post_assignment"),
+        ("GET", r"/v1/assignments/", "list_assignments"),
+        ("POST", r"/v1/assignments/responses", "post_responses"),
+        ("GET", r"/v1/assignments/(\d+)", "get_assignment"),
+    ]
+
+    def handle(self, method, path, token, body):
+        """
+            Returns (status, json) for a request.
+        """
+        path, _, query = path.partition("?")
+        query = dict(urllib.parse.parse_qsl(query))
+        for route_method, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if match is None or route_method != method:
+                continue
+            if name.endswith("_raw") and not self.raw_transfer:
+                continue
+            if name != "login" and token not in self.tokens:
+                return 401, {"error": "authentication required"}
+            args = [int(i) for i in match.groups()]
+            try:
+                return getattr(self, name)(token, body, query, *args)
+            except _NotFound:
+                return 404, {"error": "not found"}
+            except (KeyError, TypeError, ValueError, AssertionError) as e:
+                return 400, ValidationError([FieldError("body", str(e), False)]).to_json()
+        return 404, {"error": "no such endpoint"}
+
+    @staticmethod
+    def _lookup(table, id):
+        try:
+            return table[id]
+        except KeyError:
+            raise _NotFound()
+
+    @staticmethod
+    def _page(items, query):
+        """
+            Returns one page of items, selected by the page and pageSize query parameters.
+        """
+        page = int(query.get("page", 0))
+        page_size = int(query.get("pageSize", 100))
+        start = page * page_size
+        next_page = page + 1 if start + page_size < len(items) else None
+        return 200, {"items": items[start:start + page_size], "nextPage": next_page}
+
+    @staticmethod
+    def _list(table, query):
+        return StandInServer._page([table[id] for id in sorted(list(table))], query)
+
+    def _insert(self, table, value):
+        id = self.next_id()
+        table[id] = value
+        return 201, {"insertedId": id}
+
+    def login(self, token, body, query):
+        request = LoginRequest.from_json(body)
+        password, user_id = self.passwords.get(request.username, (None, None))
+        if password is None or password != request.password:
+            return 401, {"error": "invalid credentials"}
+        token = "token-%d" % self.next_id()
+        self.tokens[token] = user_id
+        return 200, LoginResponse(token, False).to_json()
+
+    def current_user(self, token, body, query):
+        return 200, self.users[self.tokens[token]]
+
+    def get_user(self, token, body, query, id):
+        return 200, self._lookup(self.users, id)
+
+    def list_users(self, token, body, query):
+        return self._list(self.users, query)
+
+    def post_user(self, token, body, query):
+        request = NewUserRequest.from_json(body)
+        return 201, {"insertedId": self.create_user(request.username, request.password, request.role)}
+
+    def list_corpora(self, token, body, query):
+        return self._list(self.corpora, query)
+
+    def post_corpus(self, token, body, query):
+        return self._insert(self.corpora, Corpus.from_json(body).to_json())
+
+    def get_corpus(self, token, body, query, id):
+        return 200, self._lookup(self.corpora, id)
+
+    def post_link(self, token, body, query, corpus_id):
+        self._lookup(self.corpora, corpus_id)
+        link = AssetCorpusLink.from_json(body)
+        self._lookup(self.assets, link.asset_id)
+        link.corpus_id = corpus_id
+        return self._insert(self.links, link.to_json())
+
+    def _corpus_asset_ids(self, corpus_id):
+        self._lookup(self.corpora, corpus_id)
+        return [link["assetId"] for link in list(self.links.values()) if link["corpusId"] == corpus_id]
+
+    def list_corpus_assets(self, token, body, query, corpus_id):
+        return self._page([self.assets[asset_id] for asset_id in self._corpus_asset_ids(corpus_id)], query)
+
+    def post_asset(self, token, body, query):
+        if query.get("contentTransfer") == "raw" and not self.raw_transfer:
+            return 415, {"error": "raw content transfer is not supported"}
+        if query.get("contentTransfer") == "raw":
+            # The content follows separately, through put_asset_raw.
+            content = None
+        else:
+            content = BinaryAsset.from_json(body).content
+        description = BinaryAssetDescription.from_json({k: v for k, v in body.items() if k != "content"})
+        id = self.next_id()
+        description.id = id
+        description.uploader_id = self.tokens[token]
+        self.assets[id] = description.to_json()
+        self.contents[id] = content
+        return 201, {"insertedId": id}
+
+    def get_asset(self, token, body, query, id):
+        return 200, self._lookup(self.assets, id)
+
+    def _content(self, id):
+        content = self.contents.get(id)
+        if content is None:
+            raise _NotFound()
+        return content
+
+    def get_asset_content(self, token, body, query, id):
+        ret = dict(self._lookup(self.assets, id))
+        ret["content"] = bytes_to_base64(self._content(id))
+        return 200, ret
+
+    def put_asset_raw(self, token, body, query, id):
+        self._lookup(self.assets, id)
+        self.contents[id] = body
+        return 201, {"insertedId": id}
+
+    def get_asset_raw(self, token, body, query, id):
+        return 200, self._content(id)
+
+    def list_questions(self, token, body, query):
+        return self._list(self.questions, query)
+
+    def post_question(self, token, body, query):
+        return self._insert(self.questions, Question.from_json(body).to_json())
+
+    def get_question(self, token, body, query, id):
+        return 200, self._lookup(self.questions, id)
+
+    def post_assignment(self, token, body, query):
+        return self._insert(self.assignments, Assignment.from_json(body).to_json())
+
+    def get_assignment(self, token, body, query, id):
+        return 200, self._lookup(self.assignments, id)
+
+    def post_responses(self, token, body, query):
+        """
+            Accepts a batch of {"assignmentId": ..., "response": ...} items, returning
+            a SuccessfulInsert or ValidationError for each one.
+        """
+        ret = []
+        for item in body:
+            errors = []
+            if item.get("assignmentId") not in self.assignments:
+                errors.append(FieldError("assignmentId", "no such assignment", False))
+            try:
+                response = AssignmentResponse.from_json(item.get("response"))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                errors.append(FieldError("response", str(e), False))
+            if errors:
+                ret.append(ValidationError(errors).to_json())
+                continue
+            id = self.next_id()
+            self.responses[id] = (item["assignmentId"], response.to_json())
+            ret.append({"insertedId": id})
+        return 200, ret
+
+    def list_assignments(self, token, body, query):
+        if "corpus" not in query:
+            return self._list(self.assignments, query)
+        assignments = [self.assignments[id] for id in sorted(list(self.assignments))]
+        asset_ids = set(self._corpus_asset_ids(int(query["corpus"])))
+        return self._page([a for a in assignments if asset_ids.intersection(a["assets"])], query)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    stand_in = None
+
+    def setup(self):
+        super().setup()
+        with self.stand_in.lock:
+            self.stand_in.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _inject_fault(self, inflight: int):
+        """
+            Applies the server's injected latency and errors.
+            :return: (status, json, headers) for an injected error, or None.
+        """
+        stand_in = self.stand_in
+        with stand_in.lock:
+            delay = stand_in.latency + stand_in.jitter * stand_in.random.random()
+            if stand_in.max_inflight is not None and inflight > stand_in.max_inflight:
+                stand_in.rejected += 1
+                return 503, {"error": "overloaded"}, {"Retry-After": "1"}
+            if self.path != "/v1/auth/token" and stand_in.random.random() < stand_in.error_rate:
+                stand_in.injected_errors += 1
+                return stand_in.error_status, {"error": "injected error"}, None
+        if delay > 0:
+            time.sleep(delay)
+        return None
+
+    def _dispatch(self, method):
+        raw = self._read_body()
+        with self.stand_in.lock:
+            self.stand_in.requests += 1
+            self.stand_in.bytes_received += len(raw)
+            self.stand_in.inflight += 1
+            inflight = self.stand_in.inflight
+        try:
+            fault = self._inject_fault(inflight)
+            if fault is not None:
+                status, response, headers = fault
+                self._send(status, json.dumps(response).encode("utf8"), headers=headers)
+                return
+            self._respond(method, raw)
+        finally:
+            with self.stand_in.lock:
+                self.stand_in.inflight -= 1
+
+    def _respond(self, method, raw):
+        encoding = self.headers.get("Content-Encoding")
+        if encoding not in (None, "identity"):
+            if not self.stand_in.compression or encoding.strip().lower() not in CODECS:
+                self._send(415, json.dumps({"error": "unsupported content encoding"}).encode("utf8"))
+                return
+            try:
+                raw = decompress(raw, encoding)
+            except (OSError, EOFError, ValueError) as e:
+                self._send(400, json.dumps(ValidationError([FieldError("body", str(e), False)]).to_json())
+                           .encode("utf8"))
+                return
+        token = None
+        authorization = self.headers.get("Authorization", "")
+        if authorization.startswith("Token "):
+            token = authorization[len("Token "):]
+        try:
+            if self.headers.get("Content-Type") == "application/octet-stream":
+                body = raw
+            else:
+                body = json.loads(raw.decode("utf8")) if raw else None
+        except ValueError as e:
+            status, response = 400, ValidationError([FieldError("body", str(e), False)]).to_json()
+        else:
+            status, response = self.stand_in.handle(method, self.path, token, body)
+        if isinstance(response, bytes):
+            self._send(status, response, content_type="application/octet-stream")
+            return
+        data = json.dumps(response).encode("utf8")
+        if method == "GET" and status == 200:
+            etag = '"%s"' % hashlib.sha1(data).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, b"", headers={"ETag": etag})
+            else:
+                self._send(status, data, headers={"ETag": etag})
+            return
+        self._send(status, data)
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            length = int(self.headers.get("Content-Length", 0))
+            return self.rfile.read(length) if length else b""
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+            if size == 0:
+                while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def _send(self, status, data, content_type="application/json", headers=None):
+        headers = dict(headers or {})
+        if self.stand_in.compression:
+            # Advertise the codings accepted for request bodies (RFC 7694).
+            headers["Accept-Encoding"] = accept_encoding()
+            if content_type == "application/json":
+                headers["Vary"] = "Accept-Encoding"
+                encoding = choose_encoding(self.headers.get("Accept-Encoding"))
+                if encoding is not None and len(data) >= self.stand_in.compression_threshold:
+                    data = compress(data, encoding)
+                    headers["Content-Encoding"] = encoding
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        with self.stand_in.lock:
+            self.stand_in.bytes_sent += len(data)
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
@@ -0,0 +1,49 @@
+from .models import Annotation, Assignment, Question
+from .utils import JSONStreamScanner
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_records(fp, chunk_size: int = CHUNK_SIZE):
+    """
+        Yields the records in a JSON array, or in a JSON-lines file, one at a
+        time. Only the record being decoded is held in memory.
+    """
+    scanner = JSONStreamScanner(fp, chunk_size)
+    if scanner.peek() == '[':
+        scanner.expect('[')
+        if scanner.peek() == ']':
+            scanner.expect(']')
+            return
+        while True:
+            yield scanner.read_value()
+            if scanner.expect(',]') == ']':
+                break
+        if scanner.peek() != '':
+            raise ValueError("unexpected data after JSON array")
+        return
+    while scanner.peek() != '':
+        yield scanner.read_value()
+
+
+def iter_decoded(fp, from_json, chunk_size: int = CHUNK_SIZE):
+    """
+        Yields from_json(record) for each record in fp.
+    """
+    for record in iter_json_records(fp, chunk_size):
+        yield from_json(record)
+
+
+def iter_annotations(fp, chunk_size: int = CHUNK_SIZE):
+    """
+        Yields AbstractAnnotation subclasses, dispatched on each record's kind.
+    """
+    return iter_decoded(fp, Annotation.from_json, chunk_size)
+
+
+def iter_questions(fp, chunk_size: int = CHUNK_SIZE):
+    return iter_decoded(fp, Question.from_json, chunk_size)
+
+
+def iter_assignments(fp, chunk_size: int = CHUNK_SIZE):
+    return iter_decoded(fp, Assignment.from_json, chunk_size)
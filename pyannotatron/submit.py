@@ -0,0 +1,304 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import requests
+
+from .client import AnnotatronAPIError
+from .models import AssignmentResponse
+
+# Acknowledged spool records allowed to build up before the spool is rewritten.
+COMPACT_AFTER = 10000
+
+
+def _retryable(error: Exception) -> bool:
+    """
+        Connection failures, timeouts, 5xx and 429 are worth retrying; any
+        other rejection would fail the same way again.
+    """
+    if isinstance(error, AnnotatronAPIError):
+        return error.status >= 500 or error.status == 429
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+class _Pending:
+    __slots__ = ('seq', 'assignment_id', 'response', 'size', 'queued', 'future')
+
+    def __init__(self, seq: int, assignment_id: int, response: AssignmentResponse, size: int):
+        self.seq = seq
+        self.assignment_id = assignment_id
+        self.response = response
+        self.size = size
+        self.queued = time.monotonic()
+        self.future = Future()
+
+
+class ResponseSubmissionQueue:
+    """
+        Write-behind queue that submits AssignmentResponses in batches.
+
+        A batch is flushed once it reaches max_items responses, max_bytes of
+        encoded JSON, or max_delay seconds since its oldest response was queued.
+        Each submit() returns a Future that resolves to the item's
+        SuccessfulInsert or ValidationError. Connection errors, 5xx and 429
+        responses are retried, with backoff, until close(); any other error
+        fails the batch's futures with the exception, and the batch is
+        acknowledged in the spool so recover() doesn't resend it.
+
+        If spool_path is given, responses are appended to a JSON-lines spool
+        before submit() returns, and acknowledged once the server has answered,
+        so responses queued before a crash are sent again by recover(). The
+        spool is rewritten with only the unacknowledged responses once
+        compact_after acknowledged ones have built up. Concurrent submit()s
+        share fsyncs: one call's fsync covers every record written before it.
+    """
+
+    def __init__(self, client, max_items: int = 100, max_bytes: int = 1024 * 1024, max_delay: float = 1.0,
+                 spool_path: str = None, fsync: bool = True, retry_delay: float = 0.5, max_retry_delay: float = 30.0,
+                 compact_after: int = COMPACT_AFTER):
+        self.client = client
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.fsync = fsync
+        self.pending = deque()
+        self.pending_bytes = 0
+        # The batch _run is sending, which is no longer in pending.
+        self.inflight = []
+        self.seq = 0
+        self.condition = threading.Condition()
+        self.closed = False
+        self.abandon = False
+        self.spool_path = spool_path
+        self.spool = None
+        self.compact_after = compact_after
+        # spool_lock guards writes to the spool and the fields below;
+        # sync_lock is taken first, around fsyncs and compaction.
+        self.spool_lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.unacked = {}
+        self.acked = 0
+        self.written = 0
+        self.synced = 0
+        self.recovered = []
+        if spool_path is not None:
+            self.recovered = self._read_spool(spool_path)
+            self.unacked = dict(self.recovered)
+            self.spool = open(spool_path, "a", encoding="utf8")
+            if self.recovered:
+                self.seq = max(seq for seq, _ in self.recovered)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def _read_spool(path: str) -> list:
+        """
+            Returns the [(seq, record)] that were spooled but never acknowledged.
+        """
+        if not os.path.exists(path):
+            return []
+        records = {}
+        with open(path, encoding="utf8") as fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A partial line left by a crash mid-write.
+                    continue
+                if "ack" in record:
+                    for seq in record["ack"]:
+                        records.pop(seq, None)
+                else:
+                    records[record["seq"]] = record
+        return sorted(records.items())
+
+    def _write_spool(self, record: dict):
+        with self.spool_lock:
+            self.spool.write(json.dumps(record) + "\n")
+            self.spool.flush()
+            self.written += 1
+            position = self.written
+            if "ack" in record:
+                for seq in record["ack"]:
+                    self.unacked.pop(seq, None)
+                self.acked += len(record["ack"])
+            else:
+                self.unacked[record["seq"]] = record
+        if self.fsync:
+            self._sync(position)
+
+    def _sync(self, position: int):
+        """
+            Makes sure the spool is on disk up to the position'th write. If
+            another thread's fsync already covered it, there's nothing to do.
+        """
+        with self.sync_lock:
+            if self.synced >= position:
+                return
+            with self.spool_lock:
+                position = self.written
+            os.fsync(self.spool.fileno())
+            self.synced = position
+
+    def _compact(self):
+        """
+            Rewrites the spool with only its unacknowledged records.
+        """
+        with self.sync_lock, self.spool_lock:
+            tmp_path = self.spool_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf8") as fp:
+                for _, record in sorted(self.unacked.items()):
+                    fp.write(json.dumps(record) + "\n")
+                fp.flush()
+                if self.fsync:
+                    os.fsync(fp.fileno())
+            self.spool.close()
+            os.replace(tmp_path, self.spool_path)
+            self.spool = open(self.spool_path, "a", encoding="utf8")
+            self.acked = 0
+            self.synced = self.written
+
+    def recover(self) -> list:
+        """
+            Queues the responses left unacknowledged in the spool by an earlier run.
+            :return: Their futures.
+        """
+        ret = []
+        recovered, self.recovered = self.recovered, []
+        for seq, record in recovered:
+            ret.append(self._enqueue(seq, record["assignmentId"], AssignmentResponse.from_json(record["response"]),
+                                     json.dumps(record["response"])))
+        return ret
+
+    def submit(self, assignment_id: int, response: AssignmentResponse) -> Future:
+        encoded = response.to_json()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("queue is closed")
+            self.seq += 1
+            seq = self.seq
+        if self.spool is not None:
+            self._write_spool({"seq": seq, "assignmentId": assignment_id, "response": encoded})
+        return self._enqueue(seq, assignment_id, response, json.dumps(encoded))
+
+    def _enqueue(self, seq, assignment_id, response, encoded: str) -> Future:
+        item = _Pending(seq, assignment_id, response, len(encoded))
+        with self.condition:
+            self.pending.append(item)
+            self.pending_bytes += item.size
+            self.condition.notify()
+        return item.future
+
+    def __len__(self):
+        with self.condition:
+            return len(self.pending)
+
+    def _batch_ready(self) -> bool:
+        if not self.pending:
+            return False
+        return (self.closed or len(self.pending) >= self.max_items or self.pending_bytes >= self.max_bytes
+                or time.monotonic() - self.pending[0].queued >= self.max_delay)
+
+    def _take_batch(self) -> list:
+        batch, size = [], 0
+        while self.pending and len(batch) < self.max_items:
+            if batch and size + self.pending[0].size > self.max_bytes:
+                break
+            item = self.pending.popleft()
+            size += item.size
+            batch.append(item)
+        self.pending_bytes -= size
+        return batch
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            with self.condition:
+                while not self._batch_ready():
+                    if self.closed and not self.pending:
+                        return
+                    timeout = None
+                    if self.pending:
+                        timeout = max(0.0, self.max_delay - (time.monotonic() - self.pending[0].queued))
+                    self.condition.wait(timeout)
+                batch = self._take_batch()
+                self.inflight = batch
+            try:
+                results = self.client.submit_responses([(item.assignment_id, item.response) for item in batch])
+            except Exception as e:
+                if not _retryable(e):
+                    self._finish(batch, [], e)
+                    continue
+                with self.condition:
+                    self.inflight = []
+                    if self.closed and self.abandon:
+                        for item in batch:
+                            item.future.set_exception(e)
+                        continue
+                    # Put the batch back at the front and try again later.
+                    self.pending.extendleft(reversed(batch))
+                    self.pending_bytes += sum(item.size for item in batch)
+                    self.condition.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            delay = self.retry_delay
+            self._finish(batch, results, RuntimeError("the server returned %d results for %d responses"
+                                                      % (len(results), len(batch))))
+
+    def _finish(self, batch: list, results: list, error: Exception):
+        """
+            Acknowledges a batch the server has answered, and resolves its
+            futures: with results, in order, and with error for any items
+            results doesn't cover.
+        """
+        if self.spool is not None:
+            self._write_spool({"ack": [item.seq for item in batch]})
+            if self.acked >= self.compact_after:
+                self._compact()
+        for item, result in zip(batch, results):
+            item.future.set_result(result)
+        for item in batch[len(results):]:
+            item.future.set_exception(error)
+        with self.condition:
+            self.inflight = []
+
+    def flush(self, timeout: float = None):
+        """
+            Submits everything queued so far and waits for the results,
+            including those of the batch being sent.
+        """
+        with self.condition:
+            futures = [item.future for item in self.inflight]
+            futures += [item.future for item in self.pending]
+            for item in self.pending:
+                item.queued = float("-inf")
+            self.condition.notify()
+        for future in futures:
+            future.exception(timeout)
+
+    def close(self, abandon: bool = False):
+        """
+            Flushes the queue and stops the background thread. With abandon,
+            batches that fail are given up on (their futures get the error) rather
+            than retried; they stay in the spool for recover().
+        """
+        with self.condition:
+            self.closed = True
+            self.abandon = abandon
+            self.condition.notify()
+        self.thread.join()
+        if self.spool is not None:
+            self.spool.close()
+            if not self.unacked:
+                os.remove(self.spool_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
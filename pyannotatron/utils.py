@@ -1,17 +1,91 @@
 import os
 import datetime
 import base64
+import codecs
+import functools
+import json
 
-def parse_json_date(input):
+JSON_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# Cache size for parsed/formatted timestamps. Bulk-generated annotations tend
+# to share a handful of creation times, so a small cache goes a long way.
+DATE_CACHE_SIZE = 4096
+
+# When True, parse_json_date returns timezone-aware UTC datetimes by default.
+AWARE_DATES = False
+
+
+def _parse_fixed_json_date(input: str) -> datetime.datetime:
+    # Fast path for the layout the server emits: 2018-04-23T18:25:43.511000Z
+    if len(input) == 27 and input[4] == '-' and input[7] == '-' and input[10] == 'T' \
+            and input[13] == ':' and input[16] == ':' and input[19] == '.' and input[26] == 'Z':
+        digits = input[0:4] + input[5:7] + input[8:10] + input[11:13] + input[14:16] + input[17:19] + input[20:26]
+        if digits.isdigit():
+            try:
+                return datetime.datetime(int(digits[0:4]), int(digits[4:6]), int(digits[6:8]),
+                                         int(digits[8:10]), int(digits[10:12]), int(digits[12:14]),
+                                         int(digits[14:20]))
+            except ValueError:
+                pass
+    return datetime.datetime.strptime(input, JSON_DATE_FORMAT)
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_cached_json_date(input: str, aware: bool) -> datetime.datetime:
+    ret = _parse_fixed_json_date(input)
+    if aware:
+        ret = ret.replace(tzinfo=datetime.timezone.utc)
+    return ret
+
+
+def parse_json_date(input, aware: bool = None):
+    """
+        Converts a JSON timestamp into a datetime.
+        :param aware: return a UTC-aware datetime (defaults to AWARE_DATES).
+    """
+    if aware is None:
+        aware = AWARE_DATES
     if type(input) == datetime.datetime:
+        if aware and input.tzinfo is None:
+            return input.replace(tzinfo=datetime.timezone.utc)
         return input
-    else:
-        return datetime.datetime.strptime(input, '%Y-%m-%dT%H:%M:%S.%fZ')
+    return _parse_cached_json_date(input, aware)
+
+
+def parse_json_dates(inputs, aware: bool = None) -> list:
+    """
+        Converts a column of JSON timestamps into datetimes, parsing each
+        distinct value only once.
+    """
+    if aware is None:
+        aware = AWARE_DATES
+    seen = {}
+    ret = []
+    for input in inputs:
+        value = seen.get(input)
+        if value is None:
+            value = parse_json_date(input, aware)
+            seen[input] = value
+        ret.append(value)
+    return ret
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def _format_json_date(input: datetime.datetime) -> str:
+    if input.year < 1000:
+        return input.strftime(JSON_DATE_FORMAT)
+    return '%04d-%02d-%02dT%02d:%02d:%02d.%06dZ' % (input.year, input.month, input.day, input.hour,
+                                                    input.minute, input.second, input.microsecond)
 
 
 def date_to_json(input: datetime.datetime):
-    # TODO: timezones
-    return input.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    """
+        Converts a datetime into a JSON timestamp. Naive datetimes are
+        assumed to be UTC, aware ones are converted to UTC first.
+    """
+    if input.tzinfo is not None:
+        input = input.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return _format_json_date(input)
 
 
 def base64_to_bytes(input: str) -> bytes:
@@ -22,58 +96,334 @@ def bytes_to_base64(input: bytes) -> str:
     return base64.b64encode(input).decode("utf8")
 
 
-def generic_from_json(json_dict, mapping_dict):
-    response_dict = {}
-    for key in json_dict:
-        old_value = json_dict[key]
-        if key not in mapping_dict:
-            response_dict[key] = json_dict[key]
-            continue
+# Bytes read per chunk when streaming base64. Must be a multiple of 3.
+BASE64_CHUNK_SIZE = 3 * 256 * 1024
 
-        def conversion_func(x):
-            return x
 
-        try:
-            new_key, conversion_func, _ = mapping_dict[key]
-        except ValueError:
-            new_key = mapping_dict[key]
-            assert type(new_key) != type([])
+def iter_bytes_to_base64(src, chunk_size: int = BASE64_CHUNK_SIZE):
+    """
+        Reads bytes from the binary file object src, yielding them as pieces
+        of base64 text, one chunk at a time.
+    """
+    chunk_size -= chunk_size % 3
+    assert chunk_size > 0
+    pending = b''
+    while True:
+        data = src.read(chunk_size)
+        if not data:
+            break
+        if pending:
+            data = pending + data
+        cut = len(data) - len(data) % 3
+        yield base64.b64encode(data[:cut]).decode("ascii")
+        pending = data[cut:]
+    if pending:
+        yield base64.b64encode(pending).decode("ascii")
 
-        response_dict[new_key] = conversion_func(old_value)
 
-    return response_dict
+def copy_bytes_to_base64(src, dst, chunk_size: int = BASE64_CHUNK_SIZE):
+    """
+        Reads bytes from the binary file object src and writes them to the text
+        file object dst as base64, one chunk at a time.
+    """
+    for text in iter_bytes_to_base64(src, chunk_size):
+        dst.write(text)
 
 
-def generic_to_json(python_dict, mapping_dict):
-    response_dict = {}
-    converted_keys = set([])
-    for key in mapping_dict:
+class Base64StreamDecoder:
+    """
+        Decodes base64 text written to it in arbitrary pieces, writing the bytes
+        to the binary file object dst.
+    """
 
-        def conversion_func_raw(x):
-            return x
+    def __init__(self, dst):
+        self.dst = dst
+        self.pending = ''
+        self.total = 0
 
-        try:
-            python_name, _, conversion_func = mapping_dict[key]
-        except ValueError:
-            conversion_func = conversion_func_raw
-            python_name = mapping_dict[key]
-
-        if python_name in python_dict:
-            value = python_dict[python_name]
-            response_dict[key] = conversion_func(value)
-            converted_keys.add(python_name)
-
-    for key in python_dict:
-        if key in converted_keys:
-            continue
-        matched = False
-        for potential_key in mapping_dict:
+    def write(self, text: str):
+        if self.pending:
+            text = self.pending + text
+        cut = len(text) - len(text) % 4
+        if cut:
+            data = base64.b64decode(text[:cut])
+            self.total += len(data)
+            self.dst.write(data)
+        self.pending = text[cut:]
+
+    def close(self) -> int:
+        """
+            Flushes anything left over, returning the number of bytes written.
+        """
+        if self.pending:
+            data = base64.b64decode(self.pending)
+            self.total += len(data)
+            self.dst.write(data)
+            self.pending = ''
+        return self.total
+
+
+def copy_base64_to_bytes(src, dst, chunk_size: int = BASE64_CHUNK_SIZE) -> int:
+    """
+        Reads base64 text from the text file object src and writes the decoded
+        bytes to the binary file object dst.
+        :return: The number of bytes written.
+    """
+    decoder = Base64StreamDecoder(dst)
+    while True:
+        text = src.read(chunk_size)
+        if not text:
+            break
+        decoder.write(text)
+    return decoder.close()
+
+
+class JSONStreamScanner:
+    """
+        Minimal incremental reader for JSON text arriving from a file object.
+
+        Only the current value is buffered, so large documents can be walked
+        without loading them whole. String values can also be streamed out
+        piece by piece with read_string_to.
+    """
+
+    WHITESPACE = ' \t\n\r'
+
+    def __init__(self, fp, chunk_size: int = 64 * 1024):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf8")()
+
+    def _read_chunk(self) -> str:
+        """
+            Returns the next chunk of text from fp, or '' at the end.
+        """
+        while True:
+            data = self.fp.read(self.chunk_size)
+            if not isinstance(data, bytes):
+                return data
+            text = self.text_decoder.decode(data, final=not data)
+            # Only part of a multi-byte character arrived, keep reading.
+            if text or not data:
+                return text
+
+    def _fill(self, minimum: int = 0) -> bool:
+        """
+            Appends at least one chunk, and at least minimum characters, to
+            the buffer, joining them in one copy.
+        """
+        if self.eof:
+            return False
+        pieces = [self.buffer[self.pos:]]
+        added = 0
+        while True:
+            data = self._read_chunk()
+            if not data:
+                self.eof = True
+                break
+            pieces.append(data)
+            added += len(data)
+            if added >= minimum:
+                break
+        if not added:
+            return False
+        self.buffer = ''.join(pieces)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+            Returns the next non-whitespace character without consuming it, or '' at the end.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if c == '' or c not in chars:
+            raise ValueError("expected one of %r at offset %d, found %r" % (chars, self.pos, c))
+        self.pos += 1
+        return c
+
+    def read_value(self):
+        """
+            Decodes the next value. While a value is incomplete, the buffer is
+            at least doubled before each retry, so a record of n characters
+            costs O(n) however many chunks it spans.
+        """
+        self.peek()
+        while True:
             try:
-                python_name, _, _ = mapping_dict[potential_key]
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number at the very end of the buffer might continue in the next chunk.
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
             except ValueError:
-                python_name = mapping_dict[potential_key]
-            matched |= python_name == key
-        if not matched:
-            response_dict[key] = python_dict[key]
+                if self.eof:
+                    raise
+            self._fill(len(self.buffer) - self.pos)
+
+    def read_string_to(self, write):
+        """
+            Streams the next JSON string value to write() in pieces. Only the
+            escapes that can appear in base64 text are supported.
+        """
+        self.expect('"')
+        while True:
+            buffer = self.buffer
+            end = len(buffer)
+            quote = buffer.find('"', self.pos)
+            escape = buffer.find('\\', self.pos)
+            stop = min(i for i in (quote, escape, end) if i >= 0)
+            if stop > self.pos:
+                write(buffer[self.pos:stop])
+                self.pos = stop
+            if stop == quote:
+                self.pos += 1
+                return
+            if stop == escape:
+                if escape + 1 >= end:
+                    if not self._fill():
+                        raise ValueError("unterminated string")
+                    continue
+                if buffer[escape + 1] != '/':
+                    raise ValueError("unsupported escape %r in streamed string" % buffer[escape:escape + 2])
+                write('/')
+                self.pos = escape + 2
+                continue
+            if not self._fill():
+                raise ValueError("unterminated string")
+
+
+_FIELD_NAMES = {}
+
+
+def object_fields(obj) -> dict:
+    """
+        Returns an object's attributes as a dict, in assignment order, whether
+        they're stored in __slots__ or __dict__.
+    """
+    cls = type(obj)
+    names = _FIELD_NAMES.get(cls)
+    if names is None:
+        names = []
+        for klass in reversed(cls.__mro__):
+            for name in klass.__dict__.get('__slots__', ()):
+                if name not in ('__dict__', '__weakref__') and name not in names:
+                    names.append(name)
+        names = tuple(names)
+        _FIELD_NAMES[cls] = names
+    if not names:
+        return obj.__dict__
+    ret = {}
+    for name in names:
+        try:
+            ret[name] = getattr(obj, name)
+        except AttributeError:
+            pass
+    ret.update(getattr(obj, '__dict__', {}))
+    return ret
+
+
+class MapCodec:
+    """
+        Encoder/decoder pair compiled from a model's MAP.
+
+        The MAP is read once here rather than on every call, so decoding is a
+        single dict lookup per key and encoding only touches each field once.
+    """
+
+    def __init__(self, mapping_dict):
+        self.mapping = mapping_dict
+        self.decoders = {}
+        self.encoders = []
+        self.mapped_names = set([])
+        for key in mapping_dict:
+            entry = mapping_dict[key]
+            if type(entry) == tuple:
+                python_name, from_json, to_json = entry
+            else:
+                assert type(entry) != type([])
+                python_name, from_json, to_json = entry, None, None
+            self.decoders[key] = (python_name, from_json)
+            self.encoders.append((key, python_name, to_json))
+            self.mapped_names.add(python_name)
+
+    def decode(self, json_dict):
+        response_dict = {}
+        decoders = self.decoders
+        for key, value in json_dict.items():
+            entry = decoders.get(key)
+            if entry is None:
+                response_dict[key] = value
+                continue
+            new_key, conversion_func = entry
+            if conversion_func is None:
+                response_dict[new_key] = value
+            else:
+                response_dict[new_key] = conversion_func(value)
+        return response_dict
 
-    return response_dict
+    def encode(self, python_dict):
+        response_dict = {}
+        for key, python_name, conversion_func in self.encoders:
+            if python_name in python_dict:
+                value = python_dict[python_name]
+                if conversion_func is None:
+                    response_dict[key] = value
+                else:
+                    response_dict[key] = conversion_func(value)
+        mapped_names = self.mapped_names
+        for key, value in python_dict.items():
+            if key not in mapped_names:
+                response_dict[key] = value
+        return response_dict
+
+
+# id(MAP) -> MapCodec. Each codec holds its MAP, so an id can't be reused
+# while its entry is cached.
+_COMPILED_MAPS = {}
+
+# Models only have a few dozen MAPs; past this many, the cache is assumed to
+# be filling with short-lived ones and is emptied.
+MAX_COMPILED_MAPS = 1024
+
+
+def compile_map(mapping_dict) -> MapCodec:
+    """
+        Returns the MapCodec for mapping_dict, compiling it on first use.
+        MAPs must not be changed after they're first used: the compiled codec
+        wouldn't see the change. Call clear_compiled_maps() if one has to be.
+    """
+    codec = _COMPILED_MAPS.get(id(mapping_dict))
+    if codec is None or codec.mapping is not mapping_dict:
+        codec = MapCodec(mapping_dict)
+        if len(_COMPILED_MAPS) >= MAX_COMPILED_MAPS:
+            _COMPILED_MAPS.clear()
+        _COMPILED_MAPS[id(mapping_dict)] = codec
+    return codec
+
+
+def clear_compiled_maps():
+    """
+        Forgets every compiled MAP, e.g. after one has been modified.
+    """
+    _COMPILED_MAPS.clear()
+
+
+def generic_from_json(json_dict, mapping_dict):
+    return compile_map(mapping_dict).decode(json_dict)
+
+
+def generic_to_json(python_dict, mapping_dict):
+    return compile_map(mapping_dict).encode(python_dict)
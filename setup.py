@@ -19,11 +19,25 @@ setup(
         'Intended Audience :: Developers',
         'Topic :: Software Development',
         'License :: OSI Approved :: MIT License',
-        'Programming Language :: Python :: 3.4'
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12'
    ],
    keywords='ml database',
-   py_modules=['pyannotatron.models', 'pyannotatron.utils'],
+   py_modules=['pyannotatron.models', 'pyannotatron.utils', 'pyannotatron.intervals',
+                'pyannotatron.checksum', 'pyannotatron.streaming', 'pyannotatron.client',
+                'pyannotatron.server', 'pyannotatron.aclient', 'pyannotatron.ingest',
+                'pyannotatron.cache', 'pyannotatron.submit', 'pyannotatron.limiter',
+                'pyannotatron.compression', 'pyannotatron.loadgen',
+                'pyannotatron.aggregation', 'pyannotatron.agreement',
+                'pyannotatron.overlap', 'pyannotatron.segmentation', 'pyannotatron.parallel'],
+   python_requires='>=3.8',
    install_requires=['requests'],
+   extras_require={'zstd': ['zstandard']},
    project_urls={
     'Bug Reports': 'https://github.com/Sentimentron/pyannotatron/issues',
     'Source': 'https://github.com/Sentimentron/pyannotatron'
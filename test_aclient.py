@@ -0,0 +1,80 @@
+from unittest import TestCase
+from pyannotatron.aclient import AsyncAnnotatronClient
+from pyannotatron.server import StandInServer
+from pyannotatron.models import Corpus, BinaryAsset, BinaryAssetKind, AssetCorpusLink, Assignment, AssignmentResponse
+from pyannotatron.models import MultipleChoiceQuestion, MultipleChoiceAnnotation, QuestionKind, AnnotationSource
+from pyannotatron.models import SuccessfulInsert
+import asyncio
+import datetime
+import hashlib
+import io
+
+
+class TestAsyncClient(TestCase):
+
+    def setUp(self):
+        self.server = StandInServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def make_asset(self, content):
+        return BinaryAsset(content, "text/plain", BinaryAssetKind.UTF8_TEXT, "No redistribution",
+                           hashlib.sha512(content).hexdigest())
+
+    def test_upload_and_link(self):
+        async def run():
+            async with AsyncAnnotatronClient(self.server.url, concurrency=8) as client:
+                await client.login("admin", "admin")
+                corpus_id = (await client.create_corpus(Corpus("bulk"))).id
+                named_assets = [("%03d.txt" % i, self.make_asset(("asset %d" % i).encode("utf8")))
+                                for i in range(50)]
+                links = await client.upload_and_link(corpus_id, named_assets)
+                asset = await client.get_asset_content(self.server.links[links[7].id]["assetId"])
+                return links, asset
+
+        links, asset = asyncio.run(run())
+        self.assertEqual(len(links), 50)
+        self.assertEqual(len(self.server.assets), 50)
+        self.assertEqual(asset.content, b"asset 7")
+        self.assertLessEqual(self.server.connections, 8 + 1)
+
+    def test_streamed_upload(self):
+        payload = bytes(range(256)) * 4000
+        asset = self.make_asset(payload)
+
+        async def run():
+            async with AsyncAnnotatronClient(self.server.url) as client:
+                await client.login("admin", "admin")
+                asset_id = (await client.upload_asset(asset, io.BytesIO(payload), chunk_size=3000)).id
+                return await client.get_asset_content(asset_id)
+
+        self.assertEqual(asyncio.run(run()).content, payload)
+
+    def test_pages_and_raw(self):
+        question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SENTIMENT", "Is this positive?",
+                                          QuestionKind.MULTIPLE_CHOICE, ["positive", "negative"])
+        annotation = MultipleChoiceAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.HUMAN, "SENTIMENT",
+                                              ["positive"])
+        payload = b"raw content" * 1000
+
+        async def run():
+            async with AsyncAnnotatronClient(self.server.url) as client:
+                await client.login("admin", "admin")
+                ids = [(await client.create_assignment(Assignment([i], i, question, response=annotation))).id
+                       for i in range(11)]
+                annotators = [a.assigned_annotator_id async for a in client.iter_assignments(page_size=3)]
+                results = await client.submit_responses([(id, AssignmentResponse(annotation)) for id in ids[:2]])
+
+                corpus_id = (await client.create_corpus(Corpus("raw"))).id
+                asset_id = (await client.upload_asset(self.make_asset(b"placeholder"))).id
+                await client.put_asset_raw(asset_id, payload)
+                await client.link_asset(AssetCorpusLink("raw.txt", asset_id, corpus_id))
+                assets = [a async for a in client.iter_corpus_assets(corpus_id)]
+                return annotators, results, assets, asset_id
+
+        annotators, results, assets, asset_id = asyncio.run(run())
+        self.assertEqual(annotators, list(range(11)))
+        self.assertEqual([type(r) for r in results], [SuccessfulInsert, SuccessfulInsert])
+        self.assertEqual(len(assets), 1)
+        self.assertEqual(self.server.contents[asset_id], payload)
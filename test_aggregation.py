@@ -0,0 +1,94 @@
+from unittest import TestCase
+from pyannotatron.aggregation import ChoiceMatrix, aggregate, assignment_observations, group_annotations
+from pyannotatron.models import MultipleChoiceAnnotation, AnnotationSource, Assignment, MultipleChoiceQuestion
+from pyannotatron.models import QuestionKind
+import datetime
+import random
+
+
+def choice(label, summary_code="SENTIMENT"):
+    return MultipleChoiceAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.HUMAN, summary_code,
+                                    label if isinstance(label, list) else [label])
+
+
+class TestMajorityVote(TestCase):
+
+    def test_majority_vote(self):
+        matrix = ChoiceMatrix("SENTIMENT", ["positive", "negative"])
+        votes = {
+            "a": {1: "positive", 2: "negative", 3: "negative"},
+            "b": {1: "positive", 2: "positive", 3: "negative"},
+            "c": {1: "negative", 2: "negative", 4: "negative"},
+            "d": {4: "positive"},
+        }
+        for annotator, items in votes.items():
+            for item, label in items.items():
+                matrix.add(item, annotator, choice(label))
+        result = matrix.majority_vote()
+        self.assertEqual(list(result), [(1, "positive", 2 / 3), (2, "negative", 2 / 3), (3, "negative", 1.0),
+                                        (4, "positive", 0.5)])
+        # Item 1 is now tied, and ties go to the first label.
+        self.assertEqual([label for _, label, _ in matrix.majority_vote({"c": 2.0})],
+                         ["positive", "negative", "negative", "negative"])
+
+    def test_multiple_choices(self):
+        matrix = ChoiceMatrix("TOPICS")
+        matrix.add(1, "a", choice(["sport", "politics"], "TOPICS"))
+        matrix.add(1, "b", choice(["sport"], "TOPICS"))
+        matrix.add(1, "c", choice([], "TOPICS"))
+        self.assertEqual(matrix.counts(), [[1.5], [0.5]])
+        self.assertEqual(matrix.annotators, ["a", "b"])
+
+    def test_aggregate_assignments(self):
+        question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SENTIMENT", "Is this positive?",
+                                          QuestionKind.MULTIPLE_CHOICE, ["positive", "negative"])
+        assignments = [Assignment([7], annotator, question, response=choice(label))
+                       for annotator, label in [(1, "negative"), (2, "positive"), (3, "negative")]]
+        assignments.append(Assignment([8, 9], 1, question, response=choice("positive")))
+        assignments.append(Assignment([10], 1, question))
+        created = datetime.datetime(2018, 5, 1)
+        ret = aggregate(assignment_observations(assignments), created=created)
+        self.assertEqual([item for item, _ in ret], [7, (8, 9)])
+        annotation = ret[0][1]
+        self.assertEqual(annotation.source, AnnotationSource.AGGREGATED)
+        self.assertEqual(annotation.choices, ["negative"])
+        self.assertEqual(annotation.to_json()["source"], "Aggregated")
+        self.assertEqual(annotation.created, created)
+
+    def test_group_by_summary_code(self):
+        matrices = group_annotations([(1, "a", choice("positive")), (1, "a", choice("yes", "SPAM")),
+                                      (2, "b", choice("no", "SPAM"))], labels={"SPAM": ["no", "yes"]})
+        self.assertEqual(sorted(matrices), ["SENTIMENT", "SPAM"])
+        self.assertEqual(matrices["SPAM"].labels, ["no", "yes"])
+        self.assertEqual(len(matrices["SPAM"]), 2)
+
+
+class TestDawidSkene(TestCase):
+
+    def test_outvotes_unreliable_annotators(self):
+        rng = random.Random(1)
+        labels = ["positive", "negative", "neutral"]
+        truth = [rng.randrange(3) for _ in range(500)]
+        matrix = ChoiceMatrix("SENTIMENT", labels)
+        for item, label in enumerate(truth):
+            matrix.add(item, "expert", choice(labels[label]))
+            # Two annotators who give the same wrong label 60% of the time often outvote the expert.
+            matrix.add(item, "spammer-1", choice(labels[(label + 1) % 3] if rng.random() < 0.6 else labels[label]))
+            matrix.add(item, "spammer-2", choice(labels[(label + 1) % 3] if rng.random() < 0.6 else labels[label]))
+        majority = sum(l == t for l, t in zip(matrix.majority_vote().best(), truth))
+        result = matrix.dawid_skene()
+        self.assertLess(majority, 400)
+        self.assertEqual(result.best(), truth)
+        accuracy = result.annotator_accuracy()
+        self.assertGreater(accuracy["expert"], 0.95)
+        self.assertLess(accuracy["spammer-1"], 0.5)
+        self.assertAlmostEqual(sum(result.prior), 1.0)
+        for row in zip(*result.scores):
+            self.assertAlmostEqual(sum(row), 1.0)
+
+    def test_no_labels(self):
+        matrix = ChoiceMatrix("SENTIMENT")
+        matrix.add(1, "a", choice([]))
+        for result in (matrix.majority_vote(), matrix.dawid_skene()):
+            self.assertEqual(len(result), 0)
+            self.assertEqual(result.to_annotations(), [])
@@ -0,0 +1,71 @@
+from unittest import TestCase
+from pyannotatron.agreement import AgreementStatistics, agreement
+from pyannotatron.aggregation import ChoiceMatrix, assignment_observations
+from pyannotatron.models import MultipleChoiceAnnotation, AnnotationSource, Assignment, MultipleChoiceQuestion
+from pyannotatron.models import QuestionKind
+import datetime
+
+
+def choice(label, summary_code="Q"):
+    return MultipleChoiceAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.HUMAN, summary_code,
+                                    label if isinstance(label, list) else [label])
+
+
+class TestAgreement(TestCase):
+
+    def test_fleiss_kappa(self):
+        # Fleiss (1971), as worked through on Wikipedia: 10 items, 14 raters, 5 categories.
+        table = [[0, 0, 0, 0, 14], [0, 2, 6, 4, 2], [0, 0, 3, 5, 6], [0, 3, 9, 2, 0], [2, 2, 8, 1, 1],
+                 [7, 7, 0, 0, 0], [3, 2, 6, 3, 0], [2, 5, 3, 2, 2], [6, 5, 2, 1, 0], [0, 2, 2, 3, 7]]
+        matrix = ChoiceMatrix("Q", range(5))
+        for item, row in enumerate(table):
+            labels = [label for label, n in enumerate(row) for _ in range(n)]
+            for rater, label in enumerate(labels):
+                matrix.add(item, rater, choice(label))
+        self.assertAlmostEqual(AgreementStatistics(matrix).fleiss_kappa(), 0.210, places=3)
+
+    def test_krippendorff_alpha(self):
+        # Krippendorff's nominal example with missing values, alpha = 0.743.
+        data = {
+            "A": [1, 2, 3, 3, 2, 1, 4, 1, 2, None, None, None],
+            "B": [1, 2, 3, 3, 2, 2, 4, 1, 2, 5, None, 3],
+            "C": [None, 3, 3, 3, 2, 3, 4, 2, 2, 5, 1, None],
+            "D": [1, 2, 3, 3, 2, 4, 4, 1, 2, 5, 1, None],
+        }
+        observations = [(item, annotator, choice(label)) for annotator, labels in data.items()
+                        for item, label in enumerate(labels) if label is not None]
+        self.assertAlmostEqual(agreement(observations)["Q"].krippendorff_alpha(), 0.743, places=3)
+
+    def test_cohens_kappa(self):
+        # 20 yes/yes, 5 yes/no, 10 no/yes and 15 no/no: kappa = 0.4.
+        pairs = [("yes", "yes")] * 20 + [("yes", "no")] * 5 + [("no", "yes")] * 10 + [("no", "no")] * 15
+        matrix = ChoiceMatrix("Q")
+        for item, (a, b) in enumerate(pairs):
+            matrix.add(item, "a", choice(a))
+            matrix.add(item, "b", choice(b))
+        statistics = AgreementStatistics(matrix)
+        self.assertAlmostEqual(statistics.cohens_kappa("a", "b"), 0.4)
+        self.assertAlmostEqual(statistics.cohens_kappa("b", "a"), 0.4)
+        self.assertEqual(list(statistics.pairwise_cohens_kappa()), [("a", "b")])
+        breakdown = statistics.annotator_breakdown()
+        self.assertEqual(breakdown["a"]["items"], 50)
+        self.assertAlmostEqual(breakdown["a"]["observedAgreement"], 0.7)
+        self.assertAlmostEqual(breakdown["b"]["meanCohensKappa"], 0.4)
+
+    def test_assignments(self):
+        question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SENTIMENT", "Is this positive?",
+                                          QuestionKind.MULTIPLE_CHOICE, ["positive", "negative"])
+        votes = [(1, 10, "positive"), (1, 11, "positive"), (1, 12, "negative"),
+                 (2, 10, "negative"), (2, 11, "negative"), (2, 12, "negative"),
+                 (3, 10, "positive")]
+        assignments = [Assignment([asset], annotator, question, response=choice(label, "SENTIMENT"))
+                       for asset, annotator, label in votes]
+        statistics = agreement(assignment_observations(assignments))["SENTIMENT"]
+        breakdown = statistics.annotator_breakdown()
+        self.assertEqual(sorted(breakdown), [10, 11, 12])
+        self.assertEqual(breakdown[10]["items"], 3)
+        self.assertEqual(breakdown[10]["comparisons"], 4)
+        self.assertEqual(breakdown[12]["observedAgreement"], 0.5)
+        report = statistics.to_json()
+        self.assertEqual(report["items"], 3)
+        self.assertEqual(set(report["annotatorBreakdown"]), {"10", "11", "12"})
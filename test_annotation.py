@@ -1,6 +1,7 @@
 from unittest import TestCase
 from pyannotatron.models import Annotation, TimeSeriesSegmentationAnnotation, TimeSeriesRangeAnnotation, GenericJSONAnnotation
 from pyannotatron.models import MultipleChoiceAnnotation, TextAnnotation, AnnotationKind, AnnotationSource
+from pyannotatron.models import TimeSeriesRangeColumns
 import datetime
 
 
@@ -127,3 +128,31 @@ class TestAnnotation(TestCase):
 
         output_json = result.to_json()
         self.assertDictEqual(input_json, output_json)
+
+    def test_time_series_range_columnar(self):
+        input_json = {
+            "created": "2018-04-23T18:25:43.511000Z",
+            "kind": "TimeSeriesRangeAnnotation",
+            "source": "SystemGenerated",
+            "summaryCode": "AMBIENT",
+            "ranges": [
+                {"label": "noisy", "start": 0.0, "end": 0.1},
+                {"label": "talking", "start": 0.1, "end": 0.25},
+                {"label": "noisy", "start": 0.25, "end": 0.5}
+            ]
+        }
+
+        result = TimeSeriesRangeAnnotation.from_json(input_json, columnar=True)
+        self.assertEqual(type(result.ranges), TimeSeriesRangeColumns)
+        self.assertEqual(result.ranges.labels, ["noisy", "talking"])
+        self.assertEqual(list(result.ranges.label_ids), [0, 1, 0])
+        self.assertEqual(len(result.ranges), 3)
+        self.assertEqual(result.ranges[1].label, "talking")
+        self.assertAlmostEqual(result.ranges[-1].end, 0.5)
+        self.assertEqual([r.label for r in result.ranges], ["noisy", "talking", "noisy"])
+
+        output_json = result.to_json()
+        self.assertDictEqual(input_json, output_json)
+
+        ranges = TimeSeriesRangeAnnotation.from_json(input_json).ranges
+        self.assertEqual(TimeSeriesRangeColumns.from_ranges(ranges).to_json(), input_json["ranges"])
@@ -2,6 +2,8 @@ from unittest import TestCase
 from pyannotatron.models import BinaryAsset, BinaryAssetKind, AssetCorpusLink
 import datetime
 import hashlib
+import io
+import json
 
 
 class TestAsset(TestCase):
@@ -54,3 +56,58 @@ class TestAsset(TestCase):
 
         output_json = result.to_json()
         self.assertDictEqual(input_json, output_json)
+
+    def test_lazy_asset(self):
+        input_json = {
+            "id": 7,
+            "userIdWhoUploaded": 5,
+            "content": "aGVsbG8gd29ybGQ=",
+            "metadata": None,
+            "dateUploaded": "2018-04-23T18:25:43.511000Z",
+            "copyrightAndUsageRestrictions": "No redistribution",
+            "checksum": "",
+            "mimeType": "text/plain",
+            "typeDescription": "UTF8Text"
+        }
+
+        result = BinaryAsset.from_json(input_json, lazy=True)
+        self.assertIsNone(result._content)
+        self.assertEqual(result.mime_type, "text/plain")
+        eager_json = BinaryAsset.from_json(input_json).to_json()
+        self.assertEqual(list(result.to_json().items()), list(eager_json.items()))
+
+        self.assertEqual(result.content, "hello world".encode("utf8"))
+        self.assertIs(result.content, result._content)
+        self.assertDictEqual(input_json, result.to_json())
+
+        result.content = "goodbye".encode("utf8")
+        self.assertEqual(result.to_json()["content"], "Z29vZGJ5ZQ==")
+
+    def test_streaming(self):
+        payload = bytes(range(256)) * 1000
+        asset = BinaryAsset(payload, "audio/wav", BinaryAssetKind.AUDIO, "No redistribution", "",
+                            uploader_id=5, date_uploaded=datetime.datetime(2018, 4, 23, 18, 25, 43, 511000), id=7)
+        reference = json.dumps(asset.to_json())
+
+        out = io.StringIO()
+        asset.write_json(out, chunk_size=1000)
+        self.assertEqual(out.getvalue(), reference)
+
+        out = io.StringIO()
+        asset.write_json(out, content=io.BytesIO(payload), chunk_size=1000)
+        self.assertEqual(out.getvalue(), reference)
+
+        dst = io.BytesIO()
+        description = BinaryAsset.read_json(io.StringIO(reference), dst, chunk_size=777)
+        self.assertEqual(dst.getvalue(), payload)
+        self.assertEqual(description.id, 7)
+        self.assertEqual(description.type_description, BinaryAssetKind.AUDIO)
+        self.assertEqual(description.date_uploaded, asset.date_uploaded)
+
+    def test_streaming_escaped(self):
+        dst = io.BytesIO()
+        src = io.StringIO('{"content": "Pz8\\/", "mimeType": "text/plain", "typeDescription": "UTF8Text", '
+                          '"copyrightAndUsageRestrictions": null, "checksum": "", "id": 12345}')
+        description = BinaryAsset.read_json(src, dst, chunk_size=3)
+        self.assertEqual(dst.getvalue(), b"???")
+        self.assertEqual(description.id, 12345)
@@ -0,0 +1,69 @@
+from unittest import TestCase
+from pyannotatron.client import AnnotatronClient
+from pyannotatron.server import StandInServer
+from pyannotatron.cache import CachingClient, LRUCache, CacheEntry
+from pyannotatron.models import Corpus, MultipleChoiceQuestion, QuestionKind
+import datetime
+import tempfile
+
+
+class TestLRUCache(TestCase):
+
+    def test_eviction(self):
+        cache = LRUCache(max_size=100)
+        for i in range(10):
+            cache.put(i, CacheEntry(i, {"value": "x" * 20}, None, None, 0))
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.evictions, 7)
+        self.assertIsNone(cache.get(0))
+        cache.get(7)
+        cache.put(10, CacheEntry(10, {"value": "x" * 20}, None, None, 0))
+        self.assertIsNotNone(cache.get(7))
+        self.assertIsNone(cache.get(8))
+
+
+class TestCachingClient(TestCase):
+
+    def setUp(self):
+        self.server = StandInServer().start()
+        self.client = AnnotatronClient(self.server.url)
+        self.client.login("admin", "admin")
+        question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SENTIMENT", "Is this positive?",
+                                          QuestionKind.MULTIPLE_CHOICE, ["positive", "negative"])
+        self.question_id = self.client.create_question(question).id
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_hits(self):
+        cache = CachingClient(self.client)
+        first = cache.get_question(self.question_id)
+        self.assertIs(cache.get_question(self.question_id), first)
+        self.assertEqual(first.summary_code, "SENTIMENT")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_revalidation(self):
+        cache = CachingClient(self.client, ttls={"question": 0})
+        first = cache.get_question(self.question_id)
+        self.assertIs(cache.get_question(self.question_id), first)
+        self.assertEqual(cache.stats()["notModified"], 1)
+
+        self.server.questions[self.question_id]["humanPrompt"] = "Is this negative?"
+        self.assertEqual(cache.get_question(self.question_id).human_prompt, "Is this negative?")
+        self.assertEqual(cache.stats()["refreshed"], 1)
+
+    def test_disk(self):
+        corpus_id = self.client.create_corpus(Corpus("VCTK")).id
+        with tempfile.TemporaryDirectory() as tmp:
+            CachingClient(self.client, directory=tmp).get_corpus(corpus_id)
+            requests = self.server.requests
+            cache = CachingClient(self.client, directory=tmp)
+            self.assertEqual(cache.get_corpus(corpus_id).name, "VCTK")
+            self.assertEqual(self.server.requests, requests)
+            self.assertEqual(cache.stats()["diskHits"], 1)
+
+            cache.invalidate("corpus", corpus_id)
+            self.assertEqual(CachingClient(self.client, directory=tmp).get_corpus(corpus_id).name, "VCTK")
+            self.assertEqual(self.server.requests, requests + 1)
@@ -0,0 +1,50 @@
+from unittest import TestCase
+from pyannotatron.models import BinaryAsset, BinaryAssetDescription, BinaryAssetKind
+from pyannotatron.checksum import HashingWriter, checksum_content, verify_asset, verify_assets
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+
+class TestChecksum(TestCase):
+
+    def make_asset(self, content, checksum=None):
+        if checksum is None:
+            checksum = hashlib.sha512(content).hexdigest()
+        return BinaryAsset(content, "text/plain", BinaryAssetKind.UTF8_TEXT, "No redistribution", checksum)
+
+    def test_checksum_content(self):
+        ref = hashlib.sha512(b"hello world").hexdigest()
+        self.assertEqual(checksum_content(b"hello world"), ref)
+        self.assertEqual(checksum_content(io.BytesIO(b"hello world"), chunk_size=3), ref)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "asset.txt")
+            with open(path, "wb") as fp:
+                fp.write(b"hello world")
+            self.assertEqual(checksum_content(path), ref)
+
+    def test_streaming(self):
+        asset = self.make_asset(b"hello world" * 100)
+        writer = HashingWriter(io.BytesIO())
+        description = BinaryAsset.read_json(io.StringIO(json.dumps(asset.to_json())), writer, chunk_size=10)
+        self.assertEqual(writer.hexdigest(), description.checksum)
+        self.assertEqual(writer.dst.getvalue(), asset.content)
+
+    def test_verify(self):
+        self.assertIsNone(verify_asset(self.make_asset(b"hello world")))
+        error = verify_asset(self.make_asset(b"hello world", checksum="0" * 128))
+        self.assertEqual([e.name for e in error], ["checksum"])
+
+        description = BinaryAssetDescription("text/plain", BinaryAssetKind.UTF8_TEXT, None,
+                                             hashlib.sha512(b"abc").hexdigest())
+        self.assertIsNone(verify_asset(description, content=b"abc"))
+
+    def test_verify_batch(self):
+        assets = [self.make_asset(("asset %d" % i).encode("utf8")) for i in range(20)]
+        assets[3].checksum = "0" * 128
+        results = verify_assets(assets, max_workers=4)
+        self.assertEqual(len(results), 20)
+        self.assertEqual([i for i, r in enumerate(results) if r is not None], [3])
+        self.assertEqual(results[3].to_json()[0]["name"], "checksum")
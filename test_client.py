@@ -0,0 +1,205 @@
+from unittest import TestCase
+from pyannotatron.client import AnnotatronClient, AnnotatronAPIError, PrefetchingPageIterator, IncompleteUploadError
+from pyannotatron.server import StandInServer
+from pyannotatron.models import Corpus, BinaryAsset, BinaryAssetKind, AssetCorpusLink, MultipleChoiceQuestion
+from pyannotatron.models import QuestionKind, Assignment, NewUserRequest, UserKind, MultipleChoiceAnnotation
+from pyannotatron.models import AnnotationSource
+import datetime
+import gc
+import hashlib
+import io
+import time
+
+
+class TestClient(TestCase):
+
+    def setUp(self):
+        self.server = StandInServer().start()
+        self.client = AnnotatronClient(self.server.url)
+        self.client.login("admin", "admin")
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_login(self):
+        with AnnotatronClient(self.server.url) as client:
+            with self.assertRaises(AnnotatronAPIError) as cm:
+                client.current_user()
+            self.assertEqual(cm.exception.status, 401)
+            self.assertFalse(client.login("admin", "admin").password_reset_needed)
+            self.assertEqual(client.current_user().username, "admin")
+
+    def test_assets(self):
+        corpus_id = self.client.create_corpus(Corpus("VCTK", description="Speech")).id
+        self.assertEqual(self.client.get_corpus(corpus_id).name, "VCTK")
+
+        content = "hello world".encode("utf8")
+        asset = BinaryAsset(content, "text/plain", BinaryAssetKind.UTF8_TEXT, "No redistribution",
+                            hashlib.sha512(content).hexdigest())
+        asset_id = self.client.upload_asset(asset).id
+        description = self.client.get_asset(asset_id)
+        self.assertEqual(description.checksum, asset.checksum)
+        self.assertEqual(description.type_description, BinaryAssetKind.UTF8_TEXT)
+        self.assertEqual(self.client.get_asset_content(asset_id).content, content)
+
+        link = self.client.link_asset(AssetCorpusLink("001.txt", asset_id, corpus_id))
+        self.assertIsNotNone(link.id)
+        with self.assertRaises(AnnotatronAPIError) as cm:
+            self.client.link_asset(AssetCorpusLink("002.txt", 9999, corpus_id))
+        self.assertEqual(cm.exception.status, 404)
+
+    def test_assignments(self):
+        question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SENTIMENT", "Is this positive?",
+                                          QuestionKind.MULTIPLE_CHOICE, ["positive", "negative"])
+        question_id = self.client.create_question(question).id
+        self.assertEqual(self.client.get_question(question_id).choices, ["positive", "negative"])
+
+        response = MultipleChoiceAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.HUMAN, "SENTIMENT",
+                                            ["positive"])
+        assignment_id = self.client.create_assignment(Assignment([1, 2], 12, question, response=response)).id
+        assignment = self.client.get_assignment(assignment_id)
+        self.assertEqual(assignment.assigned_annotator_id, 12)
+        self.assertEqual(assignment.question.summary_code, "SENTIMENT")
+        self.assertEqual(assignment.response.choices, ["positive"])
+
+    def test_users(self):
+        user_id = self.client.create_user(NewUserRequest("roger", "roger@company.com", UserKind.ANNOTATOR, "pw")).id
+        self.assertEqual(self.client.get_user(user_id).role, UserKind.ANNOTATOR)
+
+    def test_validation_error(self):
+        with self.assertRaises(AnnotatronAPIError) as cm:
+            self.client.request("POST", "/v1/corpus/", {"noName": True})
+        self.assertEqual(cm.exception.status, 400)
+        self.assertEqual(cm.exception.validation.errors[0].name, "body")
+
+    def test_connection_reuse(self):
+        connections = self.server.connections
+        for _ in range(20):
+            self.client.current_user()
+        self.assertEqual(self.server.connections, connections)
+
+    def test_iter_assignments(self):
+        question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SENTIMENT", "Is this positive?",
+                                          QuestionKind.MULTIPLE_CHOICE, ["positive", "negative"])
+        response = MultipleChoiceAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.HUMAN, "SENTIMENT",
+                                            ["positive"])
+        for i in range(25):
+            self.client.create_assignment(Assignment([i], i, question, response=response))
+        with self.client.iter_assignments(page_size=4, prefetch=2) as assignments:
+            self.assertEqual([a.assigned_annotator_id for a in assignments], list(range(25)))
+
+
+class TestPrefetchingPageIterator(TestCase):
+
+    def test_backpressure(self):
+        fetched = []
+
+        def fetch_page(page):
+            fetched.append(page)
+            return list(range(page * 10, page * 10 + 10)), page + 1 if page < 99 else None
+
+        pages = PrefetchingPageIterator(fetch_page, prefetch=2)
+        self.assertEqual(next(pages), 0)
+        time.sleep(0.2)
+        # One page being consumed, two queued and one blocked waiting for space.
+        self.assertLessEqual(len(fetched), 4)
+        self.assertEqual(list(pages)[-1], 999)
+        pages.close()
+
+    def test_error(self):
+        def fetch_page(page):
+            if page == 1:
+                raise AnnotatronAPIError(500, "broken")
+            return [page], page + 1
+
+        with PrefetchingPageIterator(fetch_page) as pages:
+            self.assertEqual(next(pages), 0)
+            with self.assertRaises(AnnotatronAPIError):
+                next(pages)
+
+    def test_close(self):
+        pages = PrefetchingPageIterator(lambda page: ([page], page + 1), prefetch=1)
+        next(pages)
+        pages.close()
+        self.assertFalse(pages.thread.is_alive())
+        self.assertEqual(list(pages), [])
+
+    def test_abandoned(self):
+        pages = PrefetchingPageIterator(lambda page: ([page], page + 1), prefetch=1)
+        thread = pages.thread
+        for page in pages:
+            if page == 3:
+                break
+        del pages
+        gc.collect()
+        thread.join(timeout=2)
+        self.assertFalse(thread.is_alive())
+
+    def test_exhausted(self):
+        pages = PrefetchingPageIterator(lambda page: ([page], page + 1 if page < 2 else None))
+        self.assertEqual(list(pages), [0, 1, 2])
+        self.assertFalse(pages.thread.is_alive())
+
+
+class TestRawTransfer(TestCase):
+
+    def setUp(self):
+        self.server = StandInServer().start()
+        self.client = AnnotatronClient(self.server.url)
+        self.client.login("admin", "admin")
+        self.payload = bytes(range(256)) * 5000
+        self.asset = BinaryAsset(self.payload, "audio/wav", BinaryAssetKind.AUDIO, "No redistribution",
+                                 hashlib.sha512(self.payload).hexdigest())
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_raw_round_trip(self):
+        asset_id = self.client.upload_asset(self.asset, raw=True).id
+        self.assertTrue(self.client.raw_transfer)
+        self.assertEqual(self.server.contents[asset_id], self.payload)
+        self.assertEqual(self.client.get_asset(asset_id).checksum, self.asset.checksum)
+
+        dst = io.BytesIO()
+        self.assertEqual(self.client.download_asset_content(asset_id, dst, chunk_size=4096), len(self.payload))
+        self.assertEqual(dst.getvalue(), self.payload)
+
+        dst = io.BytesIO()
+        self.client.download_asset_content(asset_id, dst, chunk_size=4096, raw=False)
+        self.assertEqual(dst.getvalue(), self.payload)
+
+    def test_raw_sources(self):
+        description = self.asset.describe()
+        for content in (memoryview(self.payload), io.BytesIO(self.payload), bytearray(self.payload)):
+            asset_id = self.client.upload_asset(description, content=content, raw=True).id
+            self.assertEqual(self.server.contents[asset_id], self.payload)
+
+    def test_fallback(self):
+        self.server.raw_transfer = False
+        asset_id = self.client.upload_asset(self.asset.describe(), content=self.payload, raw=True).id
+        self.assertIs(self.client.raw_transfer, False)
+        self.assertEqual(self.server.contents[asset_id], self.payload)
+
+    def test_download_fallback(self):
+        asset_id = self.client.upload_asset(self.asset).id
+        self.server.raw_transfer = False
+        dst = io.BytesIO()
+        self.client.download_asset_content(asset_id, dst)
+        self.assertEqual(dst.getvalue(), self.payload)
+        self.assertIs(self.client.raw_transfer, False)
+
+    def test_bad_request_not_fallback(self):
+        self.server.post_asset = lambda *args: (400, {"error": "bad metadata"})
+        with self.assertRaises(AnnotatronAPIError) as cm:
+            self.client.upload_asset(self.asset.describe(), content=self.payload, raw=True)
+        self.assertEqual(cm.exception.status, 400)
+        self.assertIsNone(self.client.raw_transfer)
+
+    def test_incomplete_upload(self):
+        self.server.put_asset_raw = lambda *args: (500, {"error": "disk full"})
+        with self.assertRaises(IncompleteUploadError) as cm:
+            self.client.upload_asset(self.asset.describe(), content=self.payload, raw=True)
+        self.assertEqual(cm.exception.cause.status, 500)
+        self.assertIn(cm.exception.asset_id, self.server.assets)
@@ -0,0 +1,113 @@
+from unittest import TestCase
+from pyannotatron.client import AnnotatronClient
+from pyannotatron.compression import compress, decompress, choose_encoding, PREFERENCE
+from pyannotatron.server import StandInServer
+from pyannotatron.models import Assignment, MultipleChoiceQuestion, QuestionKind, TimeSeriesRangeAnnotation
+from pyannotatron.models import TimeSeriesRangeTuple, AnnotationSource, BinaryAsset, BinaryAssetKind
+from unittest import skipUnless
+import datetime
+import hashlib
+import io
+import json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class TestCodecs(TestCase):
+
+    def test_round_trip(self):
+        data = json.dumps([{"label": "speech", "start": i, "end": i + 1} for i in range(1000)]).encode("utf8")
+        for encoding in PREFERENCE:
+            compressed = compress(data, encoding)
+            self.assertLess(len(compressed), len(data) // 5)
+            self.assertEqual(decompress(compressed, encoding), data)
+        self.assertEqual(decompress(data, "identity"), data)
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(choose_encoding("br;q=1.0, gzip;q=0.5"), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0, br"))
+        self.assertIsNone(choose_encoding("identity"))
+        self.assertIsNone(choose_encoding(None))
+        self.assertEqual(choose_encoding("*"), PREFERENCE[0])
+
+
+class TestClientCompression(TestCase):
+
+    def make_assignment(self, ranges: int) -> Assignment:
+        question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SPEAKERS", "Who is speaking?",
+                                          QuestionKind.MULTIPLE_CHOICE, ["alice", "bob"])
+        response = TimeSeriesRangeAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.HUMAN, "SPEAKERS",
+                                             [TimeSeriesRangeTuple(["alice", "bob"][i % 2], i * 1.5, i * 1.5 + 1)
+                                              for i in range(ranges)])
+        return Assignment([1], 12, question, response=response)
+
+    def upload(self, server, client, assignment):
+        received = server.bytes_received
+        assignment_id = client.create_assignment(assignment).id
+        sent = server.bytes_sent
+        self.assertEqual(len(client.get_assignment(assignment_id).response.ranges), len(assignment.response.ranges))
+        return server.bytes_received - received, server.bytes_sent - sent
+
+    def test_compressed(self):
+        assignment = self.make_assignment(2000)
+        size = len(json.dumps(assignment.to_json()))
+        with StandInServer() as server, AnnotatronClient(server.url) as client:
+            client.login("admin", "admin")
+            received, sent = self.upload(server, client, assignment)
+            self.assertEqual(client.request_encoding, PREFERENCE[0])
+        self.assertLess(received, size // 5)
+        self.assertLess(sent, size // 5)
+
+    def test_threshold(self):
+        assignment = self.make_assignment(1)
+        size = len(json.dumps(assignment.to_json()))
+        with StandInServer(compression_threshold=10 * size) as server, \
+                AnnotatronClient(server.url, compression_threshold=10 * size) as client:
+            client.login("admin", "admin")
+            received, sent = self.upload(server, client, assignment)
+        self.assertEqual(received, size)
+        self.assertGreaterEqual(sent, size)
+
+    def test_fallback(self):
+        assignment = self.make_assignment(2000)
+        size = len(json.dumps(assignment.to_json()))
+        with StandInServer(compression=False) as server, AnnotatronClient(server.url) as client:
+            client.login("admin", "admin")
+            self.upload(server, client, assignment)
+            self.assertFalse(client.request_encoding)
+            received, sent = self.upload(server, client, assignment)
+        self.assertEqual(received, size)
+        self.assertGreaterEqual(sent, size)
+
+    def test_disabled(self):
+        assignment = self.make_assignment(2000)
+        size = len(json.dumps(assignment.to_json()))
+        with StandInServer() as server, AnnotatronClient(server.url, compression=False) as client:
+            client.login("admin", "admin")
+            received, sent = self.upload(server, client, assignment)
+        self.assertEqual(received, size)
+        self.assertGreaterEqual(sent, size)
+
+    @skipUnless(zstandard, "zstandard isn't installed")
+    def test_zstd(self):
+        assignment = self.make_assignment(2000)
+        size = len(json.dumps(assignment.to_json()))
+        with StandInServer() as server, AnnotatronClient(server.url) as client:
+            self.assertTrue(client.session.headers["Accept-Encoding"].startswith("zstd"))
+            client.login("admin", "admin")
+            received, sent = self.upload(server, client, assignment)
+            self.assertEqual(client.request_encoding, "zstd")
+
+            payload = b"\x00\x01" * 50000
+            asset = BinaryAsset(payload, "audio/wav", BinaryAssetKind.AUDIO, "No redistribution",
+                                hashlib.sha512(payload).hexdigest())
+            asset_id = client.upload_asset(asset).id
+            dst = io.BytesIO()
+            client.download_asset_content(asset_id, dst, raw=False)
+            self.assertEqual(dst.getvalue(), payload)
+        self.assertLess(received, size // 5)
+        self.assertLess(sent, size // 5)
@@ -0,0 +1,140 @@
+from unittest import TestCase
+from pyannotatron.client import AnnotatronClient
+from pyannotatron.server import StandInServer
+from pyannotatron.ingest import ChecksumIndex, ingest_files
+from pyannotatron.models import Corpus, BinaryAssetKind
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import tempfile
+import time
+
+
+class TestIngest(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = StandInServer().start()
+        self.client = AnnotatronClient(self.server.url)
+        self.client.login("admin", "admin")
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as fp:
+            fp.write(content)
+        return path
+
+    def test_index(self):
+        path = os.path.join(self.tmp.name, "index.db")
+        with ChecksumIndex(path) as index:
+            self.assertIsNone(index.get("ABC"))
+            self.assertEqual(index.put("ABC", 5), 5)
+            self.assertEqual(index.put("abc", 6), 5)
+        with ChecksumIndex(path) as index:
+            self.assertEqual(index.get("abc"), 5)
+            self.assertEqual(len(index), 1)
+
+    def test_ingest(self):
+        paths = [self.write("a.txt", b"hello"), self.write("b.wav", b"RIFF...."), self.write("c.txt", b"hello")]
+        corpus_id = self.client.create_corpus(Corpus("ingest")).id
+        with ChecksumIndex(os.path.join(self.tmp.name, "index.db")) as index:
+            first = ingest_files(self.client, index, corpus_id, paths, root=self.tmp.name)
+            self.assertEqual([r.uploaded for r in first], [True, True, False])
+            self.assertEqual(first[0].asset_id, first[2].asset_id)
+            self.assertEqual(first[0].checksum, hashlib.sha512(b"hello").hexdigest())
+            self.assertEqual(len(self.server.assets), 2)
+
+            second = ingest_files(self.client, index, corpus_id, paths[:2])
+            self.assertEqual([r.uploaded for r in second], [False, False])
+            self.assertEqual(len(self.server.assets), 2)
+            self.assertEqual(len(self.server.links), 5)
+
+        description = self.client.get_asset(first[1].asset_id)
+        self.assertEqual(description.type_description, BinaryAssetKind.AUDIO)
+        self.assertEqual(self.client.get_asset_content(first[0].asset_id).content, b"hello")
+
+    def test_claim(self):
+        path = os.path.join(self.tmp.name, "index.db")
+        with ChecksumIndex(path) as first, ChecksumIndex(path, poll_interval=0.01) as second:
+            self.assertIsNone(first.claim("abc"))
+            waiting = ThreadPoolExecutor(1).submit(second.claim, "ABC")
+            time.sleep(0.1)
+            self.assertFalse(waiting.done())
+            first.put("abc", 7)
+            self.assertEqual(waiting.result(5), 7)
+
+            self.assertIsNone(first.claim("def"))
+            first.release("def")
+            self.assertIsNone(second.claim("def"))
+
+    def test_claim_kept_alive(self):
+        path = os.path.join(self.tmp.name, "index.db")
+        with ChecksumIndex(path, stale_after=0.2) as index:
+            self.assertIsNone(index.claim("abc"))
+            with index.holding("abc"):
+                index.connection.execute("UPDATE claims SET claimed = 0")
+                deadline = time.monotonic() + 5
+                while index.connection.execute("SELECT claimed FROM claims").fetchone()[0] == 0:
+                    self.assertLess(time.monotonic(), deadline)
+                    time.sleep(0.01)
+            index.release("abc")
+            self.assertFalse(index.refresh("abc"))
+
+    def test_orphaned_upload(self):
+        path = self.write("a.txt", b"hello")
+        corpus_id = self.client.create_corpus(Corpus("ingest")).id
+        upload_asset = self.client.upload_asset
+
+        with ChecksumIndex(os.path.join(self.tmp.name, "index.db")) as index:
+            def racing_upload(asset, **kwargs):
+                # Another process records its own upload of the same content first.
+                index.put(asset.checksum, upload_asset(asset, **kwargs).id)
+                return upload_asset(asset, **kwargs)
+
+            self.client.upload_asset = racing_upload
+            result, = ingest_files(self.client, index, corpus_id, [path])
+            self.assertEqual(index.get(result.checksum), result.asset_id)
+        self.assertTrue(result.uploaded)
+        self.assertIsNotNone(result.orphaned_asset_id)
+        self.assertNotEqual(result.orphaned_asset_id, result.asset_id)
+        self.assertEqual(self.server.links[result.link_id]["assetId"], result.asset_id)
+
+    def test_concurrent_ingest(self):
+        paths = [self.write("%d.txt" % i, b"content %d" % (i % 5)) for i in range(20)]
+        corpus_id = self.client.create_corpus(Corpus("ingest")).id
+        index_path = os.path.join(self.tmp.name, "index.db")
+
+        def ingest(paths):
+            with AnnotatronClient(self.server.url) as client, ChecksumIndex(index_path, poll_interval=0.01) as index:
+                client.login("admin", "admin")
+                return ingest_files(client, index, corpus_id, paths)
+
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(ingest, [paths, paths[::-1], paths[5:], paths[:15]]))
+        self.assertEqual(len(self.server.assets), 5)
+        self.assertEqual(sum(r.uploaded for batch in results for r in batch), 5)
+        self.assertEqual({r.checksum: r.asset_id for r in results[0]},
+                         {r.checksum: r.asset_id for r in results[1]})
+
+    def test_stale_index(self):
+        path = self.write("a.txt", b"hello")
+        corpus_id = self.client.create_corpus(Corpus("ingest")).id
+        with ChecksumIndex(os.path.join(self.tmp.name, "index.db")) as index:
+            index.put(hashlib.sha512(b"hello").hexdigest(), 999)
+            result, = ingest_files(self.client, index, corpus_id, [path])
+            self.assertTrue(result.uploaded)
+            self.assertNotEqual(result.asset_id, 999)
+            self.assertEqual(index.get(result.checksum), result.asset_id)
+
+    def test_ingest_raw(self):
+        paths = [self.write("a.txt", b"hello"), self.write("b.txt", b"world")]
+        corpus_id = self.client.create_corpus(Corpus("ingest")).id
+        with ChecksumIndex(os.path.join(self.tmp.name, "index.db")) as index:
+            results = ingest_files(self.client, index, corpus_id, paths, raw=True)
+        self.assertTrue(self.client.raw_transfer)
+        self.assertEqual(self.server.contents[results[1].asset_id], b"world")
@@ -0,0 +1,59 @@
+from unittest import TestCase
+from pyannotatron.models import TimeSeriesRangeAnnotation, TimeSeriesRangeQuestion, QuestionKind
+from pyannotatron.intervals import RangeIntervalIndex
+import datetime
+
+
+class TestRangeIntervalIndex(TestCase):
+
+    INPUT_JSON = {
+        "created": "2018-04-23T18:25:43.511000Z",
+        "kind": "TimeSeriesRangeAnnotation",
+        "source": "SystemGenerated",
+        "summaryCode": "AMBIENT",
+        "ranges": [
+            {"label": "talking", "start": 5.0, "end": 9.0},
+            {"label": "noisy", "start": 0.0, "end": 10.0},
+            {"label": "silence", "start": 10.0, "end": 12.0},
+            {"label": "talking", "start": 1.0, "end": 2.0}
+        ]
+    }
+
+    def brute_force(self, ranges, a, b):
+        return [i for i, r in enumerate(ranges) if r["start"] < b and r["end"] > a]
+
+    def test_stab(self):
+        index = RangeIntervalIndex.from_json_list(self.INPUT_JSON["ranges"])
+        self.assertEqual(index.stab(1.5), [1, 3])
+        self.assertEqual(index.stab(10.0), [2])
+        self.assertEqual(index.stab(12.0), [])
+
+    def test_window(self):
+        ranges = self.INPUT_JSON["ranges"]
+        index = RangeIntervalIndex.from_json_list(ranges)
+        for a, b in [(0, 1), (2, 5), (4.5, 10.5), (9, 10), (12, 20), (-5, 0)]:
+            self.assertEqual(index.window(a, b), self.brute_force(ranges, a, b))
+
+    def test_columnar(self):
+        for columnar in (False, True):
+            annotation = TimeSeriesRangeAnnotation.from_json(self.INPUT_JSON, columnar=columnar)
+            index = RangeIntervalIndex.from_annotation(annotation)
+            self.assertEqual(index.stab(6.0), [0, 1])
+
+    def test_overlaps(self):
+        index = RangeIntervalIndex.from_json_list(self.INPUT_JSON["ranges"])
+        self.assertTrue(index.has_overlaps())
+        self.assertEqual(index.overlapping_pairs(), [(0, 1), (1, 3)])
+
+        question = TimeSeriesRangeQuestion(datetime.datetime.now(), "AMBIENT", "Label the noise",
+                                           QuestionKind.TIME_SERIES_RANGE, can_overlap=False)
+        errors = index.validate(question)
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(errors[0].name, "ranges")
+        question.can_overlap = True
+        self.assertEqual(index.validate(question), [])
+
+    def test_no_overlaps(self):
+        index = RangeIntervalIndex([0.0, 1.0, 2.0], [1.0, 2.0, 3.0])
+        self.assertFalse(index.has_overlaps())
+        self.assertEqual(index.overlapping_pairs(), [])
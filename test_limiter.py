@@ -0,0 +1,99 @@
+from unittest import TestCase
+from pyannotatron.client import AnnotatronClient
+from pyannotatron.limiter import AdaptiveLimiter
+from pyannotatron.server import StandInServer
+import threading
+import time
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAdaptiveLimiter(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = AdaptiveLimiter(initial_limit=4, max_limit=16, clock=self.clock)
+
+    def run_window(self, latency, status=200):
+        starts = [self.limiter.acquire() for _ in range(self.limiter.current_limit)]
+        self.clock.now += latency
+        for start in starts:
+            self.limiter.release(start, status)
+
+    def test_grows_while_latency_holds(self):
+        for _ in range(10):
+            self.run_window(0.01)
+        self.assertGreaterEqual(self.limiter.current_limit, 8)
+        for _ in range(100):
+            self.run_window(0.01)
+        self.assertEqual(self.limiter.current_limit, 16)
+
+    def test_backs_off(self):
+        for _ in range(10):
+            self.run_window(0.01)
+        limit = self.limiter.current_limit
+        self.run_window(0.01, 503)
+        # One decrease per round trip, however many requests failed in it.
+        self.assertEqual(self.limiter.current_limit, int(limit * 0.7))
+        self.assertEqual(self.limiter.stats()["decreases"], 1)
+
+        limit = self.limiter.current_limit
+        for _ in range(5):
+            self.run_window(0.5)
+        self.assertLess(self.limiter.current_limit, limit)
+
+        for _ in range(50):
+            self.run_window(1.0, None)
+        self.assertEqual(self.limiter.current_limit, 1)
+
+    def test_retry_after(self):
+        start = self.limiter.acquire()
+        self.limiter.release(start, 429, retry_after=5)
+        with self.assertRaises(TimeoutError):
+            self.limiter.acquire(timeout=0)
+        self.clock.now += 5
+        self.limiter.acquire(timeout=0)
+
+    def test_queue_depth(self):
+        limiter = AdaptiveLimiter(initial_limit=1)
+        start = limiter.acquire()
+        acquired = threading.Event()
+
+        def wait():
+            limiter.release(limiter.acquire(), 200)
+            acquired.set()
+
+        thread = threading.Thread(target=wait, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while limiter.stats()["queued"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.assertEqual(limiter.stats()["queued"], 1)
+        self.assertEqual(limiter.stats()["inflight"], 1)
+        self.assertFalse(acquired.is_set())
+        limiter.release(start, 200)
+        thread.join()
+        self.assertEqual(limiter.stats()["queued"], 0)
+        self.assertEqual(limiter.stats()["inflight"], 0)
+
+    def test_client(self):
+        limiter = AdaptiveLimiter(initial_limit=2)
+        with StandInServer() as server, AnnotatronClient(server.url, limiter=limiter) as client:
+            client.login("admin", "admin")
+            threads = [threading.Thread(target=lambda: [client.current_user() for _ in range(10)])
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        stats = limiter.stats()
+        self.assertEqual(stats["requests"], 41)
+        self.assertEqual(stats["inflight"], 0)
+        self.assertEqual(stats["drops"], 0)
@@ -0,0 +1,110 @@
+from unittest import TestCase
+from pyannotatron.overlap import sweep, match, compare_ranges, aggregate_ranges, CorpusRangeAgreement
+from pyannotatron.overlap import aggregate_corpus_ranges
+from pyannotatron.models import TimeSeriesRangeAnnotation, TimeSeriesRangeTuple, TimeSeriesRangeColumns
+from pyannotatron.models import AnnotationSource
+import datetime
+import random
+
+
+def annotation(ranges, columnar=False):
+    ranges = [TimeSeriesRangeTuple(label, start, end) for label, start, end in ranges]
+    if columnar:
+        ranges = TimeSeriesRangeColumns.from_ranges(ranges)
+    return TimeSeriesRangeAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.HUMAN, "SPEAKERS", ranges)
+
+
+def brute_force_intersection(a, b):
+    # Assumes each annotator's ranges don't overlap each other.
+    return sum(max(0.0, min(e1, e2) - max(s1, s2)) for s1, e1 in a for s2, e2 in b)
+
+
+class TestSweep(TestCase):
+
+    def test_sweep(self):
+        length, intersection, coverage = sweep([[(0, 10)], [(5, 15)], [(8, 9), (9, 12)]])
+        self.assertEqual(length, [10, 10, 4])
+        self.assertEqual(dict(intersection), {(0, 1): 5, (0, 2): 2, (1, 2): 4})
+        self.assertEqual(coverage, [(0, 5, 1), (5, 8, 2), (8, 9, 3), (9, 10, 3), (10, 12, 2), (12, 15, 1)])
+
+    def test_own_overlaps_count_once(self):
+        length, intersection, _ = sweep([[(0, 10), (5, 15)], [(0, 20)]])
+        self.assertEqual(length, [15, 20])
+        self.assertEqual(intersection[0, 1], 15)
+
+    def test_against_brute_force(self):
+        rng = random.Random(3)
+        annotators = []
+        for _ in range(4):
+            ranges, t = [], 0.0
+            for _ in range(50):
+                t += rng.uniform(0, 2)
+                end = t + rng.uniform(0.1, 3)
+                ranges.append((t, end))
+                t = end
+            annotators.append(ranges)
+        length, intersection, _ = sweep(annotators)
+        for a in range(4):
+            self.assertAlmostEqual(length[a], sum(e - s for s, e in annotators[a]))
+            for b in range(a + 1, 4):
+                self.assertAlmostEqual(intersection[a, b], brute_force_intersection(annotators[a], annotators[b]))
+
+    def test_match(self):
+        matches = match([[(0, 10), (20, 30)], [(1, 10), (12, 18), (21, 31)], [(40, 50)]])
+        self.assertEqual([(i, j) for i, j, _ in matches[0, 1]], [(0, 0), (1, 2)])
+        self.assertAlmostEqual(matches[0, 1][0][2], 0.9)
+        self.assertNotIn((0, 2), matches)
+        # (0, 10) overlaps (5, 15) with IoU 1/3, below the threshold.
+        self.assertEqual(match([[(0, 10)], [(5, 15)]]), {})
+        self.assertEqual(len(match([[(0, 10)], [(5, 15)]], threshold=0.3)[0, 1]), 1)
+
+
+class TestCompareRanges(TestCase):
+
+    def setUp(self):
+        self.annotations = {
+            "a": annotation([("alice", 0, 10), ("bob", 10, 20)]),
+            "b": annotation([("alice", 0, 9), ("bob", 9, 20)], columnar=True),
+            "c": annotation([("alice", 0, 12), ("bob", 14, 16), ("carol", 16, 20)]),
+        }
+
+    def test_compare(self):
+        overlaps = compare_ranges(self.annotations)
+        self.assertEqual(sorted(overlaps), ["alice", "bob", "carol"])
+        alice = overlaps["alice"]
+        self.assertAlmostEqual(alice.iou("a", "b"), 0.9)
+        self.assertAlmostEqual(alice.iou("c", "a"), 10 / 12)
+        self.assertEqual(alice.f1("a", "b"), 1.0)
+        self.assertEqual(alice.common_length(), 9)
+        self.assertEqual(alice.union_length(), 12)
+        carol = overlaps["carol"]
+        self.assertEqual(carol.iou("a", "c"), 0.0)
+        self.assertEqual(carol.f1("a", "c"), 0.0)
+        self.assertTrue(carol.iou("a", "b") != carol.iou("a", "b"))
+        self.assertAlmostEqual(carol.mean_iou(), 0.0)
+
+    def test_aggregate(self):
+        created = datetime.datetime(2018, 5, 1)
+        aggregated = aggregate_ranges(self.annotations, created=created)
+        self.assertEqual(aggregated.source, AnnotationSource.AGGREGATED)
+        self.assertEqual(aggregated.summary_code, "SPEAKERS")
+        self.assertEqual([(r.label, r.start, r.end) for r in aggregated.ranges],
+                         [("alice", 0, 10), ("bob", 10, 20)])
+        unanimous = aggregate_ranges(self.annotations, min_annotators=3)
+        self.assertEqual([(r.label, r.start, r.end) for r in unanimous.ranges],
+                         [("alice", 0, 9), ("bob", 14, 16)])
+        self.assertEqual(aggregated.to_json()["source"], "Aggregated")
+
+    def test_corpus(self):
+        observations = [(1, annotator, a) for annotator, a in self.annotations.items()]
+        observations += [(2, "a", annotation([("alice", 0, 10)])), (2, "b", annotation([("alice", 5, 10)]))]
+        agreement = CorpusRangeAgreement(observations)
+        self.assertEqual(sorted(agreement.items), [("SPEAKERS", 1), ("SPEAKERS", 2)])
+        alice = agreement.totals()["SPEAKERS"]["alice"]
+        first = compare_ranges(self.annotations)["alice"].totals()
+        self.assertAlmostEqual(alice["intersection"], first["intersection"] + 5)
+        self.assertAlmostEqual(alice["union"], first["union"] + 10)
+        self.assertEqual(alice["matched"], first["matched"] + 1)
+        self.assertAlmostEqual(alice["iou"], alice["intersection"] / alice["union"])
+        aggregated = dict(aggregate_corpus_ranges(observations))
+        self.assertEqual([(r.label, r.start, r.end) for r in aggregated[2].ranges], [("alice", 5, 10)])
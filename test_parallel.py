@@ -0,0 +1,120 @@
+from unittest import TestCase
+from concurrent.futures import ProcessPoolExecutor
+from pyannotatron.models import Assignment, MultipleChoiceAnnotation, TextAnnotation, TimeSeriesRangeTuple
+from pyannotatron.parallel import decode_records, decode_jsonl, jsonl_byte_ranges
+from collections import Counter
+import json
+import os
+import tempfile
+
+
+def summary_codes(annotations) -> Counter:
+    return Counter(annotation.summary_code for annotation in annotations)
+
+
+class TestParallel(TestCase):
+
+    ANNOTATIONS = [
+        {
+            "created": "2018-04-23T18:25:43.511000Z",
+            "kind": "MultipleChoiceAnnotation",
+            "source": "Human",
+            "summaryCode": "SENTIMENT",
+            "choices": ["positive"]
+        },
+        {
+            "created": "2018-04-23T18:25:43.511000Z",
+            "kind": "TextAnnotation",
+            "source": "Human",
+            "summaryCode": "EVALUATION",
+            "content": "naïve \"quoted\"\\nvalue"
+        },
+        {
+            "created": "2018-04-23T18:25:43.511000Z",
+            "kind": "TimeSeriesRangeAnnotation",
+            "source": "Human",
+            "summaryCode": "SPEAKERS",
+            "ranges": [{"label": "alice", "start": 0.5, "end": 1.25}, {"label": "bob", "start": 1.0, "end": 2.0}]
+        }
+    ]
+
+    def setUp(self):
+        self.records = [dict(self.ANNOTATIONS[i % 3], summaryCode="CODE%d" % i) for i in range(101)]
+        fd, self.path = tempfile.mkstemp(suffix=".jsonl")
+        with os.fdopen(fd, "w", encoding="utf8") as fp:
+            for i, record in enumerate(self.records):
+                fp.write(json.dumps(record, ensure_ascii=False) + ("\r\n" if i % 3 else "\n\n"))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_records(self):
+        result = list(decode_records(self.records, "annotation", workers=2, chunk_size=7))
+        self.assertEqual([r.to_json() for r in result], self.records)
+        self.assertEqual(type(result[0]), MultipleChoiceAnnotation)
+        self.assertEqual(type(result[1]), TextAnnotation)
+        self.assertEqual(type(result[2].ranges[1]), TimeSeriesRangeTuple)
+
+    def test_json_strings(self):
+        lines = (json.dumps(r) for r in self.records)
+        result = list(decode_records(lines, "annotation", workers=2, chunk_size=10, ordered=False))
+        self.assertEqual(sorted(r.summary_code for r in result), sorted(r["summaryCode"] for r in self.records))
+
+    def test_byte_ranges(self):
+        size = os.path.getsize(self.path)
+        for shard_bytes in (1, 50, 1000, size, 10 * size):
+            ranges = jsonl_byte_ranges(self.path, shard_bytes)
+            self.assertEqual(len(ranges) > 1, shard_bytes < size - 2)
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], size)
+            self.assertEqual([end for _, end in ranges[:-1]], [start for start, _ in ranges[1:]])
+            with open(self.path, "rb") as fp:
+                data = fp.read()
+            for _, end in ranges[:-1]:
+                self.assertEqual(data[end - 1:end], b"\n")
+
+    def test_jsonl(self):
+        with ProcessPoolExecutor(2) as executor:
+            for shard_bytes in (1, 500, 1024 * 1024):
+                result = list(decode_jsonl(self.path, "annotation", workers=2, shard_bytes=shard_bytes,
+                                           executor=executor))
+                self.assertEqual([r.to_json() for r in result], self.records)
+            result = list(decode_jsonl(self.path, "annotation", workers=2, shard_bytes=500, ordered=False,
+                                       executor=executor))
+            self.assertEqual(sorted(r.summary_code for r in result), sorted(r["summaryCode"] for r in self.records))
+
+    def test_reduce(self):
+        expected = Counter(r["summaryCode"] for r in self.records)
+        shards = list(decode_jsonl(self.path, "annotation", workers=2, shard_bytes=2000, reduce=summary_codes))
+        self.assertGreater(len(shards), 1)
+        self.assertEqual(sum(shards, Counter()), expected)
+        chunks = list(decode_records(self.records, "annotation", workers=2, chunk_size=30, ordered=False,
+                                     reduce=summary_codes))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(sum(chunks, Counter()), expected)
+
+    def test_assignments(self):
+        assignment = {
+            "assets": [1, 22],
+            "assignedAnnotatorId": 12,
+            "question": {
+                "created": "2018-04-23T18:25:43.511000Z",
+                "summaryCode": "SENTIMENT",
+                "humanPrompt": "Judge whether this text is positive",
+                "kind": "MultipleChoiceQuestion",
+                "choices": ["positive", "negative"]
+            },
+            "response": self.ANNOTATIONS[0],
+            "created": "2018-04-23T18:25:43.511000Z"
+        }
+        result = list(decode_records([assignment] * 5, "assignment", workers=2, chunk_size=2))
+        self.assertEqual(len(result), 5)
+        self.assertEqual(type(result[4]), Assignment)
+        self.assertEqual(type(result[4].response), MultipleChoiceAnnotation)
+
+    def test_empty(self):
+        self.assertEqual(list(decode_records([], "annotation", workers=1)), [])
+        with open(self.path, "w"):
+            pass
+        self.assertEqual(jsonl_byte_ranges(self.path), [])
+        self.assertEqual(list(decode_jsonl(self.path, "annotation", workers=1)), [])
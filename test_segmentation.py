@@ -0,0 +1,123 @@
+from unittest import TestCase
+from pyannotatron.segmentation import boundary_matches, score_segmentation, score_corpus, reference_pairs
+from pyannotatron.segmentation import SegmentationIndex
+from pyannotatron.models import TimeSeriesSegmentationAnnotation, AnnotationSource, Annotation
+from bisect import bisect_right
+import datetime
+import math
+import random
+
+
+def segmentation(segments, source=AnnotationSource.REFERENCE):
+    return TimeSeriesSegmentationAnnotation(datetime.datetime(2018, 4, 24), source, "WORDS", segments,
+                                            ["w%d" % i for i in range(len(segments))])
+
+
+def sampled(reference, hypothesis, k, start, end, step=0.0005):
+    """
+        Pk and WindowDiff from densely sampled probes, for comparison.
+    """
+    pk = window_diff = probes = 0
+    t = start + step / 2
+    while t < end - k:
+        r = bisect_right(reference, t + k) - bisect_right(reference, t)
+        h = bisect_right(hypothesis, t + k) - bisect_right(hypothesis, t)
+        pk += (r == 0) != (h == 0)
+        window_diff += r != h
+        probes += 1
+        t += step
+    return pk / probes, window_diff / probes
+
+
+class TestSegmentationScores(TestCase):
+
+    def test_boundary_matches(self):
+        self.assertEqual(boundary_matches([1, 2, 3], [1.05, 2.5, 2.95], 0.1), 2)
+        # Each reference boundary can only be matched once.
+        self.assertEqual(boundary_matches([1], [0.95, 1.05], 0.1), 1)
+        self.assertEqual(boundary_matches([1, 1.1], [1.05], 0.1), 1)
+        self.assertEqual(boundary_matches([], [1], 0.1), 0)
+
+    def test_identical(self):
+        score = score_segmentation(segmentation([0, 1, 2.5, 4]), segmentation([0, 1, 2.5, 4]), 0.02, end=5)
+        self.assertEqual((score.pk, score.window_diff, score.f1), (0.0, 0.0, 1.0))
+
+    def test_against_sampling(self):
+        rng = random.Random(2)
+        reference, hypothesis = [0.0], [0.0]
+        for segments in (reference, hypothesis):
+            while segments[-1] < 10:
+                segments.append(segments[-1] + rng.uniform(0.1, 1.0))
+        score = score_segmentation(reference, SegmentationIndex(hypothesis, ["x"] * len(hypothesis)), 0.05,
+                                   end=11)
+        pk, window_diff = sampled(reference[1:], hypothesis[1:], score.k, 0.0, 11)
+        self.assertAlmostEqual(score.pk, pk, places=2)
+        self.assertAlmostEqual(score.window_diff, window_diff, places=2)
+        self.assertGreater(score.pk, 0)
+        self.assertGreaterEqual(score.window_diff, score.pk)
+
+    def test_no_hypothesis_boundaries(self):
+        # k = 10 / 2 / 2 = 2.5; probes t in [0, 7.5] whose window (t, t + 2.5] holds the boundary at 5.
+        score = score_segmentation([0, 5], [0], 0.1, end=10)
+        self.assertEqual(score.k, 2.5)
+        self.assertAlmostEqual(score.pk, 2.5 / 7.5)
+        self.assertEqual(score.recall, 0.0)
+        self.assertTrue(score.precision != score.precision)
+
+    def test_corpus(self):
+        observations = [
+            (1, "ref", segmentation([0, 1, 2])),
+            (1, "asr", segmentation([0, 1.01, 2.2], AnnotationSource.SYSTEM_GENERATED)),
+            (1, "alice", segmentation([0, 1, 2], AnnotationSource.HUMAN)),
+            (2, "ref", segmentation([0, 3])),
+            (2, "asr", segmentation([0, 3], AnnotationSource.SYSTEM_GENERATED)),
+            (3, "asr", segmentation([0, 3], AnnotationSource.SYSTEM_GENERATED)),
+        ]
+        pairs = reference_pairs(observations)
+        self.assertEqual([item for item, _, _ in pairs], [1, 2])
+        scores = score_corpus(pairs, tolerance=0.05, ends={1: 3, 2: 6})
+        self.assertEqual([s.f1 for s in scores], [0.5, 1.0])
+        totals = scores.totals()
+        self.assertEqual(totals["assets"], 2)
+        self.assertAlmostEqual(totals["f1"], 2 * 2 / 6)
+        self.assertAlmostEqual(totals["recall"], 2 / 3)
+        first = scores.scores[0]
+        self.assertAlmostEqual(totals["pk"], first.pk_error / (first.length + scores.scores[1].length))
+
+
+class TestSegmentationIndex(TestCase):
+
+    INPUT_JSON = {
+        "created": "2018-04-23T18:25:43.511000Z",
+        "kind": "TimeSeriesSegmentationAnnotation",
+        "source": "Human",
+        "summaryCode": "WORDS",
+        "segments": [0.1, 2.0, 2.5, 4.0],
+        "annotations": ["hello", "world", "world", "hello"]
+    }
+
+    def test_lookup(self):
+        index = SegmentationIndex.from_annotation(Annotation.from_json(self.INPUT_JSON))
+        self.assertIsNone(index.label_at(0.0))
+        self.assertEqual(index.label_at(0.1), "hello")
+        self.assertEqual(index.label_at(2.2), "world")
+        self.assertEqual(index.label_at(100.0), "hello")
+        times = [0.0, 1.0, 2.0, 3.0, 5.0]
+        expected = [None, "hello", "world", "world", "hello"]
+        self.assertEqual(index.labels_at(times), expected)
+        self.assertEqual(index.labels_at(list(reversed(times))), list(reversed(expected)))
+        self.assertEqual(list(index.segment_indices(times)), [-1, 0, 1, 2, 3])
+
+    def test_durations(self):
+        index = SegmentationIndex(self.INPUT_JSON["segments"], self.INPUT_JSON["annotations"])
+        durations = index.durations(end=5.0)
+        for a, b in zip(durations, [1.9, 0.5, 1.5, 1.0]):
+            self.assertAlmostEqual(a, b)
+        self.assertTrue(math.isnan(index.durations()[-1]))
+
+    def test_merged(self):
+        annotation = Annotation.from_json(self.INPUT_JSON)
+        merged = SegmentationIndex.from_annotation(annotation).merged().to_annotation(annotation)
+        self.assertEqual(merged.segments, [0.1, 2.0, 4.0])
+        self.assertEqual(merged.annotations, ["hello", "world", "hello"])
+        self.assertEqual(merged.summary_code, "WORDS")
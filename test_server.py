@@ -0,0 +1,77 @@
+from unittest import TestCase
+from pyannotatron.client import AnnotatronClient, AnnotatronAPIError
+from pyannotatron.loadgen import run_load, percentile
+from pyannotatron.server import StandInServer
+from pyannotatron.models import Corpus
+import threading
+import time
+
+
+class TestStandInServer(TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=1).start()
+        self.client = AnnotatronClient(self.server.url)
+        self.client.login("admin", "admin")
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_list_corpora(self):
+        for i in range(5):
+            self.client.create_corpus(Corpus("corpus %d" % i))
+        items = [Corpus.from_json(item).name
+                 for item in self.client.request("GET", "/v1/corpus/", params={"pageSize": 10})["items"]]
+        self.assertEqual(items, ["corpus %d" % i for i in range(5)])
+        self.assertEqual(len(self.client.request("GET", "/v1/users/")["items"]), 1)
+
+    def test_latency(self):
+        self.server.latency = 0.05
+        start = time.perf_counter()
+        self.client.current_user()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+    def test_error_rate(self):
+        self.server.error_rate = 0.5
+        self.server.error_status = 500
+        result = run_load("current_user", lambda i: self.client.current_user(), concurrency=4, requests=200)
+        self.assertEqual(result.requests, 200)
+        self.assertEqual(result.errors["HTTP 500"], self.server.injected_errors)
+        self.assertTrue(50 < self.server.injected_errors < 150)
+        self.assertEqual(len(result.latencies), 200 - self.server.injected_errors)
+
+    def test_max_inflight(self):
+        self.server.latency = 0.2
+        self.server.max_inflight = 1
+        errors = []
+
+        def call():
+            try:
+                self.client.current_user()
+            except AnnotatronAPIError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(errors[0].status, 503)
+        self.assertEqual(self.server.rejected, 2)
+
+
+class TestLoadGen(TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([7], 99.9), 7)
+
+    def test_duration(self):
+        result = run_load("sleep", lambda i: time.sleep(0.01), concurrency=2, duration=0.1)
+        self.assertGreater(result.throughput, 50)
+        self.assertEqual(result.to_json()["requests"], len(result.latencies))
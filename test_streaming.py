@@ -0,0 +1,92 @@
+from unittest import TestCase, mock
+from pyannotatron.models import MultipleChoiceAnnotation, TextAnnotation, Assignment
+from pyannotatron.streaming import iter_json_records, iter_annotations, iter_assignments
+import io
+import json
+
+
+class TestStreaming(TestCase):
+
+    ANNOTATIONS = [
+        {
+            "created": "2018-04-23T18:25:43.511000Z",
+            "kind": "MultipleChoiceAnnotation",
+            "source": "Human",
+            "summaryCode": "SENTIMENT",
+            "choices": ["positive"]
+        },
+        {
+            "created": "2018-04-23T18:25:43.511000Z",
+            "kind": "TextAnnotation",
+            "source": "Human",
+            "summaryCode": "EVALUATION",
+            "content": "a \"quoted\" value, with [brackets]"
+        }
+    ]
+
+    def test_array(self):
+        src = io.StringIO(json.dumps(self.ANNOTATIONS * 50, indent=2))
+        result = list(iter_annotations(src, chunk_size=16))
+        self.assertEqual(len(result), 100)
+        self.assertEqual(type(result[0]), MultipleChoiceAnnotation)
+        self.assertEqual(type(result[1]), TextAnnotation)
+        self.assertEqual([r.to_json() for r in result], self.ANNOTATIONS * 50)
+
+    def test_json_lines(self):
+        src = io.StringIO("\n".join(json.dumps(a) for a in self.ANNOTATIONS) + "\n")
+        result = list(iter_annotations(src, chunk_size=7))
+        self.assertEqual([r.to_json() for r in result], self.ANNOTATIONS)
+
+    def test_records(self):
+        self.assertEqual(list(iter_json_records(io.StringIO("[]"))), [])
+        self.assertEqual(list(iter_json_records(io.StringIO(""))), [])
+        self.assertEqual(list(iter_json_records(io.StringIO("[1, 22, 333]"), chunk_size=1)), [1, 22, 333])
+        self.assertEqual(list(iter_json_records(io.BytesIO(b"1\n22\n333"), chunk_size=1)), [1, 22, 333])
+        with self.assertRaises(ValueError):
+            list(iter_json_records(io.StringIO("[1, 2")))
+
+    def test_assignments(self):
+        assignment = {
+            "assets": [1, 22],
+            "assignedAnnotatorId": 12,
+            "question": {
+                "created": "2018-04-23T18:25:43.511000Z",
+                "summaryCode": "SENTIMENT",
+                "humanPrompt": "Judge whether this text is positive",
+                "kind": "MultipleChoiceQuestion",
+                "choices": ["positive", "negative"]
+            },
+            "response": self.ANNOTATIONS[0],
+            "created": "2018-04-23T18:25:43.511000Z"
+        }
+        result = list(iter_assignments(io.StringIO(json.dumps([assignment, assignment])), chunk_size=32))
+        self.assertEqual(len(result), 2)
+        self.assertEqual(type(result[1]), Assignment)
+        self.assertEqual(result[1].assigned_annotator_id, 12)
+        self.assertEqual(type(result[1].response), MultipleChoiceAnnotation)
+
+    def test_multibyte(self):
+        src = io.BytesIO(json.dumps(["naïve", "日本語"], ensure_ascii=False).encode("utf8"))
+        self.assertEqual(list(iter_json_records(src, chunk_size=1)), ["naïve", "日本語"])
+
+    def test_large_record(self):
+        # Decoding cost must stay linear in the record size: this used to
+        # retry the whole record after every chunk and took seconds. Count
+        # the characters handed to raw_decode rather than timing it.
+        ranges = [{"label": "alice", "start": i * 1.25, "end": i * 1.25 + 1.1} for i in range(80000)]
+        record = dict(self.ANNOTATIONS[0], kind="TimeSeriesRangeAnnotation", ranges=ranges)
+        del record["choices"]
+        text = json.dumps(record)
+        self.assertGreater(len(text), 4 * 1024 * 1024)
+        for src in (text + "\n" + json.dumps(self.ANNOTATIONS[1]) + "\n", "[" + text + "]"):
+            scanned = []
+            raw_decode = json.JSONDecoder.raw_decode
+
+            def counting_raw_decode(decoder, s, idx=0):
+                scanned.append(len(s) - idx)
+                return raw_decode(decoder, s, idx)
+
+            with mock.patch.object(json.JSONDecoder, "raw_decode", counting_raw_decode):
+                result = list(iter_json_records(io.BytesIO(src.encode("utf8"))))
+            self.assertEqual(result[0], record)
+            self.assertLess(sum(scanned), 4 * len(src))
@@ -0,0 +1,154 @@
+from unittest import TestCase
+from pyannotatron.client import AnnotatronClient, AnnotatronAPIError
+from pyannotatron.server import StandInServer
+from pyannotatron.submit import ResponseSubmissionQueue
+from pyannotatron.models import AssignmentResponse, MultipleChoiceAnnotation, AnnotationSource, Assignment
+from pyannotatron.models import MultipleChoiceQuestion, QuestionKind, SuccessfulInsert, ValidationError
+import datetime
+import os
+import tempfile
+import threading
+import time
+
+
+class TestResponseSubmissionQueue(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.start_server()
+
+    def start_server(self):
+        self.server = StandInServer().start()
+        self.client = AnnotatronClient(self.server.url)
+        self.client.login("admin", "admin")
+        question = MultipleChoiceQuestion(datetime.datetime(2018, 4, 23), "SENTIMENT", "Is this positive?",
+                                          QuestionKind.MULTIPLE_CHOICE, ["positive", "negative"])
+        self.assignment_id = self.client.create_assignment(Assignment([1], 12, question,
+                                                                      response=self.make_response().response)).id
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def make_response(self, choice="positive"):
+        annotation = MultipleChoiceAnnotation(datetime.datetime(2018, 4, 24), AnnotationSource.SYSTEM_GENERATED,
+                                              "SENTIMENT", [choice])
+        return AssignmentResponse(annotation, notes="generated")
+
+    def test_batches(self):
+        requests = self.server.requests
+        with ResponseSubmissionQueue(self.client, max_items=10, max_delay=60) as queue:
+            futures = [queue.submit(self.assignment_id, self.make_response()) for _ in range(25)]
+            futures.append(queue.submit(9999, self.make_response()))
+            for future in futures[:20]:
+                self.assertIsInstance(future.result(5), SuccessfulInsert)
+        self.assertIsInstance(futures[-1].result(), ValidationError)
+        self.assertEqual(futures[-1].result().errors[0].name, "assignmentId")
+        self.assertEqual(self.server.requests - requests, 3)
+        self.assertEqual(len(self.server.responses), 25)
+
+    def test_max_delay(self):
+        with ResponseSubmissionQueue(self.client, max_items=1000, max_delay=0.05) as queue:
+            self.assertIsInstance(queue.submit(self.assignment_id, self.make_response()).result(5), SuccessfulInsert)
+
+    def test_spool_recovery(self):
+        spool = os.path.join(self.tmp.name, "responses.spool")
+        self.server.stop()
+        self.client.close()
+        # A fresh client, so no kept-alive connection to the stopped server is reused.
+        self.client = AnnotatronClient(self.server.url)
+        queue = ResponseSubmissionQueue(self.client, max_items=2, spool_path=spool, retry_delay=0.01)
+        futures = [queue.submit(self.assignment_id, self.make_response("negative")) for _ in range(3)]
+        queue.close(abandon=True)
+        self.assertTrue(all(f.exception() is not None for f in futures))
+        self.assertTrue(os.path.exists(spool))
+
+        assignment_id = self.assignment_id
+        self.client.close()
+        self.start_server()
+        self.assertEqual(self.assignment_id, assignment_id)
+        with ResponseSubmissionQueue(self.client, spool_path=spool) as queue:
+            recovered = queue.recover()
+            self.assertEqual(len(recovered), 3)
+            for future in recovered:
+                self.assertIsInstance(future.result(5), SuccessfulInsert)
+        self.assertEqual(len(self.server.responses), 3)
+        self.assertFalse(os.path.exists(spool))
+
+
+class _FakeClient:
+    """
+        Answers submit_responses from a script of results or exceptions.
+    """
+
+    def __init__(self, *script, delay=0.0):
+        self.script = list(script)
+        self.delay = delay
+        self.calls = 0
+        self.started = threading.Event()
+
+    def submit_responses(self, items):
+        self.calls += 1
+        self.started.set()
+        time.sleep(self.delay)
+        step = self.script.pop(0) if self.script else None
+        if isinstance(step, Exception):
+            raise step
+        if step is None:
+            step = len(items)
+        return [SuccessfulInsert(i) for i in range(step)]
+
+
+class TestSubmissionFailures(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.response = AssignmentResponse(MultipleChoiceAnnotation(datetime.datetime(2018, 4, 24),
+                                                                    AnnotationSource.HUMAN, "SENTIMENT",
+                                                                    ["positive"]))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_client_error_not_retried(self):
+        client = _FakeClient(AnnotatronAPIError(400, "bad batch"))
+        spool = os.path.join(self.tmp.name, "responses.spool")
+        with ResponseSubmissionQueue(client, max_items=2, spool_path=spool, retry_delay=0.01) as queue:
+            futures = [queue.submit(1, self.response) for _ in range(4)]
+            self.assertEqual(futures[0].exception(5).status, 400)
+            self.assertEqual(futures[1].exception(5).status, 400)
+            self.assertIsInstance(futures[3].result(5), SuccessfulInsert)
+        self.assertEqual(client.calls, 2)
+        self.assertFalse(os.path.exists(spool))
+
+    def test_server_error_retried(self):
+        client = _FakeClient(AnnotatronAPIError(503, "busy"), AnnotatronAPIError(429, "slow down"))
+        with ResponseSubmissionQueue(client, max_items=1, retry_delay=0.01) as queue:
+            self.assertIsInstance(queue.submit(1, self.response).result(5), SuccessfulInsert)
+        self.assertEqual(client.calls, 3)
+
+    def test_short_results(self):
+        with ResponseSubmissionQueue(_FakeClient(1), max_items=3, max_delay=60) as queue:
+            futures = [queue.submit(1, self.response) for _ in range(3)]
+            self.assertIsInstance(futures[0].result(5), SuccessfulInsert)
+            self.assertIsInstance(futures[1].exception(5), RuntimeError)
+            self.assertIsInstance(futures[2].exception(5), RuntimeError)
+
+    def test_flush_waits_for_inflight(self):
+        client = _FakeClient(delay=0.5)
+        with ResponseSubmissionQueue(client, max_items=1) as queue:
+            future = queue.submit(1, self.response)
+            self.assertTrue(client.started.wait(5))
+            queue.flush()
+            self.assertTrue(future.done())
+
+    def test_spool_compaction(self):
+        spool = os.path.join(self.tmp.name, "responses.spool")
+        queue = ResponseSubmissionQueue(_FakeClient(), max_items=1, spool_path=spool, compact_after=5)
+        for _ in range(50):
+            queue.submit(1, self.response).result(5)
+        with open(spool) as fp:
+            self.assertLess(len(fp.readlines()), 15)
+        queue.close()
+        self.assertFalse(os.path.exists(spool))
@@ -0,0 +1,80 @@
+from unittest import TestCase
+from pyannotatron.utils import clear_compiled_maps, compile_map, generic_from_json, generic_to_json
+from pyannotatron.utils import parse_json_date, parse_json_dates, date_to_json, object_fields
+from pyannotatron.models import TimeSeriesRangeTuple, Corpus
+import datetime
+
+
+class TestMapCodec(TestCase):
+
+    MAP = {
+        "summaryCode": "summary_code",
+        "kind": ("kind", lambda x: x.upper(), lambda x: x.lower()),
+    }
+
+    def test_compiled_once(self):
+        self.assertIs(compile_map(self.MAP), compile_map(self.MAP))
+
+    def test_recompiled_after_clear(self):
+        mapping = dict(self.MAP)
+        codec = compile_map(mapping)
+        mapping["assetId"] = "asset_id"
+        clear_compiled_maps()
+        self.assertIsNot(compile_map(mapping), codec)
+        self.assertDictEqual(generic_from_json({"assetId": 1}, mapping), {"asset_id": 1})
+
+    def test_from_json_preserves_order(self):
+        ref = {"extra": 1, "kind": "mc", "summaryCode": "S"}
+        result = generic_from_json(ref, self.MAP)
+        self.assertEqual(list(result.items()), [("extra", 1), ("kind", "MC"), ("summary_code", "S")])
+
+    def test_to_json_mapped_keys_first(self):
+        ref = {"extra": 1, "kind": "MC", "summary_code": "S"}
+        result = generic_to_json(ref, self.MAP)
+        self.assertEqual(list(result.items()), [("summaryCode", "S"), ("kind", "mc"), ("extra", 1)])
+
+    def test_missing_mapped_key_omitted(self):
+        self.assertDictEqual(generic_to_json({"kind": "MC"}, self.MAP), {"kind": "mc"})
+
+
+class TestJSONDates(TestCase):
+
+    def test_fast_path(self):
+        self.assertEqual(parse_json_date("2018-04-23T18:25:43.511000Z"),
+                         datetime.datetime(2018, 4, 23, 18, 25, 43, 511000))
+
+    def test_fallback(self):
+        self.assertEqual(parse_json_date("2018-04-23T18:25:43.5Z"),
+                         datetime.datetime(2018, 4, 23, 18, 25, 43, 500000))
+        with self.assertRaises(ValueError):
+            parse_json_date("2018-04-23")
+
+    def test_aware(self):
+        result = parse_json_date("2018-04-23T18:25:43.511000Z", aware=True)
+        self.assertEqual(result.tzinfo, datetime.timezone.utc)
+        self.assertIsNone(parse_json_date("2018-04-23T18:25:43.511000Z").tzinfo)
+
+    def test_batch(self):
+        ref = ["2018-04-23T18:25:43.511000Z", "2018-04-24T00:00:00.000000Z", "2018-04-23T18:25:43.511000Z"]
+        result = parse_json_dates(ref)
+        self.assertEqual(result, [parse_json_date(x) for x in ref])
+        self.assertIs(result[0], result[2])
+
+    def test_to_json(self):
+        self.assertEqual(date_to_json(datetime.datetime(2018, 4, 23, 18, 25, 43, 511000)),
+                         "2018-04-23T18:25:43.511000Z")
+        eastern = datetime.timezone(datetime.timedelta(hours=-5))
+        self.assertEqual(date_to_json(datetime.datetime(2018, 4, 23, 13, 25, 43, 511000, tzinfo=eastern)),
+                         "2018-04-23T18:25:43.511000Z")
+
+
+class TestObjectFields(TestCase):
+
+    def test_slots(self):
+        t = TimeSeriesRangeTuple("noisy", 0.0, 0.1)
+        self.assertFalse(hasattr(t, "__dict__"))
+        self.assertEqual(list(object_fields(t).items()), [("label", "noisy"), ("start", 0.0), ("end", 0.1)])
+
+    def test_dict(self):
+        c = Corpus("VCTK")
+        self.assertIs(object_fields(c), c.__dict__)